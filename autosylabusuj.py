@@ -33,63 +33,332 @@ Poszczególne funkcje ``pgq_`` stosują różne, najczęściej określone *ad ho
 "kotwice" w dokumencie, które stanowią punkty referencyjne dla użytecznych
 informacji - zazwyczaj są to nagłówki tabel i inne stałe elementy w kartach
 opisów przedmiotów.
+
+Kotwice tekstowe są wyszukiwane w jednym przebiegu po stronie przez
+`IndeksStrony`; funkcje ``pgq_`` przyjmują opcjonalnie gotowy indeks strony
+(parametr ``indeks``), żeby nie budować go wielokrotnie.
+
+Funkcje ``lx_`` są ich odpowiednikami dla silnika ``lxml`` (opcja
+``--silnik``), który pracuje bezpośrednio na elementach lxml ``<div>`` stron
+i prekompilowanych wyrażeniach XPath, bez tworzenia obiektów PyQuery.
+Zestawy funkcji obu silników są zebrane w `SilnikiEkstrakcji`; wyniki obu
+silników porównuje skrypt ``roznice_silnikow.py``.
+
+Pomiary wydajności na syntetycznych dokumentach znajdują się w
+``bench_autosylabusuj.py``.
 """
 
 import argparse
-import configparser
+import array
+import bisect
+import collections
+import collections.abc
+import contextlib
+import cProfile
 import csv
+import functools
+import hashlib
+import importlib
+import io
+import itertools
+import json
 import logging
+import math
+import mmap
 import os
 import os.path
-from pathlib import Path
 import re
 import shutil
+import signal
+import sqlite3
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
 
-from pyquery import PyQuery
 
+class _LeniwyModul:
+    """
+    Moduł importowany dopiero przy pierwszym odczycie jego atrybutu.
+    Odczytane atrybuty są zapamiętywane w obiekcie, więc kolejne odczyty
+    kosztują tyle, co zwykły dostęp do atrybutu.
+
+    Tak są ładowane lxml i PyQuery (z cssselect), których import to większość
+    czasu uruchomienia, a które nie są potrzebne np. w trybie PlanTab.
+    Zależności pojedynczych trybów (serwer HTTP, pula procesów, watchdog) są
+    importowane w funkcjach, które ich używają.
+    """
 
-def pgq_wyciagnijNazwePrzedmiotu(pgq):
-    kotwica = pgq.children("img")
-    poSelector = "p:contains('Karta opisu przedmiotu')"
-    elemPoKotwicy = kotwica.nextAll()
+    def __init__(self, nazwa):
+        self._nazwa = nazwa
+
+    def __getattr__(self, atrybut):
+        wartosc = getattr(importlib.import_module(self._nazwa), atrybut)
+        setattr(self, atrybut, wartosc)
+        return wartosc
+
+
+etree = _LeniwyModul("lxml.etree")
+_pyquery = _LeniwyModul("pyquery")
+
+
+def PyQuery(*args, **kwargs):
+    """`pyquery.PyQuery` - import pakietu pyquery przy pierwszym użyciu."""
+    return _pyquery.PyQuery(*args, **kwargs)
+
+
+class _XPath:
+    """Wyrażenie XPath kompilowane przy pierwszym użyciu (zob. `_LeniwyModul`)."""
+
+    def __init__(self, wyrazenie):
+        self.wyrazenie = wyrazenie
+        self._skompilowane = None
+
+    def __call__(self, *args, **kwargs):
+        if self._skompilowane is None:
+            self._skompilowane = etree.XPath(self.wyrazenie)
+        return self._skompilowane(*args, **kwargs)
 
-    linieTyt = []
 
-    for el in elemPoKotwicy:
-        elq = PyQuery(el)
+# Teksty "kotwic" szukane w akapitach <p> stron. Są wyszukiwane jednocześnie,
+# w jednym przebiegu po tekstach akapitów strony (zob. `IndeksStrony`).
+KotwiceStrony = ["Karta opisu przedmiotu",
+                 "Ścieżka",
+                 "Forma weryfikacji uzyskanych efekt",
+                 "Sposób realizacji i godziny zajęć",
+                 "Liczba",
+                 "Rodzaj zajęć",
+                 "Formy zaliczenia",
+                 "Warunki zaliczenia przedmiotu",
+                 "Wymagania wstępne i dodatkowe"]
+_re_KotwiceStrony = re.compile("|".join(map(re.escape, KotwiceStrony)))
 
-        if elq.is_(poSelector):
-            return " ".join(linieTyt)
+# Położenie akapitów w atrybucie style, np. "top:90.0pt;left:40.0pt;...".
+_re_PolozenieCSS = re.compile(r"\b(top|left)\s*:\s*(\d+(?:\.\d+)?)(pt|px|mm|cm|in)")
+_JednostkiCSSwPt = {"pt": 1.0, "px": 72 / 96, "mm": 72 / 25.4, "cm": 72 / 2.54, "in": 72.0}
+
+# Położenia od lewej różniące się o nie więcej niż tyle pt traktujemy jako
+# tę samą kolumnę tabeli.
+TolerancjaKolumnTabeli_pt = 2.0
+
+
+# Reguły tekstu ``PyQuery.text()`` (moduł pyquery.text): elementy, których
+# tekst jest po prostu sklejany (bez sztucznych nowych linii; <br> jest
+# separatorem), oraz białe znaki HTML. Kopia, żeby silnik lxml nie
+# importował pyquery.
+_TagiWierszowe = frozenset({
+    "a", "abbr", "acronym", "b", "bdo", "big", "button", "cite",
+    "code", "dfn", "em", "i", "img", "input", "kbd", "label", "map",
+    "object", "q", "samp", "script", "select", "small", "span", "strong",
+    "sub", "sup", "textarea", "time", "tt", "var"})
+_re_BialeZnakiHTML = re.compile("[\x20\x09\x0C\u200B\x0A\x0D]+")
+
+
+def _czesciTekstu(elem):
+    """
+    Części tekstu elementu jak w ``pyquery.text.extract_text_array``: napisy,
+    ``None`` (sztuczna nowa linia wokół elementu blokowego) i ``True`` (<br>).
+    """
+    if callable(elem.tag): # Komentarze i instrukcje przetwarzania.
+        return []
+    czesci = []
+    if elem.tag == "br":
+        czesci.append(True)
+    elif elem.tag not in _TagiWierszowe:
+        czesci.append(None)
+    if elem.text is not None:
+        czesci.append(elem.text)
+    for dziecko in elem:
+        czesci += _czesciTekstu(dziecko)
+        if dziecko.tail is not None:
+            czesci.append(dziecko.tail)
+    if elem.tag != "br" and elem.tag not in _TagiWierszowe:
+        czesci.append(None)
+    return czesci
+
+
+def _tekst(elem):
+    """Tekst elementu dokładnie tak, jak zwraca go ``PyQuery(elem).text()``."""
+    # Akapity od mutool zawierają tylko elementy wierszowe (<span>, <b>,
+    # <i>), dla których extract_text sprowadza się do sklejenia tekstu
+    # i ściśnięcia białych znaków.
+    if elem.tag != "br" and all(el.tag in _TagiWierszowe for el in elem.iterdescendants()):
+        return _re_BialeZnakiHTML.sub(" ", "".join(elem.itertext())).strip()
+
+    # Jak ``pyquery.text.extract_text``: ciągi napisów są sklejane i ściskane,
+    # a kolejne sztuczne nowe linie - łączone w jedną.
+    wynik = []
+    for czyNapis, grupa in itertools.groupby(_czesciTekstu(elem), key=lambda c: isinstance(c, str)):
+        if czyNapis:
+            napis = _re_BialeZnakiHTML.sub(" ", "".join(grupa)).strip()
+            if napis:
+                wynik.append(napis)
         else:
-            linieTyt.append(elq.text())
+            for c in grupa:
+                if not (c is None and wynik and wynik[-1] is None):
+                    wynik.append(c)
+    return "".join("\n" if c is None or c is True else c for c in wynik).strip()
+
+
+class IndeksStrony:
+    """
+    Indeks kotwic pojedynczej strony (``<div id="pageN">``).
+
+    Zastępuje wielokrotne zapytania ``pgq.children("p:contains('...')")``,
+    z których każde przechodzi od nowa przez wszystkie akapity strony.
+    Teksty akapitów są czytane raz, a wszystkie kotwice z `KotwiceStrony`
+    są w nich wyszukiwane jednym wyrażeniem regularnym (alternatywą), więc
+    koszt budowy indeksu jest liniowy względem tekstu strony. Indeks jest
+    budowany leniwie - przy pierwszym pytaniu o kotwicę.
+
+    Semantyka zapytań odpowiada selektorom ``:contains()`` z cssselect, tzn.
+    kotwica jest szukana w pełnym tekście akapitu (łącznie z potomkami).
+
+    Geometria strony (położenia ``left`` i ``top`` wszystkich dzieci, w pt)
+    jest również czytana raz, do tablic liczbowych `lewo()` i `gora()`
+    indeksowanych tak samo jak `dzieci`. Elementy bez położenia mają NaN.
+    """
+
+    def __init__(self, div):
+        self.div = div
+        self.dzieci = list(div)
+        self._kotwice = None
+        self._obrazki = None
+        self._lewo = None
+        self._gora = None
+
+    def _zbuduj(self):
+        self._kotwice = {kotwica: [] for kotwica in KotwiceStrony}
+        self._obrazki = []
+
+        for i, el in enumerate(self.dzieci):
+            if el.tag == "p":
+                for kotwica in set(_re_KotwiceStrony.findall("".join(el.itertext()))):
+                    self._kotwice[kotwica].append(i)
+            elif el.tag == "img":
+                self._obrazki.append(i)
+
+    def _zbudujGeometrie(self):
+        self._lewo = array.array("d")
+        self._gora = array.array("d")
+
+        for el in self.dzieci:
+            polozenie = {wlasc: float(liczba) * _JednostkiCSSwPt[jedn] for wlasc, liczba, jedn
+                         in _re_PolozenieCSS.findall(el.get("style") or "")}
+            self._lewo.append(polozenie.get("left", math.nan))
+            self._gora.append(polozenie.get("top", math.nan))
+
+    def lewo(self):
+        """Położenia ``left`` dzieci strony w pt (``array('d')``)."""
+        if self._lewo is None:
+            self._zbudujGeometrie()
+        return self._lewo
+
+    def gora(self):
+        """Położenia ``top`` dzieci strony w pt (``array('d')``)."""
+        if self._gora is None:
+            self._zbudujGeometrie()
+        return self._gora
+
+    def pozycje(self, kotwica):
+        """Indeksy (wśród dzieci strony) akapitów zawierających kotwicę."""
+        if self._kotwice is None:
+            self._zbuduj()
+        return self._kotwice[kotwica]
+
+    def obrazki(self):
+        """Indeksy elementów ``<img>`` wśród dzieci strony."""
+        if self._obrazki is None:
+            self._zbuduj()
+        return self._obrazki
+
+    def zawiera(self, kotwica):
+        return bool(self.pozycje(kotwica))
+
+    def elementy(self, kotwica):
+        """Odpowiednik ``pgq.children("p:contains('kotwica')")``."""
+        return [self.dzieci[i] for i in self.pozycje(kotwica)]
+
+    def nastepnePozycje(self, pozycje):
+        """Pozycje elementów, które zwróciłoby ``.nextAll()`` dla podanych pozycji."""
+        return [j for i in pozycje for j in range(i + 1, len(self.dzieci))]
+
+    def nastepneWszystkie(self, pozycje):
+        """Odpowiednik ``.nextAll()`` dla elementów na podanych pozycjach."""
+        return [self.dzieci[j] for j in self.nastepnePozycje(pozycje)]
+
+    def czySylabus(self):
+        """Odpowiednik ``pgq.children("p:first-child").text() == "Sylabusy"``."""
+        return bool(self.dzieci) and self.dzieci[0].tag == "p" \
+            and _tekst(self.dzieci[0]) == "Sylabusy"
+
+    def czyTytulowa(self):
+        """
+        Czy to pierwsza strona przedmiotu: z obrazkiem nad tytułem, a gdy
+        obrazków nie ma (np. stext bez obrazków, zob. ``--bez-obrazkow``) -
+        z kotwicą "Karta opisu przedmiotu" i pogrubioną etykietą "Ścieżka".
+        """
+        if self.obrazki():
+            return True
+        return self.zawiera("Karta opisu przedmiotu") and \
+            any(b.tag == "b" and _tekst(b) == "Ścieżka" for p in self.elementy("Ścieżka") for b in p)
+
+
+def pgq_wyciagnijNazwePrzedmiotu(pgq, indeks=None):
+    indeks = indeks or IndeksStrony(pgq[0])
+    stopy = set(indeks.pozycje("Karta opisu przedmiotu"))
+
+    linieTyt = []
+
+    # Tytuł zaczyna się pod obrazkiem, a bez obrazka - pod nagłówkiem
+    # "Sylabusy" (pierwszym akapitem strony).
+    for i in indeks.obrazki() or [0]:
+        for j in range(i + 1, len(indeks.dzieci)):
+            if j in stopy:
+                return " ".join(linieTyt)
+            else:
+                linieTyt.append(_tekst(indeks.dzieci[j]))
 
 
-def pgq_wyciagnijSciezke(pgq):
-    kotwica = pgq.children("p > b") \
-        .filter(lambda i, elem: PyQuery(elem).text() == "Ścieżka").parents()[-1]
+def pgq_wyciagnijSciezke(pgq, indeks=None):
+    indeks = indeks or IndeksStrony(pgq[0])
+    kotwice = [p for p in indeks.elementy("Ścieżka")
+               if any(b.tag == "b" and _tekst(b) == "Ścieżka" for b in p)]
+    kotwica = kotwice[-1]
     nastepny = PyQuery(kotwica).next()
 
     return nastepny.text() # to powinna być nazwa ścieżki.
 
 
-def pgq_wyciagnijFormeWeryfikacji(pgq):
-    nastepnyElem = pgq.children("p:contains('Forma weryfikacji uzyskanych efekt') + p")
-    return nastepnyElem.text()
+def pgq_wyciagnijFormeWeryfikacji(pgq, indeks=None):
+    indeks = indeks or IndeksStrony(pgq[0])
+    nastepneElem = [indeks.dzieci[i + 1]
+                    for i in indeks.pozycje("Forma weryfikacji uzyskanych efekt")
+                    if i + 1 < len(indeks.dzieci) and indeks.dzieci[i + 1].tag == "p"]
+    return PyQuery(nastepneElem).text()
 
 
-def pgq_wyciagnijSposobyGodzinyRealizacji(pgq):
-    kotwica = pgq.children("p:contains('Sposób realizacji i godziny zajęć')")
-    stoper = kotwica.nextAll().filter("p:contains('Liczba')")[0]
+def pgq_wyciagnijSposobyGodzinyRealizacji(pgq, indeks=None):
+    indeks = indeks or IndeksStrony(pgq[0])
+    kotwice = indeks.pozycje("Sposób realizacji i godziny zajęć")
+    poKotwicy = [j for i in kotwice for j in range(i + 1, len(indeks.dzieci))]
+    stopy = set(indeks.pozycje("Liczba"))
+    stoper = [j for j in poKotwicy if j in stopy][0]
     bufor = []
 
-    for elem in kotwica.nextAll():
-        pqelem = PyQuery(elem)
-        if elem == stoper: # To nie jest błąd, że tu nie ma elementu owiniętego w PyQuery.
+    for j in poKotwicy:
+        if j == stoper:
             break
 
-        bufor.append(pqelem.text())
+        bufor.append(_tekst(indeks.dzieci[j]))
 
     # Uwaga: z powyższego możemy dostać całkiem ładny "bufor" zawierający linijki typu "wykład: 30" itp.,
     # ale co do założenia nie polegamy na informacji w osobnych liniach.
@@ -106,118 +375,89 @@ def str_sposobyGodzinyRealizacji(sposoby_i_godziny):
     return ", ".join(map(lambda kv: f"{kv[0]}: {kv[1]}", sposoby_i_godziny.items()))
 
 
-def wyciagnijStyleLeft(pqelem):
+def klastrujPolozenia(polozenia, tolerancja=TolerancjaKolumnTabeli_pt):
     """
-    Wyciągnij przesunięcie 'left' przy absolutnym pozycjonowaniu specyfikowanym
-    w atrybucie 'style'.
+    Pogrupuj położenia (np. ``left`` akapitów) w klastry, w których kolejne
+    posortowane wartości różnią się o nie więcej niż `tolerancja`.
 
     Parameters
     ----------
-    pqelem : PyQuery
-        Element do analizy.
+    polozenia : iterable of float
+        Położenia w pt.
+    tolerancja : float
+        Maksymalny odstęp w pt pomiędzy sąsiednimi położeniami w klastrze.
 
     Returns
     -------
-    leftstr : str
-        Długość w jednostkach CSS, np. '123pt'.
-
-    """
-    leftstr = re.search("left\\s*:\\s*(\\d+(?:pt|px|cm)|\\d+\\.\\d+(?:pt|px|cm))", pqelem.attr.style)
-    return leftstr[1] if leftstr else None
+    list of float
+        Posortowane początki (najmniejsze wartości) klastrów.
 
-def cssDlwPt(cssdl):
     """
-    Zamienia jednostkę długości absolutnej w formacie CSS na liczbowę będącą
-    długością w pt (72 pt = 1 inch tzn. cal).
-
-    Parameters
-    ----------
-    cssdl : str
-        Długość absolutna dopuszczalna przez CSS, np. `43.0pt`
+    poczatki = []
+    poprzednie = None
 
-    Returns
-    -------
-    float
-        Długość w pt.
+    for x in sorted(polozenia):
+        if poprzednie is None or x - poprzednie > tolerancja:
+            poczatki.append(x)
+        poprzednie = x
 
-    """
-    if not cssdl: # Early exit if None or empty string
-        return None
-    
-    unitSymbMatch = re.search("[a-z]{1,2}", cssdl)
-    unitSymb = unitSymbMatch[0]
-    preUnitDigits = cssdl[0:unitSymbMatch.start()]
-    numval = float(preUnitDigits)
-
-    if unitSymb == "pt":
-        return numval
-    elif unitSymb == "px":
-        return numval * 72 / 96
-    elif unitSymb == "mm":
-        return numval / 25.4 * 72
-    elif unitSymb == "cm":
-        return numval / 2.54 * 72
-    elif unitSymb == "in":
-        return numval * 72
-    else:
-        raise ValueError(f"nieznana jednostka długości '{unitSymb}'")
+    return poczatki
 
 
-def pgq_wyciagnijWarunkiZaliczenia(pgq, kotwica, verbosity=0):
-    nastepne = kotwica.nextAll()
-    pierwszyPo = None
+def pgq_wyciagnijWarunkiZaliczenia(pgq, indeks=None, verbosity=0,
+                                   tolerancja=TolerancjaKolumnTabeli_pt):
+    indeks = indeks or IndeksStrony(pgq[0])
+    lewo = indeks.lewo()
+    # Treść tabeli to akapity za nagłówkiem "Warunki zaliczenia przedmiotu"
+    # (ostatnia kolumna nagłówka). Elementy bez położenia są pomijane.
+    pozycje = [j for j in indeks.nastepnePozycje(indeks.pozycje("Warunki zaliczenia przedmiotu"))
+               if not math.isnan(lewo[j])]
 
-    try:
+    if not pozycje:
         # Potrzebne na przypadki, kiedy cała treść przeleje się na kolejną stronę
         # i nie ma żadnej treści na tej stronie (poza nagłówkiem)
-        pierwszyPo = PyQuery(nastepne[0])
-    except IndexError as e:
         return [] # Pusta tabela nie powinna wyrządzać dalszych szkód przy łączeniu.
 
-    # Inicjalizacja.
-    leftPosPt = [ cssDlwPt(wyciagnijStyleLeft(pierwszyPo)), 0, 0 ]
-    bufory = [ [pierwszyPo.text()], [], [] ]
-    kol = 0
-
+    # Pierwszy akapit za nagłówkiem wyznacza lewą krawędź tabeli; pierwszy
+    # akapit na lewo od niej (np. nagłówek kolejnej sekcji) kończy tabelę.
+    lewoAkap = [lewo[j] for j in pozycje]
+    krawedz = lewoAkap[0] - tolerancja
+    koniec = next((k for k, x in enumerate(lewoAkap) if x < krawedz), len(lewoAkap))
+    pozycje, lewoAkap = pozycje[:koniec], lewoAkap[:koniec]
+
+    # Kolumny tabeli to klastry położeń od lewej wszystkich akapitów tabeli
+    # i komórek nagłówka, więc komórka jest przypisana do swojej kolumny nawet
+    # wtedy, gdy w danym rzędzie (lub wszystkich rzędach) poprzednia komórka
+    # jest pusta.
+    naglowek = [lewo[i] for kotwica in ("Rodzaj zajęć", "Formy zaliczenia",
+                                        "Warunki zaliczenia przedmiotu")
+                for i in indeks.pozycje(kotwica) if lewo[i] >= krawedz]
+    kolumny = klastrujPolozenia(lewoAkap + naglowek, tolerancja)
+    kolAkap = [bisect.bisect_right(kolumny, x) - 1 for x in lewoAkap]
+    liczbaKol = max(len(kolumny), 3) # Co najmniej rodzaj, forma i warunki zaliczenia.
+
+    # Kod zakłada, że akapity <p> są wielo- lub jednoliniowe, wyrównane
+    # absolutnie do lewej i ułożone w kodzie HTML w kolejności linie
+    # góra do dołu, akapity lewa do prawej (kolumny tabeli),
+    # rząd tabeli z góry do dołu. Cofnięcie się do wcześniejszej kolumny
+    # oznacza zatem początek kolejnego rzędu.
     tabelaWarZal = []
+    bufory = None
+    poprzKol = liczbaKol
 
-    for elem in nastepne[1:]:
-        elemq = PyQuery(elem)
-        leftStr = wyciagnijStyleLeft(elemq)
-        leftPt = cssDlwPt(leftStr)
-
-        # Kod zakłada, że akapity <p> są wielo- lub jednoliniowe, wyrównane
-        # absolutnie do lewej i ułożone w kodzie HTML w kolejności linie
-        # góra do dołu, akapity prawa do lewej (kolumny tabeli),
-        # rząd tabeli z góry do dołu.
-        if leftPt > leftPosPt[kol]:
-            # Przejście do następnej kolumny.
-            kol += 1
-            leftPosPt[kol] = leftPt
-        elif leftPt < leftPosPt[kol]: # Jakaś nieciągłość.
-            kol = 0 # Reset kolumny do pierwszej.
-            if leftPt == leftPosPt[kol]:
-                tabelaWarZal.append( (" ".join(bufory[0]), " ".join(bufory[1]),
-                                     " ".join(bufory[2])) ) # Wypis buforów do tabeli wyjściowej.
-                # Kontynuuj z przetwarzaniem kolejnego rzędu tabeli, przy
-                # założeniu, że wyrównanie do lewej w kolejnych rzędach
-                # jest identyczne, jak w pierwszym.
-                bufory = [[], [], []] # W tym celu potrzeba nowych buforów na tekst.
-            else:
-                # Coś jest inaczej z położeniem poziomym i nie pasuje, przerwij.
-                break
-
-        bufory[kol].append(elemq.text())
+    for j, kol in zip(pozycje, kolAkap):
+        if kol < poprzKol:
+            bufory = [[] for _ in range(liczbaKol)]
+            tabelaWarZal.append(bufory)
+        bufory[kol].append(_tekst(indeks.dzieci[j]))
+        poprzKol = kol
 
-    # "Sprzątanie" jeśli skanowanie dotarło do końca strony.
-    tabelaWarZal.append( (" ".join(bufory[0]), " ".join(bufory[1]),
-                         " ".join(bufory[2])) )
+    return [tuple(" ".join(bufor) for bufor in bufory) for bufory in tabelaWarZal]
 
-    return tabelaWarZal
 
-
-def pgq_wyciagnijWymaganiaWstep(pgq):
-    kotwica = pgq.children("p:contains('Wymagania wstępne i dodatkowe')")
+def pgq_wyciagnijWymaganiaWstep(pgq, indeks=None):
+    indeks = indeks or IndeksStrony(pgq[0])
+    kotwica = indeks.pozycje("Wymagania wstępne i dodatkowe")
     # Generalnie to powinna być ostatnia sekcja, a nawet jeśli nie jest, to
     # można skorzystać z już wypróbowanej metody wykrywania "cofnięcia wózka"
     # aby znaleźć koniec.
@@ -225,155 +465,963 @@ def pgq_wyciagnijWymaganiaWstep(pgq):
     if not kotwica:
         raise RuntimeError("brakuje kotwicy dla szukania 'Wymagania wstępne i dodatkowe'")
 
-    bufor = []
-    nastepne = kotwica.nextAll()
-    pierwszyPo = PyQuery(nastepne[0])
+    nastepne = indeks.nastepnePozycje(kotwica)
+    lewo = indeks.lewo()
+    leftPtOryg = lewo[nastepne[0]]
+
+    # Ciąg dalszy akapitu, rozbitego na osobne linijki, ma położenie od lewej
+    # nie mniejsze niż pierwsza linijka. Gdy położenie się cofnęło, pewnie
+    # zaczęło się coś innego.
+    koniec = next((k for k, j in enumerate(nastepne) if not lewo[j] >= leftPtOryg), len(nastepne))
+
+    return " ".join(_tekst(indeks.dzieci[j]) for j in nastepne[:koniec])
+
+
+def pgq_wyciagnijNumerStrony(pgq):
+    return int(re.match("page(\\d+)", pgq.attr.id)[1])
+
+
+# Silnik lxml. Funkcje ``lx_`` biorą element lxml ``<div>`` strony zamiast
+# obiektu PyQuery. Te, które i tak działają wyłącznie na `IndeksStrony`,
+# korzystają z implementacji ``pgq_``.
+_xp_Strony = _XPath("//div")
+_xp_CzySylabus = _XPath("normalize-space(*[1][self::p]) = 'Sylabusy'")
+_xp_Pogrubione = _XPath("b")
+
+
+@functools.lru_cache(maxsize=None)
+def _parserHTML():
+    return etree.HTMLParser(encoding="utf-8")
+
+
+def lx_czySylabus(div):
+    return _xp_CzySylabus(div)
+
+
+def lx_wyciagnijNazwePrzedmiotu(div, indeks=None):
+    return pgq_wyciagnijNazwePrzedmiotu(None, indeks or IndeksStrony(div))
+
+
+def lx_wyciagnijSciezke(div, indeks=None):
+    indeks = indeks or IndeksStrony(div)
+    kotwice = [p for p in indeks.elementy("Ścieżka")
+               if any(_tekst(b) == "Ścieżka" for b in _xp_Pogrubione(p))]
+    nastepny = kotwice[-1].getnext()
+
+    return _tekst(nastepny) if nastepny is not None else "" # to powinna być nazwa ścieżki.
+
+
+def lx_wyciagnijFormeWeryfikacji(div, indeks=None):
+    indeks = indeks or IndeksStrony(div)
+    teksty = (_tekst(indeks.dzieci[i + 1])
+              for i in indeks.pozycje("Forma weryfikacji uzyskanych efekt")
+              if i + 1 < len(indeks.dzieci) and indeks.dzieci[i + 1].tag == "p")
+    return " ".join(teksty)
+
+
+def lx_wyciagnijSposobyGodzinyRealizacji(div, indeks=None):
+    return pgq_wyciagnijSposobyGodzinyRealizacji(None, indeks or IndeksStrony(div))
+
+
+def lx_wyciagnijWarunkiZaliczenia(div, indeks=None):
+    return pgq_wyciagnijWarunkiZaliczenia(None, indeks or IndeksStrony(div))
+
+
+def lx_wyciagnijWymaganiaWstep(div, indeks=None):
+    return pgq_wyciagnijWymaganiaWstep(None, indeks or IndeksStrony(div))
+
+
+def lx_wyciagnijNumerStrony(div):
+    return int(re.match("page(\\d+)", div.get("id"))[1])
+
+
+def _czySylabusIndeks(div):
+    return IndeksStrony(div).czySylabus()
+
+
+# Zestawy funkcji ekstrakcji dla silników wybieranych opcją --silnik.
+# "strona" opakowuje element <div> strony w obiekt, który dostają pozostałe
+# funkcje.
+SilnikiEkstrakcji = {
+    "pyquery": {"strona": PyQuery,
+                "czySylabus": _czySylabusIndeks,
+                "numerStrony": pgq_wyciagnijNumerStrony,
+                "nazwaPrzedmiotu": pgq_wyciagnijNazwePrzedmiotu,
+                "sciezka": pgq_wyciagnijSciezke,
+                "formaWeryfikacji": pgq_wyciagnijFormeWeryfikacji,
+                "sposobyGodziny": pgq_wyciagnijSposobyGodzinyRealizacji,
+                "warunkiZaliczenia": pgq_wyciagnijWarunkiZaliczenia,
+                "wymaganiaWstep": pgq_wyciagnijWymaganiaWstep},
+    "lxml": {"strona": lambda div: div,
+             "czySylabus": lx_czySylabus,
+             "numerStrony": lx_wyciagnijNumerStrony,
+             "nazwaPrzedmiotu": lx_wyciagnijNazwePrzedmiotu,
+             "sciezka": lx_wyciagnijSciezke,
+             "formaWeryfikacji": lx_wyciagnijFormeWeryfikacji,
+             "sposobyGodziny": lx_wyciagnijSposobyGodzinyRealizacji,
+             "warunkiZaliczenia": lx_wyciagnijWarunkiZaliczenia,
+             "wymaganiaWstep": lx_wyciagnijWymaganiaWstep}
+}
+
+
+def _ostrzez(ostrzezenia, komunikat):
+    """
+    Zgłoś ostrzeżenie - wypisz je od razu albo, jeśli podano listę
+    `ostrzezenia`, dołącz je do niej (np. przy przetwarzaniu wsadowym, gdzie
+    ostrzeżenia są wypisywane dopiero po zakończeniu, w ustalonej kolejności).
+    """
+    if ostrzezenia is None:
+        print(komunikat)
+    else:
+        ostrzezenia.append(komunikat)
+
+
+def _szczytRSS(kogo="self"):
+    """
+    Szczytowy RSS (w bajtach) bieżącego procesu (``kogo="self"``) lub
+    zakończonych procesów potomnych (``kogo="potomkowie"``), albo None, jeśli
+    moduł `resource` jest niedostępny.
+    """
+    if resource is None:
+        return None
+
+    szczyt = resource.getrusage(resource.RUSAGE_SELF if kogo == "self"
+                                else resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux podaje wartość w KiB, macOS w bajtach.
+    return szczyt if sys.platform == "darwin" else szczyt * 1024
+
+
+def _rozklad(probki):
+    """Podsumowanie rozkładu próbek: liczność, min, średnia, percentyle, max."""
+    probki = sorted(probki)
+    n = len(probki)
+    percentyl = lambda p: probki[min(n - 1, max(0, math.ceil(p / 100 * n) - 1))]
+
+    return {"n": n, "min": probki[0], "srednia": sum(probki) / n,
+            "p50": percentyl(50), "p90": percentyl(90), "p99": percentyl(99),
+            "max": probki[-1]}
+
+
+class Metryki:
+    """
+    Pomiary wydajności przetwarzania (opcje ``--metryki`` i ``--profil``).
+
+    Zbiera:
+
+    * czas zegarowy i czas procesora etapów przetwarzania (`etap`), np.
+      konwersji mutool, parsowania, poszczególnych funkcji ``pgq_``, zapisu,
+    * próbki czasów (`probka`), z których w raporcie liczone są rozkłady,
+      np. czas przetwarzania strony i przedmiotu,
+    * liczniki (`licz`), np. stron tytułowych i stron z tabelą warunków,
+    * szczytowy RSS procesów.
+
+    Obiekty bez profilera można przesyłać pomiędzy procesami i łączyć
+    (`polacz`), np. przy przetwarzaniu wsadowym w puli procesów.
+    """
+
+    def __init__(self, profilowanie=False):
+        self.etapy = {} # nazwa -> [liczba wywołań, czas zegarowy, czas procesora]
+        self.probki = {}
+        self.liczniki = {}
+        self.szczytRSS = None
+        self.profiler = cProfile.Profile() if profilowanie else None
+
+    @contextlib.contextmanager
+    def etap(self, nazwa):
+        """Zmierz czas wykonania bloku ``with`` jako etap `nazwa`."""
+        t0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wpis = self.etapy.setdefault(nazwa, [0, 0.0, 0.0])
+            wpis[0] += 1
+            wpis[1] += time.perf_counter() - t0
+            wpis[2] += time.process_time() - cpu0
+
+    @contextlib.contextmanager
+    def profiluj(self):
+        """Profiluj blok ``with`` profilerem cProfile (jeśli jest włączony)."""
+        if self.profiler is None:
+            yield
+            return
+
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+
+    def probka(self, nazwa, wartosc):
+        self.probki.setdefault(nazwa, []).append(wartosc)
+
+    def licz(self, nazwa, ile=1):
+        self.liczniki[nazwa] = self.liczniki.get(nazwa, 0) + ile
+
+    def zanotujPamiec(self):
+        """Zapamiętaj szczytowy RSS bieżącego procesu (np. procesu w puli)."""
+        szczyt = _szczytRSS()
+        if szczyt is not None:
+            self.szczytRSS = max(self.szczytRSS or 0, szczyt)
+
+    def polacz(self, inne):
+        """Dołącz pomiary z innego obiektu `Metryki`."""
+        for nazwa, (wywolania, czas, cpu) in inne.etapy.items():
+            wpis = self.etapy.setdefault(nazwa, [0, 0.0, 0.0])
+            wpis[0] += wywolania
+            wpis[1] += czas
+            wpis[2] += cpu
+        for nazwa, probki in inne.probki.items():
+            self.probki.setdefault(nazwa, []).extend(probki)
+        for nazwa, ile in inne.liczniki.items():
+            self.licz(nazwa, ile)
+        if inne.szczytRSS is not None:
+            self.szczytRSS = max(self.szczytRSS or 0, inne.szczytRSS)
+
+    def raport(self):
+        """Pomiary jako słownik gotowy do zapisu w JSON."""
+        self.zanotujPamiec()
+        potomkowie = _szczytRSS("potomkowie")
+        naMB = lambda bajty: None if bajty is None else round(bajty / 2**20, 1)
+
+        return {"etapy": {nazwa: {"wywolania": wywolania, "czas_s": czas, "cpu_s": cpu}
+                          for nazwa, (wywolania, czas, cpu) in self.etapy.items()},
+                "rozklady_s": {nazwa: _rozklad(probki)
+                               for nazwa, probki in self.probki.items() if probki},
+                "liczniki": dict(self.liczniki),
+                "szczytRSS_MB": naMB(self.szczytRSS),
+                "szczytRSS_potomkow_MB": naMB(potomkowie)}
+
+    def zapisz(self, nazwaPliku):
+        with open(nazwaPliku, "wt", encoding="utf-8") as f:
+            json.dump(self.raport(), f, ensure_ascii=False, indent=2)
+
+
+def _etap(metryki, nazwa):
+    """`Metryki.etap` albo pusty kontekst, gdy nie zbieramy metryk."""
+    return metryki.etap(nazwa) if metryki is not None else contextlib.nullcontext()
+
+
+def _zmierz(metryki, funkcja, *args):
+    """Wywołaj `funkcja(*args)` jako etap nazwany tak, jak funkcja."""
+    if metryki is None:
+        return funkcja(*args)
+
+    with metryki.etap(funkcja.__name__):
+        return funkcja(*args)
+
+
+def _mierzIteracje(metryki, nazwa, iterowalny):
+    """
+    Przekaż dalej elementy `iterowalny`, licząc czas pobierania każdego
+    z nich jako etap `nazwa` (np. parsowanie kolejnych stron przy czytaniu
+    strumieniowym).
+    """
+    if metryki is None:
+        yield from iterowalny
+        return
+
+    iterator = iter(iterowalny)
+    while True:
+        with metryki.etap(nazwa):
+            try:
+                element = next(iterator)
+            except StopIteration:
+                return
+        yield element
+
+
+_ZnacznikStrony = b'<div id="page'
+
+
+def _fragmentyStron(plik, rozmiarBloku=1 << 20):
+    """
+    Dziel dokument HTML od mutool draw (obiekt plikowy otwarty binarnie) na
+    kolejne fragmenty, z których każdy zaczyna się od ``<div id="pageN"``
+    jednej strony. Ostatni fragment zawiera też zakończenie dokumentu.
+    """
+    bufor = bytearray()
+    poczatek = -1 # Początek bieżącej strony w buforze (-1 - jeszcze przed pierwszą).
+
+    for blok in iter(lambda: plik.read(rozmiarBloku), b""):
+        # Przeszukiwany jest tylko nowy blok - razem z końcówką bufora, bo
+        # znacznik może być przecięty granicą bloku - więc długa strona nie
+        # jest przeglądana od początku przy każdym bloku.
+        szukajOd = max(len(bufor) - len(_ZnacznikStrony) + 1, poczatek + 1, 0)
+        bufor += blok
+        while (nastepny := bufor.find(_ZnacznikStrony, szukajOd)) >= 0:
+            if poczatek >= 0:
+                yield bytes(bufor[poczatek:nastepny])
+            poczatek = szukajOd = nastepny
+            szukajOd += 1
+
+        if poczatek > 0:
+            del bufor[:poczatek]
+            poczatek = 0
+        elif poczatek < 0:
+            del bufor[:-len(_ZnacznikStrony)]
+
+    if poczatek >= 0:
+        yield bytes(bufor[poczatek:])
+
+
+def strony_html(nazwa_plik_wej):
+    """
+    Czytaj plik HTML od mutool draw przyrostowo i zwracaj kolejne strony
+    ``<div id="pageN">`` zaraz po ich sparsowaniu.
+
+    Surowe bajty dokumentu są dzielone na strony po znaczniku
+    ``<div id="page`` (`_fragmentyStron`), a każda strona jest parsowana
+    osobno, jako samodzielny fragment dokumentu - zużycie pamięci nie rośnie
+    więc z liczbą stron (w przeciwieństwie do ``etree.iterparse``, którego
+    parser przyrostowy libxml2 dla HTML zachowuje w buforze całe przeczytane
+    wejście).
+
+    Parameters
+    ----------
+    nazwa_plik_wej : str
+        Ścieżka do pliku HTML (lub obiekt plikowy otwarty binarnie).
+
+    Yields
+    ------
+    lxml.etree._Element
+        Element ``<div>`` reprezentujący pojedynczą stronę.
+
+    """
+    with contextlib.ExitStack() as stos:
+        plik = nazwa_plik_wej
+        if isinstance(nazwa_plik_wej, (str, os.PathLike)):
+            plik = stos.enter_context(open(nazwa_plik_wej, "rb"))
+
+        for fragment in _fragmentyStron(plik):
+            div = etree.fromstring(fragment, _parserHTML()).find("body/div")
+            if div is not None and re.match("page\\d+", div.get("id", "")):
+                yield div
+
+
+_xp_ZnakiStext = _XPath("char/@c")
+
 
-    leftPtOryg = cssDlwPt(wyciagnijStyleLeft(pierwszyPo))
-    bufor.append(pierwszyPo.text())
+def _akapitZLiniiStext(div, linia):
+    """
+    Dołącz do `div` akapit ``<p>`` odpowiadający linii ``<line>`` z wyjścia
+    ``mutool draw -F stext``, z takim samym położeniem (``style``) i
+    pogrubieniami (``<b>``), jakie miałby w wyjściu HTML.
+    """
+    x0, y0, x1, y1 = map(float, linia.get("bbox").split())
+    top, wysokosc = y0, y1 - y0
+    akapit = etree.SubElement(div, "p")
+    ostatni = None # Ostatni element <b> w akapicie, do którego tekst idzie w `tail`.
+    pierwszyZnak = True
+
+    for czcionka in linia.iter("font"):
+        znaki = _xp_ZnakiStext(czcionka)
+        if not znaki:
+            continue
+
+        if pierwszyZnak:
+            # Tak samo liczy położenie pionowe mutool przy generowaniu HTML.
+            wysokosc = float(czcionka.get("size"))
+            top = float(czcionka[0].get("y")) - wysokosc * 0.8
+            pierwszyZnak = False
 
-    for p in nastepne[1:]:
-        p = PyQuery(p)
-        leftPt = cssDlwPt(wyciagnijStyleLeft(p))
+        tekst = "".join(znaki)
 
-        if leftPt >= leftPtOryg:
-            # Ciąg dalszy akapitu, rozbitego na osobne linijki.
-            bufor.append(p.text())
+        if "Bold" in czcionka.get("name", ""):
+            if ostatni is not None and not ostatni.tail:
+                ostatni.text += tekst # Sklej sąsiednie pogrubione fragmenty.
+            else:
+                ostatni = etree.SubElement(akapit, "b")
+                ostatni.text = tekst
+        elif ostatni is None:
+            akapit.text = (akapit.text or "") + tekst
         else:
-            # Położenie od lewej się cofnęło, pewnie zaczęło się coś innego.
-            break
+            ostatni.tail = (ostatni.tail or "") + tekst
 
-    return " ".join(bufor)
+    akapit.set("style", f"top:{top:.1f}pt;left:{x0:.1f}pt;line-height:{wysokosc:.1f}pt")
 
 
-def pgq_wyciagnijNumerStrony(pgq):
-    return int(re.match("page(\\d+)", pgq.attr.id)[1])
+def strony_stext(nazwa_plik_wej):
+    """
+    Czytaj przyrostowo wyjście ``mutool draw -F stext`` i zwracaj kolejne
+    strony w tym samym modelu, co `strony_html` dla HTML: element
+    ``<div id="pageN">`` z akapitami ``<p>`` (po jednym na linię tekstu)
+    i elementami ``<img>`` w miejscu bloków z obrazkami.
+
+    Dzięki temu cała dalsza logika WarZal działa bez zmian, a pominięty
+    zostaje etap generowania (i parsowania) stylizowanego HTML.
+
+    Yields
+    ------
+    lxml.etree._Element
+        Element ``<div>`` reprezentujący pojedynczą stronę.
+
+    """
+    for _, strona in etree.iterparse(nazwa_plik_wej, events=("end",), tag="page"):
+        div = etree.Element("div", id=strona.get("id"))
+
+        for blok in strona:
+            if blok.tag == "image":
+                x0, y0, x1, y1 = map(float, blok.get("bbox").split())
+                etree.SubElement(div, "img", style=f"position:absolute;top:{y0:.1f}pt;left:{x0:.1f}pt;"
+                                                   f"width:{x1 - x0:.1f}pt;height:{y1 - y0:.1f}pt")
+            elif blok.tag == "block":
+                for linia in blok.iter("line"):
+                    _akapitZLiniiStext(div, linia)
+
+        # Strona stext nie będzie już potrzebna - model strony to nowy element.
+        strona.clear()
+        rodzic = strona.getparent()
+        if rodzic is not None:
+            rodzic.remove(strona)
+
+        yield div
 
 
-def warzal_PyQuery(nazwa_plik_wej, verbosity=0):
+def _odciskBloku(blok, silnik):
+    """
+    Odcisk bloku stron jednego przedmiotu (od strony tytułowej do następnej):
+    skrót serializacji elementów stron - tekstu akapitów z pogrubieniami
+    i stylu z położeniem - oraz przesunięć numerów stron względem pierwszej.
+    Nie zależy od numerów stron ani treści obrazków, więc ten sam sylabus
+    w różnych dokumentach ma ten sam odcisk.
+    """
+    skrot = hashlib.blake2b(silnik.encode("utf-8"), digest_size=20)
+    pierwsza = None
+
+    for div, _ in blok:
+        nrStrony = lx_wyciagnijNumerStrony(div)
+        pierwsza = nrStrony if pierwsza is None else pierwsza
+        skrot.update(f"\f{nrStrony - pierwsza}\n".encode("ascii"))
+        for el in div:
+            if el.tag == "img":
+                skrot.update(f"<img style={el.get('style')!r}>".encode("utf-8"))
+            else:
+                skrot.update(etree.tostring(el, encoding="utf-8", with_tail=False))
+            skrot.update(b"\n")
+
+    return skrot.hexdigest()
+
+
+def warzal_rekordy(nazwa_plik_wej, verbosity=0, strumieniowo=False, ostrzezenia=None,
+                   metryki=None, silnik="pyquery", strony=None, spojnosc=True, pamiecBlokow=None,
+                   bledy=None, odStrony=None, znanePrzedmioty=()):
+    """
+    Przetwarzaj dokument strona po stronie i zwracaj kolejne przedmioty, gdy
+    tylko są kompletne, tzn. gdy strona tytułowa rozpoczyna następny
+    przedmiot (albo kończy się dokument).
+
+    Parametry jak w `warzal_PyQuery`; jeśli `spojnosc` jest prawdą, spójność
+    sposobów realizacji z tabelą form zaliczenia jest sprawdzana dla każdego
+    przedmiotu w chwili jego zakończenia.
+
+    Jeśli podano `pamiecBlokow` (`PamiecBlokow`), strony przedmiotu są
+    najpierw zbierane w blok, a jego odcisk (`_odciskBloku`) jest szukany
+    w pamięci - przy trafieniu funkcje ekstrakcji są pomijane, a rekord jest
+    brany z pamięci (z numerem strony tego dokumentu). Bloki, przy których
+    ekstrakcji pojawiły się ostrzeżenia, nie są zapamiętywane.
+
+    Jeśli podano listę `bledy`, wyjątek przy przetwarzaniu strony nie przerywa
+    dokumentu: do listy trafia słownik ``{"strona", "przedmiot", "wyjatek"}``,
+    a bieżący przedmiot jest pomijany aż do następnej strony tytułowej.
+
+    `odStrony` pomija strony o numerach nie większych niż podany (wznowienie
+    dokumentu po ostatnim zwróconym przedmiocie - przedmiot jest zwracany,
+    zanim zostanie przetworzona jakakolwiek strona następnego), a
+    `znanePrzedmioty` to nazwy przedmiotów zwróconych już wcześniej (dla
+    ostrzeżeń o powtórzeniach).
+
+    Yields
+    ------
+    tuple
+        (nazwa przedmiotu, `RekordPrzedmiotu`) - rekord zawiera też pola
+        strukturalne, np. ``_sposobyRealizacji``. Sylabus, którego nazwa
+        się powtórzyła, jest zwracany jako osobny rekord o tej samej nazwie.
+
+    """
+    ekstr = SilnikiEkstrakcji[silnik]
+
     def isSylabusPage(index, div):
-        return bool(PyQuery(div).children("p:first-child").text() == "Sylabusy")
+        sylabus = ekstr["czySylabus"](div)
+        if metryki is not None:
+            metryki.licz("strony")
+            metryki.licz("strony_sylabusu" if sylabus else "strony_pominiete")
+        return sylabus
 
     if verbosity >= 1:
         print(f"nazwa_plik_wej = {nazwa_plik_wej}")
 
-    pq = PyQuery(filename=nazwa_plik_wej)
+    if strony is not None:
+        # Gotowe źródło stron, np. `strony_mutool` - wtedy nazwa_plik_wej
+        # służy tylko do komunikatów. Czas pobrania strony obejmuje tu też
+        # oczekiwanie na konwersję.
+        sylabusPgs = (div for div in _mierzIteracje(metryki, "potok", strony)
+                      if _zmierz(metryki, isSylabusPage, None, div))
+    elif nazwa_plik_wej.lower().endswith(".stext"):
+        sylabusPgs = (div for div in _mierzIteracje(metryki, "parsowanie",
+                                                    strony_stext(nazwa_plik_wej))
+                      if _zmierz(metryki, isSylabusPage, None, div))
+    elif strumieniowo:
+        # Strony są czytane i przetwarzane pojedynczo, bez budowania drzewa
+        # całego dokumentu w pamięci.
+        sylabusPgs = (div for div in _mierzIteracje(metryki, "parsowanie",
+                                                    strony_html(nazwa_plik_wej))
+                      if _zmierz(metryki, isSylabusPage, None, div))
+    elif silnik == "lxml":
+        with _etap(metryki, "parsowanie"):
+            drzewo = etree.parse(nazwa_plik_wej, _parserHTML())
+        with _etap(metryki, "isSylabusPage"):
+            sylabusPgs = [div for div in _xp_Strony(drzewo) if isSylabusPage(None, div)]
+    else:
+        with _etap(metryki, "parsowanie"):
+            pq = PyQuery(filename=nazwa_plik_wej)
+        with _etap(metryki, "isSylabusPage"):
+            sylabusPgs = pq("div").filter(isSylabusPage)
 
-    sylabusPgs = pq("div").filter(isSylabusPage)
+    if odStrony is not None:
+        sylabusPgs = (div for div in sylabusPgs if lx_wyciagnijNumerStrony(div) > odStrony)
 
     nazwaPrzedm = None # Zmienna potrzebuje persystencji pomiędzy obrotami pętli po stronach.
     stronaPocz = 0
+    przedmDict = None # Pola bieżącego przedmiotu.
+    nazwyPrzedm = set(znanePrzedmioty)
+    liczbaZnanych = len(nazwyPrzedm)
+    czasPrzedm = 0.0 # Łączny czas przetwarzania stron przedmiotu (dla metryk).
+    ostrzezeniaBloku = 0 # Ostrzeżenia z ekstrakcji bieżącego bloku stron (dla pamięci bloków).
+
+    def zakonczPrzedmiot():
+        if spojnosc:
+            _sprawdzSpojnoscPrzedmiotu(nazwaPrzedm, przedmDict, ostrzezenia)
+        if metryki is not None:
+            metryki.probka("przedmiot", czasPrzedm)
+        return nazwaPrzedm, przedmDict
+
+    def oddajPrzedmiot():
+        # Zwraca zakończony przedmiot; wynikiem jest czas spędzony poza
+        # generatorem, który nie wlicza się do czasu bieżącej strony.
+        nonlocal czasPrzedm
+        rekord = zakonczPrzedmiot()
+        czasPrzedm = 0.0
+        t0 = time.perf_counter()
+        yield rekord
+        return time.perf_counter() - t0
+
+    def ostrzezZBloku(komunikat):
+        nonlocal ostrzezeniaBloku
+        ostrzezeniaBloku += 1
+        _ostrzez(ostrzezenia, komunikat)
+
+    def przetworzBlok(blok):
+        # Zwraca strony bloku do przetworzenia albo, przy trafieniu w pamięci
+        # bloków, tylko stronę tytułową z zapamiętanym przedmiotem. Po
+        # przetworzeniu ostatniej strony zapamiętuje wynik (wtedy `przedmDict`
+        # jest kompletnym przedmiotem tego bloku).
+        nonlocal ostrzezeniaBloku
+        odcisk = None
+        if blok[0][1].czyTytulowa():
+            odcisk = _zmierz(metryki, _odciskBloku, blok, silnik)
+            zapamietany = pamiecBlokow.wczytaj(odcisk)
+            if metryki is not None:
+                metryki.licz("pamiec_blokow_trafienia" if zapamietany else "pamiec_blokow_chybienia")
+            if zapamietany is not None:
+                yield blok[0] + (zapamietany,)
+                return
+
+        ostrzezeniaBloku = 0
+        for pg, indeks in blok:
+            yield pg, indeks, None
+        # Blok z błędem strony (zob. `bledy`) ma też ostrzeżenie, a jego
+        # przedmiot jest pominięty - nie trafia do pamięci.
+        if odcisk is not None and not ostrzezeniaBloku and przedmDict is not None:
+            pamiecBlokow.zapisz(odcisk, nazwaPrzedm, przedmDict)
+
+    def stronyBlokami():
+        # Strony są zbierane aż do następnej strony tytułowej, żeby odcisk
+        # bloku był znany przed ekstrakcją pierwszej z nich.
+        blok = []
+        for pg in sylabusPgs:
+            indeks = IndeksStrony(pg)
+            if blok and indeks.czyTytulowa():
+                yield from przetworzBlok(blok)
+                blok = []
+            blok.append((pg, indeks))
+        if blok:
+            yield from przetworzBlok(blok)
+
+    if pamiecBlokow is None:
+        strony = ((pg, None, None) for pg in sylabusPgs)
+    else:
+        strony = stronyBlokami()
+
+    for pg, indeks, zapamietany in strony:
+        t0Strony = time.perf_counter()
+        nrStrony = None
+        try:
+            pgq = ekstr["strona"](pg)
+            if indeks is None:
+                indeks = IndeksStrony(pg)
+            nrStrony = ekstr["numerStrony"](pgq)
+
+            if zapamietany is not None:
+                # Strona tytułowa bloku, który jest w pamięci bloków - przedmiot
+                # bez ekstrakcji, z numerem strony tego dokumentu.
+                if metryki is not None:
+                    metryki.licz("strony_tytulowe")
+                if przedmDict is not None:
+                    t0Strony += yield from oddajPrzedmiot()
+                nazwaPrzedm, przedmDict = zapamietany
+                stronaPocz = przedmDict.strona = nrStrony
+
+                if nazwaPrzedm in nazwyPrzedm:
+                    _ostrzez(ostrzezenia, _komunikatPowtorzenia(nazwaPrzedm, nrStrony))
+                nazwyPrzedm.add(nazwaPrzedm)
+
+            # Trzeba stwierdzić, czy to jest pierwsza strona przedmiotu czy nie.
+            # Jesli tak, trzeba wyciągnąć nazwę przedmiotu.
+            elif indeks.czyTytulowa(): # w oparciu o obrazek nad tytułem (lub kotwice tekstowe)
+                if metryki is not None:
+                    metryki.licz("strony_tytulowe")
+                if przedmDict is not None:
+                    # Poprzedni przedmiot jest kompletny - zwracamy go, zanim
+                    # cokolwiek z tej strony zostanie przetworzone (zob. `odStrony`).
+                    t0Strony += yield from oddajPrzedmiot()
+                nazwaPrzedm = _zmierz(metryki, ekstr["nazwaPrzedmiotu"], pgq, indeks)
+                #print(repr(nazwaPrzedm)) # Żeby dodać cudzysłowy dla klarownosci.
+                sciezka = _zmierz(metryki, ekstr["sciezka"], pgq, indeks)
+                stronaPocz = nrStrony
+
+                if verbosity >= 1:
+                    print(f"Przedmiot '{nazwaPrzedm}', ścieżka '{sciezka}', strona {stronaPocz}")
+
+                if sciezka != "-":
+                    # Jeśli ścieżka jest inna niż domyślny placeholder '-', to
+                    # uzupełnij nazwę przedmiotu ścieżką przez postfix
+                    # w nawiasach kwadratowych.
+                    nazwaPrzedm = nazwaPrzedm + f" [{sciezka}]"
+
+                formaWeryf = _zmierz(metryki, ekstr["formaWeryfikacji"], pgq, indeks)
+                sposobyGodziny = _zmierz(metryki, ekstr["sposobyGodziny"], pgq, indeks)
+
+                przedmDict = RekordPrzedmiotu(stronaPocz, formaWeryf, sposobyGodziny)
+
+                # Sprawdź czy był już taki przedmiot (w `warzal_PyQuery` powtórzony
+                # sylabus uzupełnia pierwszy, zamiast go nadpisywać).
+                if nazwaPrzedm in nazwyPrzedm:
+                    _ostrzez(ostrzezenia, _komunikatPowtorzenia(nazwaPrzedm, nrStrony))
+                nazwyPrzedm.add(nazwaPrzedm)
+            elif nazwaPrzedm and indeks.zawiera("Rodzaj zajęć") and \
+                indeks.zawiera("Formy zaliczenia") and \
+                indeks.zawiera("Warunki zaliczenia przedmiotu"):
+                # Trafiliśmy na tabelę "Informacje rozszerzone", gdzie są (powinny być)
+                # warunki zaliczenia przedmiotu.
+                # Może to być jako `elif`, bo ta tabela nigdzie* nie występuje
+                # (*nie widziałem żeby występowała) na tej samej stronie, co
+                # tytuł przedmiotu - zatem nie dojdzie do interferencji i wykluczania
+                # się.
+                if metryki is not None:
+                    metryki.licz("strony_warunkow_zaliczenia")
+
+                # Wprowadzenie ostrzeżenia na wypadek, gdyby przypadek 'if' powyżej
+                # nie chwycił kolejnego przedmiotu wystarczająco szybko.
+                sylabusDlStron = nrStrony - stronaPocz
+                if sylabusDlStron > OstrzezGdySylabusDluzszyNiz_strony:
+                    ostrzezZBloku(f"Uwaga: sylabus przedmiotu {nazwaPrzedm} (od strony {stronaPocz}, "
+                                  f"na stronie {nrStrony}) jest dłuższy niż zwykle "
+                                  f"(spodziewano się max {OstrzezGdySylabusDluzszyNiz_strony} "
+                                  f"stron, stwierdzono {sylabusDlStron}) - "
+                                  "możliwe, że nastąpiła ucieczka przy czytaniu.")
+
+                # Lepszą "kotwicą" jest nagłówek tabeli, ponieważ jest powtarzany
+                # w przypadkach, gdy treści się "rozleją" na kolejne strony.
+                tabelaWarZal = _zmierz(metryki, ekstr["warunkiZaliczenia"], pgq, indeks)
+
+                # Spłaszczenie struktury tabeli warunków zaliczenia.
+                for rodzajZaj, formaZal, *warunkiZal in tabelaWarZal:
+                    # Powinien już istnieć dict, żeby to wszystko umieścić.
+                    # Ewentualne dodatkowe kolumny tabeli dołączamy do warunków.
+                    warunkiZal = " ".join(filter(None, warunkiZal))
+
+                    # Zredukuj niestandardowe rodzaje zajęć do bardziej typowych
+                    if rodzajZaj in SlownikRodzajowZajecDoRedukcji:
+                        rodzajZaj = SlownikRodzajowZajecDoRedukcji[rodzajZaj]
+
+                    # Sprawdź, czy istnieje taka forma zajęć wśród znanych.
+                    if rodzajZaj in RodzajeZajec:
+                        przedmDict.dodajZajecia(rodzajZaj, formaZal or "<!BRAK!>", warunkiZal or "<!BRAK!>")
+                    else:
+                        przedmDict.inneUwagi = f"Napotkano nieznany rodzaj zajęć '{rodzajZaj}'. " \
+                            f"Forma zaliczenia: '{formaZal}', warunki zaliczenia: '{warunkiZal}'"
+                        ostrzezZBloku(f"Uwaga: napotkano nieznany rodzaj zajęć '{rodzajZaj}' "
+                                      f"na stronie {nrStrony} "
+                                      f"(przedmiot '{nazwaPrzedm}')")
+
+            # To może być zarówno na tej samej stronie, co formy i warunki
+            # zaliczenia, ale może równie dobrze wystąpić na osobnej stronie.
+            # Lepiej sprawdzić niezależnie od wcześniejszych przypadków.
+            if zapamietany is None and nazwaPrzedm and indeks.zawiera("Wymagania wstępne i dodatkowe"):
+                # Jest tytuł. Na razie na tym polegamy, choć niestety nie jest
+                # wykluczone, że teoretycznie możliwe jest przelanie się tekstu
+                # na kolejną stronę bez powtórzenia tytułu - wtedy będzie kiepsko :(
+                #print(pgq.children("p:contains('Wymagania wstępne i dodatkowe')"))
+                if metryki is not None:
+                    metryki.licz("strony_wymagan_wstepnych")
+                przedmDict.wymaganiaWstepne = \
+                    _zmierz(metryki, ekstr["wymaganiaWstep"], pgq, indeks)
+        except Exception as e:
+            if bledy is None:
+                raise
+            # Przedmiot, którego strony nie udało się przetworzyć, jest
+            # pomijany razem z resztą swoich stron - ekstrakcja wraca do
+            # normy na następnej stronie tytułowej.
+            komunikat = f"{type(e).__name__}: {e}"
+            bledy.append({"strona": nrStrony, "przedmiot": nazwaPrzedm, "wyjatek": komunikat})
+            ostrzezZBloku(f"Uwaga: błąd przy przetwarzaniu strony {nrStrony} "
+                          f"(przedmiot '{nazwaPrzedm}'): {komunikat} - przedmiot pominięto")
+            nazwaPrzedm, przedmDict = None, None
+
+        if metryki is not None:
+            czasStrony = time.perf_counter() - t0Strony
+            metryki.probka("strona", czasStrony)
+            if nazwaPrzedm:
+                czasPrzedm += czasStrony
+
+    if przedmDict is not None:
+        yield zakonczPrzedmiot()
+
+    if metryki is not None:
+        metryki.licz("przedmioty", len(nazwyPrzedm) - liczbaZnanych)
+
+
+def warzal_PyQuery(nazwa_plik_wej, verbosity=0, strumieniowo=False, ostrzezenia=None,
+                   metryki=None, silnik="pyquery", strony=None, pamiecBlokow=None,
+                   postep=None):
+    """
+    Słownik wszystkich przedmiotów dokumentu (nazwa -> `RekordPrzedmiotu`), zob.
+    `warzal_rekordy`. Spójność przedmiotów jest sprawdzana po przetworzeniu
+    całego dokumentu.
+
+    Jeśli podano `postep` (`PostepDokumentu`), przedmioty zapisane już
+    w dzienniku przetwarzania są brane z niego, ekstrakcja rusza od strony po
+    ostatnim z nich, a każdy kolejny przedmiot trafia do dziennika, gdy tylko
+    jest kompletny. Błędy stron nie przerywają wtedy dokumentu.
+    """
     warZalicz = dict()
-
-    for pg in sylabusPgs:
-        pgq = PyQuery(pg)
-        nrStrony = pgq_wyciagnijNumerStrony(pgq)
-
-        # Trzeba stwierdzić, czy to jest pierwsza strona przedmiotu czy nie.
-        # Jesli tak, trzeba wyciągnąć nazwę przedmiotu.
-        if pgq.children("img"): # w oparciu o obrazek nad tytułem
-            nazwaPrzedm = pgq_wyciagnijNazwePrzedmiotu(pgq)
-            #print(repr(nazwaPrzedm)) # Żeby dodać cudzysłowy dla klarownosci.
-            sciezka = pgq_wyciagnijSciezke(pgq)
-            stronaPocz = pgq_wyciagnijNumerStrony(pgq)
-
-            if verbosity >= 1:
-                print(f"Przedmiot '{nazwaPrzedm}', ścieżka '{sciezka}', strona {stronaPocz}")
-
-            if sciezka != "-":
-                # Jeśli ścieżka jest inna niż domyślny placeholder '-', to
-                # uzupełnij nazwę przedmiotu ścieżką przez postfix
-                # w nawiasach kwadratowych.
-                nazwaPrzedm = nazwaPrzedm + f" [{sciezka}]"
-
-            formaWeryf = pgq_wyciagnijFormeWeryfikacji(pgq)
-            sposobyGodziny = pgq_wyciagnijSposobyGodzinyRealizacji(pgq)
-            sposobyGodziny_str = str_sposobyGodzinyRealizacji(sposobyGodziny)
-
-            # Sprawdź czy istnieje taki przedmiot w słowniku, aby uniknąć nadpisywania
-            if nazwaPrzedm not in warZalicz:
-                warZalicz[nazwaPrzedm] = {"formaWeryfikacji": formaWeryf,
-                                      "strona": stronaPocz,
-                                      "sposobyRealizacji": sposobyGodziny_str,
-                                      "_sposobyRealizacji": sposobyGodziny}
-            else:
-                print(f"Uwaga: powtórzył się sylabus przedmiotu o tej samej nazwie "
-                              f"'{nazwaPrzedm}' na stronie {nrStrony}")
-        elif nazwaPrzedm and pgq.children("p:contains('Rodzaj zajęć')") and \
-            pgq.children("p:contains('Formy zaliczenia')") and \
-            pgq.children("p:contains('Warunki zaliczenia przedmiotu')"):
-            # Trafiliśmy na tabelę "Informacje rozszerzone", gdzie są (powinny być)
-            # warunki zaliczenia przedmiotu.
-            # Może to być jako `elif`, bo ta tabela nigdzie* nie występuje
-            # (*nie widziałem żeby występowała) na tej samej stronie, co
-            # tytuł przedmiotu - zatem nie dojdzie do interferencji i wykluczania
-            # się.
-
-            # Wprowadzenie ostrzeżenia na wypadek, gdyby przypadek 'if' powyżej
-            # nie chwycił kolejnego przedmiotu wystarczająco szybko.
-            sylabusDlStron = nrStrony - stronaPocz
-            if sylabusDlStron > OstrzezGdySylabusDluzszyNiz_strony:
-                print(f"Uwaga: sylabus przedmiotu {nazwaPrzedm} (od strony {stronaPocz}, "
-                              f"na stronie {nrStrony}) jest dłuższy niż zwykle "
-                             f"(spodziewano się max {OstrzezGdySylabusDluzszyNiz_strony} "
-                             f"stron, stwierdzono {sylabusDlStron}) - "
-                             "możliwe, że nastąpiła ucieczka przy czytaniu.")
-
-            # Lepszą "kotwicą" jest nagłówek tabeli, ponieważ jest powtarzany
-            # w przypadkach, gdy treści się "rozleją" na kolejne strony.
-            kotwica = pgq.children("p:contains('Warunki zaliczenia przedmiotu')")
-            tabelaWarZal = pgq_wyciagnijWarunkiZaliczenia(pgq, kotwica)
-
-            # Spłaszczenie struktury tabeli warunków zaliczenia.
-            for rodzajZaj, formaZal, warunkiZal in tabelaWarZal:
-                # Powinien już istnieć dict, żeby to wszystko umieścić.
-
-                # Zredukuj niestandardowe rodzaje zajęć do bardziej typowych
-                if rodzajZaj in SlownikRodzajowZajecDoRedukcji:
-                    rodzajZaj = SlownikRodzajowZajecDoRedukcji[rodzajZaj]
-
-                skrotRodzaju = skrocRodzajZaj(rodzajZaj)
-
-                # Sprawdź, czy istnieje taka forma zajęć wśród znanych.
-                if rodzajZaj in RodzajeZajec:
-                    warZalicz[nazwaPrzedm][rodzajZaj] = TSV_PRAWDA
-                    warZalicz[nazwaPrzedm][skrotRodzaju + "_formaZal"] = formaZal or "<!BRAK!>"
-                    warZalicz[nazwaPrzedm][skrotRodzaju + "_warunkiZal"] = warunkiZal or "<!BRAK!>"
-                else:
-                    warZalicz[nazwaPrzedm]["inne uwagi"] = f"Napotkano nieznany rodzaj zajęć '{rodzajZaj}'. " \
-                        f"Forma zaliczenia: '{formaZal}', warunki zaliczenia: '{warunkiZal}'"
-                    print(f"Uwaga: napotkano nieznany rodzaj zajęć '{rodzajZaj}' na stronie {pgq_wyciagnijNumerStrony(pgq)} "
-                          f"(przedmiot '{nazwaPrzedm}')")
-
-        # To może być zarówno na tej samej stronie, co formy i warunki
-        # zaliczenia, ale może równie dobrze wystąpić na osobnej stronie.
-        # Lepiej sprawdzić niezależnie od wcześniejszych przypadków.
-        if nazwaPrzedm and pgq.children("p:contains('Wymagania wstępne i dodatkowe')"):
-            # Jest tytuł. Na razie na tym polegamy, choć niestety nie jest
-            # wykluczone, że teoretycznie możliwe jest przelanie się tekstu
-            # na kolejną stronę bez powtórzenia tytułu - wtedy będzie kiepsko :(
-            #print(pgq.children("p:contains('Wymagania wstępne i dodatkowe')"))
-            warZalicz[nazwaPrzedm]["wymagania wstępne i dodatkowe"] = pgq_wyciagnijWymaganiaWstep(pgq)
+    opcje = {}
+    if postep is not None:
+        for nazwaPrzedm, rekord in postep.przedmioty:
+            _dolaczPrzedmiot(warZalicz, nazwaPrzedm, RekordPrzedmiotu.zeSlownika(rekord))
+        # Przedmioty pominięte po błędzie też liczą się jako już widziane.
+        znane = set(warZalicz).union(blad["przedmiot"] for blad in postep.bledy if blad["przedmiot"])
+        opcje = {"bledy": postep.bledy, "odStrony": postep.odStrony, "znanePrzedmioty": znane}
+
+    for nazwaPrzedm, przedmDict in warzal_rekordy(nazwa_plik_wej, verbosity, strumieniowo, ostrzezenia,
+                                                  metryki, silnik, strony, spojnosc=False,
+                                                  pamiecBlokow=pamiecBlokow, **opcje):
+        if postep is not None:
+            postep.zanotuj(nazwaPrzedm, przedmDict)
+        _dolaczPrzedmiot(warZalicz, nazwaPrzedm, przedmDict)
 
     # Sprawdzanie wewnętrznej spójności:
     # np. sposoby realizacji vs tabela z warunkami zaliczenia
     for nazwaPrzedm, przedmDict in warZalicz.items():
-        for sposobRealiz in przedmDict["_sposobyRealizacji"]:
-            if sposobRealiz in SlownikRodzajowZajecDoRedukcji:
-                sposobRealiz = SlownikRodzajowZajecDoRedukcji[sposobRealiz]
+        _sprawdzSpojnoscPrzedmiotu(nazwaPrzedm, przedmDict, ostrzezenia)
 
-            try:
-                if not przedmDict[sposobRealiz] == TSV_PRAWDA:
-                    print(f"Uwaga: niespójność sposobów realizacji przedmiotu '{nazwaPrzedm}' z "
-                              "tabelą form zaliczenia zajęć")
-            except KeyError as e:
-                print(f"Uwaga: niespójność sposobów realizacji przedmiotu '{nazwaPrzedm}' z "
-                          "tabelą form zaliczenia zajęć w związku z nieznanym "
-                          f"typem zajęć {str(e)}")
+    return warZalicz
+
+
+def _komunikatPowtorzenia(nazwaPrzedm, nrStrony):
+    return f"Uwaga: powtórzył się sylabus przedmiotu o tej samej nazwie '{nazwaPrzedm}' na stronie {nrStrony}"
+
+
+def _dolaczPrzedmiot(warZalicz, nazwaPrzedm, przedmDict):
+    if nazwaPrzedm in warZalicz:
+        # Powtórzony sylabus uzupełnia pierwszy - bez pól strony tytułowej.
+        warZalicz[nazwaPrzedm].uzupelnij(przedmDict)
+    else:
+        warZalicz[nazwaPrzedm] = przedmDict
+
+
+_re_PoczatekStrony = re.compile(re.escape(_ZnacznikStrony))
+# Pierwszy akapit strony to nagłówek "Sylabusy" (zob. `_xp_CzySylabus`).
+_re_NaglowekSylabusu = re.compile(rb'<div id="page\d+"[^>]*>\s*<p[^>]*>(?:\s|<[^>]*>)*'
+                                  rb'Sylabusy(?:\s|<[^>]*>)*</p>')
+# Kotwice strony tytułowej bez obrazka (zob. `IndeksStrony.czyTytulowa`).
+_re_EtykietaSciezki = re.compile(r'<b>(?:\s|<[^>]*>)*Ścieżka(?:\s|<[^>]*>)*</b>'.encode("utf-8"))
+
+
+def _czyTytulowaSurowa(strona):
+    # Odpowiednik `IndeksStrony.czyTytulowa` dla surowego HTML strony.
+    return b"<img" in strona or (b"Karta opisu przedmiotu" in strona
+                                 and bool(_re_EtykietaSciezki.search(strona)))
+
+
+def _przeskanujStrony(nazwa_plik_wej):
+    """
+    Szybkie przejrzenie dokumentu HTML od mutool draw, bez parsowania.
+
+    Returns
+    -------
+    strony : list of tuple
+        (pozycja początku strony w bajtach, czy strona wygląda na stronę
+        tytułową sylabusu - nagłówek "Sylabusy" i obrazek albo kotwice
+        tekstowe) dla kolejnych stron.
+    koniec : int
+        Pozycja końca ostatniej strony.
+
+    """
+    with open(nazwa_plik_wej, "rb") as plik:
+        if os.fstat(plik.fileno()).st_size == 0:
+            return [], 0
+
+        with mmap.mmap(plik.fileno(), 0, access=mmap.ACCESS_READ) as dane:
+            pozycje = [m.start() for m in _re_PoczatekStrony.finditer(dane)]
+            koniec = dane.rfind(b"</body>")
+            koniec = len(dane) if koniec < 0 else koniec
+
+            strony = []
+            for poczatek, nastepna in zip(pozycje, pozycje[1:] + [koniec]):
+                strona = dane[poczatek:nastepna]
+                strony.append((poczatek, _czyTytulowaSurowa(strona)
+                               and bool(_re_NaglowekSylabusu.match(strona))))
+
+    return strony, koniec
+
+
+def _podzielNaFragmenty(strony, koniec, liczba):
+    """
+    Podziel strony (z `_przeskanujStrony`) na najwyżej `liczba` ciągłych
+    fragmentów o zbliżonym rozmiarze; każdy fragment poza pierwszym zaczyna
+    się od strony tytułowej. Zwraca listę par (początek, koniec) w bajtach.
+    """
+    if not strony:
+        return []
+
+    cel = (koniec - strony[0][0]) / liczba
+    granice = [strony[0][0]]
+    for pozycja, tytulowa in strony[1:]:
+        if tytulowa and pozycja - granice[-1] >= cel and len(granice) < liczba:
+            granice.append(pozycja)
+
+    return list(zip(granice, granice[1:] + [koniec]))
+
+
+def _wyciagnijFragment(nazwa_plik_wej, poczatek, koniec, silnik="pyquery", verbosity=0,
+                       zMetrykami=False):
+    # Ekstrakcja fragmentu dokumentu w procesie z puli - zob. `warzal_rownolegle`.
+    with open(nazwa_plik_wej, "rb") as plik:
+        plik.seek(poczatek)
+        dane = plik.read(koniec - poczatek)
+
+    strony = strony_html(io.BytesIO(dane))
+    pierwsza = next(strony, None)
+    # Wstępne przejrzenie mogło się pomylić - wtedy wyniki fragmentów nie
+    # dają się poprawnie połączyć.
+    tytulowa = pierwsza is not None and bool(SilnikiEkstrakcji[silnik]["czySylabus"](pierwsza)) \
+        and IndeksStrony(pierwsza).czyTytulowa()
+
+    metryki = Metryki() if zMetrykami else None
+    ostrzezenia = []
+    nazwyPrzedm = set()
+    rekordy = []
+    # Poprzedni przedmiot jest zwracany, zanim cokolwiek ze strony tytułowej
+    # następnego zostanie przetworzone, a ostrzeżenie o powtórzeniu nazwy
+    # jest pierwszym komunikatem strony tytułowej - stąd wiadomo, od którego
+    # miejsca listy ostrzeżeń zaczyna się każdy przedmiot (i gdzie jest jego
+    # ostrzeżenie o powtórzeniu).
+    pozycjaOstrz = 0
+
+    for nazwaPrzedm, przedmDict in warzal_rekordy(nazwa_plik_wej, verbosity, ostrzezenia=ostrzezenia,
+                                                  metryki=metryki, silnik=silnik,
+                                                  strony=itertools.chain([pierwsza] * (pierwsza is not None),
+                                                                         strony),
+                                                  spojnosc=False):
+        powtorzony = nazwaPrzedm in nazwyPrzedm
+        nazwyPrzedm.add(nazwaPrzedm)
+        rekordy.append((nazwaPrzedm, przedmDict, pozycjaOstrz, powtorzony))
+        pozycjaOstrz = len(ostrzezenia)
+
+    return rekordy, ostrzezenia, metryki, tytulowa
+
+
+def warzal_rownolegle(nazwa_plik_wej, procesy, verbosity=0, ostrzezenia=None, metryki=None,
+                      silnik="pyquery"):
+    """
+    Jak `warzal_PyQuery`, ale dokument HTML jest dzielony na ciągłe
+    fragmenty zaczynające się od stron tytułowych, przetwarzane równolegle
+    w `procesy` procesach.
+
+    Granice przedmiotów są wyznaczane wstępnym przejrzeniem pliku bez
+    parsowania. Jedynym stanem przenoszonym między stronami jest bieżący
+    przedmiot, który strona tytułowa ustawia od nowa, więc wyniki fragmentów
+    łączone są w kolejności - z wykrywaniem powtórzonych nazw przedmiotów
+    między fragmentami i z zachowaniem kolejności ostrzeżeń. Wynik
+    i ostrzeżenia są takie same, jak przy przetwarzaniu w jednym procesie;
+    jeśli przejrzenie pomyliło się co do strony tytułowej, dokument jest
+    przetwarzany w jednym procesie.
+    """
+    with _etap(metryki, "podzial"):
+        fragmenty = _podzielNaFragmenty(*_przeskanujStrony(nazwa_plik_wej), procesy)
+
+    wyniki = None
+    if len(fragmenty) > 1:
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(max_workers=len(fragmenty)) as pula:
+            wyniki = list(pula.map(_wyciagnijFragment, itertools.repeat(nazwa_plik_wej),
+                                   *zip(*fragmenty), itertools.repeat(silnik),
+                                   itertools.repeat(verbosity), itertools.repeat(metryki is not None)))
+
+    if wyniki is None or not all(tytulowa for *_, tytulowa in wyniki[1:]):
+        logging.info("przetwarzanie %s w jednym procesie", nazwa_plik_wej)
+        return warzal_PyQuery(nazwa_plik_wej, verbosity, ostrzezenia=ostrzezenia, metryki=metryki,
+                              silnik=silnik)
+
+    warZalicz = dict()
+    przedmiotyFragmentow = 0
+
+    for rekordy, ostrzezeniaFragm, metrykiFragm, _ in wyniki:
+        pozycja = 0
+        for nazwaPrzedm, przedmDict, pozycjaOstrz, powtorzony in rekordy:
+            for komunikat in ostrzezeniaFragm[pozycja:pozycjaOstrz]:
+                _ostrzez(ostrzezenia, komunikat)
+            # Powtórzenia w obrębie fragmentu są zgłaszane ponownie poniżej,
+            # razem z powtórzeniami między fragmentami.
+            pozycja = pozycjaOstrz + powtorzony
+            if nazwaPrzedm in warZalicz:
+                _ostrzez(ostrzezenia, _komunikatPowtorzenia(nazwaPrzedm, przedmDict["strona"]))
+            _dolaczPrzedmiot(warZalicz, nazwaPrzedm, przedmDict)
+
+        for komunikat in ostrzezeniaFragm[pozycja:]:
+            _ostrzez(ostrzezenia, komunikat)
+
+        if metryki is not None:
+            przedmiotyFragmentow += metrykiFragm.liczniki.get("przedmioty", 0)
+            metryki.polacz(metrykiFragm)
+
+    if metryki is not None:
+        metryki.licz("przedmioty", len(warZalicz) - przedmiotyFragmentow)
+        metryki.licz("fragmenty", len(wyniki))
+
+    for nazwaPrzedm, przedmDict in warZalicz.items():
+        _sprawdzSpojnoscPrzedmiotu(nazwaPrzedm, przedmDict, ostrzezenia)
 
     return warZalicz
 
 
+def _sprawdzSpojnoscPrzedmiotu(nazwaPrzedm, przedmDict, ostrzezenia=None):
+    """Sprawdź, czy sposoby realizacji przedmiotu zgadzają się z tabelą form zaliczenia."""
+    for sposobRealiz in przedmDict["_sposobyRealizacji"]:
+        if sposobRealiz in SlownikRodzajowZajecDoRedukcji:
+            sposobRealiz = SlownikRodzajowZajecDoRedukcji[sposobRealiz]
+
+        try:
+            if not przedmDict[sposobRealiz] == TSV_PRAWDA:
+                _ostrzez(ostrzezenia, f"Uwaga: niespójność sposobów realizacji przedmiotu '{nazwaPrzedm}' z "
+                                      "tabelą form zaliczenia zajęć")
+        except KeyError as e:
+            _ostrzez(ostrzezenia, f"Uwaga: niespójność sposobów realizacji przedmiotu '{nazwaPrzedm}' z "
+                                  "tabelą form zaliczenia zajęć w związku z nieznanym "
+                                  f"typem zajęć {str(e)}")
+
+
 KolumnyTabeliRaportu = ["strona", "nazwa", "formaWeryfikacji",
                         "sposobyRealizacji",
                         "wykład", "wyk_formaZal", "wyk_warunkiZal",
@@ -404,6 +1452,14 @@ SlownikRodzajowZajecDoRedukcji = {
 OstrzezGdySylabusDluzszyNiz_strony = 4
 TSV_PRAWDA = "TRUE"
 TEMPFILE_PREFIX = "~"
+KolumnyPlanTab = ["Przedmiot", "Liczba godzin", "Punkty ECTS", "Forma weryfikacji",
+                  "Kategoria"]
+KolumnyBledowPlanTab = ["plik", "linia", "treść", "błąd"]
+KolumnyNiezgodnosci = ["przedmiot", "przedmiot w sylabusie", "dopasowanie", "pole", "plan", "sylabus",
+                       "plik", "strona"]
+# Rozszerzenia plików zbieranych z katalogów podanych jako wejście, wg trybu.
+RozszerzeniaWejscia = {"warzal": (".pdf", ".html", ".htm", ".stext"),
+                       "plantab": (".txt",)}
 
 def skrocRodzajZaj(rodzajZaj):
     if rodzajZaj == "praktyki":
@@ -412,141 +1468,2830 @@ def skrocRodzajZaj(rodzajZaj):
         return rodzajZaj[0:3]
 
 
-def warzal_formatWyjsciaTSV(warzalDict, in_fname, out_fname=None):
-    warzalDictRows = map(lambda kv: {"nazwa": kv[0], **kv[1]},
-                         warzalDict.items())
+# Klucze pól rodzaju zajęć w słownikowej postaci przedmiotu: (znacznik
+# rodzaju, forma zaliczenia, warunki zaliczenia) dla kolejnych `RodzajeZajec`.
+_KluczeRodzaju = [(rodzajZaj, skrocRodzajZaj(rodzajZaj) + "_formaZal", skrocRodzajZaj(rodzajZaj) + "_warunkiZal")
+                  for rodzajZaj in RodzajeZajec]
+# Klucz -> (indeks rodzaju zajęć, część: 0 - znacznik, 1 - forma, 2 - warunki).
+_KluczeZajec = {klucz: (i, czesc) for i, klucze in enumerate(_KluczeRodzaju)
+                for czesc, klucz in enumerate(klucze)}
+_IndeksyRodzajow = {rodzajZaj: i for i, rodzajZaj in enumerate(RodzajeZajec)}
+# Pola tekstowe spoza tabeli zajęć mają ujemne kody (rodzaje zajęć - swoje indeksy).
+_KodyPolDodatkowych = {"inne uwagi": -1, "wymagania wstępne i dodatkowe": -2}
+_KluczePolDodatkowych = {kod: klucz for klucz, kod in _KodyPolDodatkowych.items()}
+_PolaStale = ("formaWeryfikacji", "strona", "sposobyRealizacji", "_sposobyRealizacji")
+
+# Pozycje pól przedmiotu w wierszu raportu TSV (None - pola nie ma w raporcie).
+_PozycjeKolumnRaportu = {kolumna: i for i, kolumna in enumerate(KolumnyTabeliRaportu)}
+_PozycjeZajecWRaporcie = [tuple(_PozycjeKolumnRaportu.get(klucz) for klucz in klucze)
+                          for klucze in _KluczeRodzaju]
+_PozycjaStrony, _PozycjaNazwy, _PozycjaFormyWeryfikacji, _PozycjaSposobowRealizacji = \
+    (_PozycjeKolumnRaportu[kolumna] for kolumna in ("strona", "nazwa", "formaWeryfikacji", "sposobyRealizacji"))
+_WzorWierszaRaportu = [""] * len(KolumnyTabeliRaportu)
+
+# Początki pól ('"klucz": ') obiektu JSON przedmiotu (zob.
+# `RekordPrzedmiotu.wierszJSON`); znacznik rodzaju zajęć - razem z wartością.
+_tekstJSON = json.encoder.encode_basestring
+_KluczeJSONRodzaju = [(f"{_tekstJSON(znacznik)}: {_tekstJSON(TSV_PRAWDA)}", f"{_tekstJSON(kluczFormy)}: ",
+                       f"{_tekstJSON(kluczWarunkow)}: ") for znacznik, kluczFormy, kluczWarunkow in _KluczeRodzaju]
+_KluczeJSONPolDodatkowych = {kod: f"{_tekstJSON(klucz)}: " for kod, klucz in _KluczePolDodatkowych.items()}
+
+
+def _wartoscJSON(wartosc):
+    # Tekst, numer strony albo None - jak w `json.dumps`.
+    if type(wartosc) is str:
+        return _tekstJSON(wartosc)
+    return "null" if wartosc is None else json.dumps(wartosc, ensure_ascii=False)
+
+
+def _internuj(wartosc):
+    # Formy i warunki zaliczenia, formy weryfikacji i nazwy sposobów realizacji
+    # powtarzają się w wielu przedmiotach - wspólna kopia zamiast osobnych.
+    return sys.intern(wartosc) if type(wartosc) is str else wartosc
+
+
+class RekordPrzedmiotu(collections.abc.MutableMapping):
+    """
+    Pola jednego przedmiotu trybu WarZal.
+
+    Zamiast słownika z kilkudziesięcioma kluczami tekstowymi rekord ma stałe
+    pola (``__slots__``) dla strony, formy weryfikacji i sposobów realizacji,
+    a rodzaje zajęć z tabeli form zaliczenia i pozostałe pola tekstowe
+    trzyma w jednej krotce `_pola` - w kolejności dodania, z kodem rodzaju
+    zajęć (indeksem w `RodzajeZajec`) zamiast nazw kluczy. Sposoby
+    realizacji są przechowywane raz, jako tekst ``sposobyRealizacji``;
+    słownik ``_sposobyRealizacji`` jest z niego odtwarzany na żądanie.
+    Powtarzające się teksty są internowane (`_internuj`).
+
+    Rekord zachowuje się jak dawny słownik przedmiotu (``rekord["wykład"]``,
+    ``rekord["wyk_formaZal"]``, `items`, `update`, porównanie ze słownikiem)
+    z tymi samymi kluczami w tej samej kolejności, więc dotychczasowe
+    funkcje korzystające z wyników działają bez zmian. Ekstrakcja i zapis
+    raportów korzystają bezpośrednio z pól - `dodajZajecia`, `zajecia`,
+    `wierszRaportu`, `wierszJSON`, `pary`.
+    """
+
+    __slots__ = ("strona", "formaWeryfikacji", "sposobyRealizacji", "_pola")
+
+    def __init__(self, strona=None, formaWeryfikacji=None, sposobyRealizacji=None):
+        self.strona = strona
+        self.formaWeryfikacji = _internuj(formaWeryfikacji)
+        self.sposobyRealizacji = _internuj(str_sposobyGodzinyRealizacji(sposobyRealizacji or {}))
+        self._pola = ()
+
+    @classmethod
+    def zeSlownika(cls, przedmDict):
+        """Rekord z postaci słownikowej (np. z pamięci podręcznej)."""
+        rekord = cls()
+        rekord.update(przedmDict)
+        return rekord
+
+    def _sposobyRealizacji(self):
+        # Nazwy sposobów realizacji nie zawierają przecinków ani dwukropków
+        # (zob. `pgq_wyciagnijSposobyGodzinyRealizacji`), więc tekst da się
+        # jednoznacznie rozłożyć z powrotem.
+        if not self.sposobyRealizacji:
+            return {}
+        return dict(para.split(": ", 1) for para in self.sposobyRealizacji.split(", "))
+
+    @property
+    def inneUwagi(self):
+        return self._pole(_KodyPolDodatkowych["inne uwagi"])
+
+    @inneUwagi.setter
+    def inneUwagi(self, tekst):
+        self._ustawPole((_KodyPolDodatkowych["inne uwagi"], tekst))
+
+    @property
+    def wymaganiaWstepne(self):
+        return self._pole(_KodyPolDodatkowych["wymagania wstępne i dodatkowe"])
+
+    @wymaganiaWstepne.setter
+    def wymaganiaWstepne(self, tekst):
+        self._ustawPole((_KodyPolDodatkowych["wymagania wstępne i dodatkowe"], tekst))
+
+    def _indeks(self, kod):
+        for j, pole in enumerate(self._pola):
+            if pole[0] == kod:
+                return j
+        return -1
+
+    def _pole(self, kod):
+        j = self._indeks(kod)
+        return self._pola[j][1] if j >= 0 else None
+
+    def _ustawPole(self, pole):
+        # Jak w słowniku: nowe pole trafia na koniec, istniejące zachowuje miejsce.
+        j = self._indeks(pole[0])
+        if j < 0:
+            self._pola += (pole,)
+        else:
+            self._pola = self._pola[:j] + (pole,) + self._pola[j + 1:]
+
+    def dodajZajecia(self, rodzajZaj, formaZal, warunkiZal):
+        """Ustaw formę i warunki zaliczenia rodzaju zajęć z `RodzajeZajec`."""
+        self._ustawPole((_IndeksyRodzajow[rodzajZaj], _internuj(formaZal), _internuj(warunkiZal)))
+
+    def zajecia(self):
+        """Trójki (rodzaj zajęć, forma zaliczenia, warunki zaliczenia) w kolejności dodania."""
+        return [(RodzajeZajec[pole[0]], pole[1], pole[2]) for pole in self._pola if pole[0] >= 0]
+
+    def uzupelnij(self, inny):
+        """Dołącz rodzaje zajęć i pola tekstowe z rekordu `inny` (powtórzonego sylabusu)."""
+        for pole in inny._pola:
+            self._ustawPole(pole)
+
+    def wierszRaportu(self, nazwaPrzedm):
+        """Wiersz raportu TSV w kolejności `KolumnyTabeliRaportu`."""
+        wiersz = _WzorWierszaRaportu.copy()
+        wiersz[_PozycjaStrony] = self.strona
+        wiersz[_PozycjaNazwy] = nazwaPrzedm
+        wiersz[_PozycjaFormyWeryfikacji] = self.formaWeryfikacji
+        wiersz[_PozycjaSposobowRealizacji] = self.sposobyRealizacji
+
+        for pole in self._pola:
+            kod = pole[0]
+            if kod < 0:
+                pozycja = _PozycjeKolumnRaportu.get(_KluczePolDodatkowych[kod])
+                if pozycja is not None and pole[1] is not None:
+                    wiersz[pozycja] = pole[1]
+                continue
+            znacznik, forma, warunki = _PozycjeZajecWRaporcie[kod]
+            wiersz[znacznik] = TSV_PRAWDA
+            if forma is not None and pole[1] is not None:
+                wiersz[forma] = pole[1]
+            if warunki is not None and pole[2] is not None:
+                wiersz[warunki] = pole[2]
+
+        return wiersz
+
+    def wierszJSON(self, nazwaPrzedm):
+        """
+        Obiekt JSON przedmiotu z polem "nazwa" - ten sam tekst, co
+        ``json.dumps({"nazwa": nazwaPrzedm, **self.slownik()}, ensure_ascii=False)``,
+        ale składany wprost z pól.
+        """
+        sposoby = ", ".join(f"{_tekstJSON(nazwa)}: {_tekstJSON(godziny)}"
+                            for nazwa, godziny in self._sposobyRealizacji().items())
+        czesci = [f'{{"nazwa": {_tekstJSON(nazwaPrzedm)}',
+                  f'"formaWeryfikacji": {_wartoscJSON(self.formaWeryfikacji)}',
+                  f'"strona": {_wartoscJSON(self.strona)}',
+                  f'"sposobyRealizacji": {_wartoscJSON(self.sposobyRealizacji)}',
+                  f'"_sposobyRealizacji": {{{sposoby}}}']
+
+        for pole in self._pola:
+            kod = pole[0]
+            if kod < 0:
+                czesci.append(_KluczeJSONPolDodatkowych[kod] + _wartoscJSON(pole[1]))
+                continue
+            znacznik, kluczFormy, kluczWarunkow = _KluczeJSONRodzaju[kod]
+            czesci.append(znacznik)
+            if pole[1] is not None:
+                czesci.append(kluczFormy + _tekstJSON(pole[1]))
+            if pole[2] is not None:
+                czesci.append(kluczWarunkow + _tekstJSON(pole[2]))
+
+        return ", ".join(czesci) + "}"
+
+    def pary(self, prywatne=True):
+        """
+        Pary (klucz, wartość) postaci słownikowej rekordu, w jej kolejności,
+        wprost z pól - bez budowania słownika (zob. `warzal_formatWyjsciaINI`);
+        bez `prywatne` - bez pól zaczynających się od podkreślenia.
+        """
+        yield "formaWeryfikacji", self.formaWeryfikacji
+        yield "strona", self.strona
+        yield "sposobyRealizacji", self.sposobyRealizacji
+        if prywatne:
+            yield "_sposobyRealizacji", self._sposobyRealizacji()
+
+        for pole in self._pola:
+            kod = pole[0]
+            if kod < 0:
+                yield _KluczePolDodatkowych[kod], pole[1]
+                continue
+            znacznik, kluczFormy, kluczWarunkow = _KluczeRodzaju[kod]
+            yield znacznik, TSV_PRAWDA
+            if pole[1] is not None:
+                yield kluczFormy, pole[1]
+            if pole[2] is not None:
+                yield kluczWarunkow, pole[2]
+
+    def slownik(self, prywatne=True):
+        """
+        Postać słownikowa rekordu (np. do pamięci podręcznej); bez `prywatne` -
+        bez pól zaczynających się od podkreślenia.
+        """
+        return dict(self.pary(prywatne))
+
+    def pola(self):
+        """Pary (klucz, wartość) postaci słownikowej, w jej kolejności."""
+        return self.slownik().items()
+
+    def __getitem__(self, klucz):
+        if klucz in _KluczeZajec:
+            i, czesc = _KluczeZajec[klucz]
+            j = self._indeks(i)
+            if j >= 0 and (czesc == 0 or self._pola[j][czesc] is not None):
+                return TSV_PRAWDA if czesc == 0 else self._pola[j][czesc]
+        elif klucz in _KodyPolDodatkowych:
+            j = self._indeks(_KodyPolDodatkowych[klucz])
+            if j >= 0:
+                return self._pola[j][1]
+        elif klucz == "_sposobyRealizacji":
+            return self._sposobyRealizacji()
+        elif klucz in _PolaStale:
+            return getattr(self, klucz)
+        raise KeyError(klucz)
+
+    def __setitem__(self, klucz, wartosc):
+        if klucz in _KluczeZajec:
+            i, czesc = _KluczeZajec[klucz]
+            j = self._indeks(i)
+            pole = list(self._pola[j]) if j >= 0 else [i, None, None]
+            if czesc == 0:
+                if wartosc != TSV_PRAWDA:
+                    raise ValueError(f"znacznik rodzaju zajęć '{klucz}' może mieć tylko wartość {TSV_PRAWDA}")
+            else:
+                pole[czesc] = _internuj(wartosc)
+            self._ustawPole(tuple(pole))
+        elif klucz in _KodyPolDodatkowych:
+            self._ustawPole((_KodyPolDodatkowych[klucz], wartosc))
+        elif klucz == "_sposobyRealizacji":
+            self.sposobyRealizacji = _internuj(str_sposobyGodzinyRealizacji(wartosc))
+        elif klucz == "strona":
+            self.strona = wartosc
+        elif klucz == "formaWeryfikacji":
+            self.formaWeryfikacji = _internuj(wartosc)
+        elif klucz != "sposobyRealizacji": # Ten tekst wynika z _sposobyRealizacji.
+            raise KeyError(klucz)
+
+    def __delitem__(self, klucz):
+        self[klucz] # KeyError, jeśli pola nie ma.
+        if klucz in _KluczeZajec and _KluczeZajec[klucz][1] > 0:
+            # Bez formy lub warunków rodzaj zajęć zostaje (jak pozostałe klucze słownika).
+            i, czesc = _KluczeZajec[klucz]
+            pole = list(self._pola[self._indeks(i)])
+            pole[czesc] = None
+            self._ustawPole(tuple(pole))
+        elif klucz in _KluczeZajec or klucz in _KodyPolDodatkowych:
+            kod = _KluczeZajec[klucz][0] if klucz in _KluczeZajec else _KodyPolDodatkowych[klucz]
+            j = self._indeks(kod)
+            self._pola = self._pola[:j] + self._pola[j + 1:]
+        else:
+            raise TypeError(f"pola '{klucz}' nie można usunąć z rekordu przedmiotu")
+
+    def __iter__(self):
+        return iter(self.slownik())
+
+    def __len__(self):
+        return len(self.slownik())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.slownik()!r})"
+
+
+def _wersjaNarzedzia():
+    """Skrót kodu tego skryptu - zmienia się przy każdej zmianie logiki ekstrakcji."""
+    return _skrotPliku(__file__)[:16]
 
+
+def _bezPrefiksuTymczasowego(nazwaPliku):
+    """Usuń `TEMPFILE_PREFIX` z nazwy pliku (ale nie z nazw katalogów)."""
+    katalog, nazwa = os.path.split(nazwaPliku)
+    return os.path.join(katalog, nazwa.lstrip(TEMPFILE_PREFIX))
+
+
+def _nazwaBazowaRaportu(nazwaPliku):
+    """
+    Nazwa, od której pochodzą domyślne nazwy raportów WarZal. Dla PDF jest to
+    nazwa dokumentu pośredniego HTML obok niego (``X.pdf.html``, raport
+    ``X.pdf.html_raport.tsv``) - niezależnie od --backend i od tego, gdzie
+    dokument pośredni faktycznie powstał.
+    """
+    nazwaPliku = _bezPrefiksuTymczasowego(nazwaPliku)
+    return nazwaPliku + ".html" if nazwaPliku.lower().endswith(".pdf") else nazwaPliku
+
+
+def warzal_formatWyjsciaTSV(warzalDict, in_fname, out_fname=None):
     if not out_fname:
-        out_fname = in_fname.lstrip(TEMPFILE_PREFIX) + "_raport.tsv"
+        out_fname = _nazwaBazowaRaportu(in_fname) + "_raport.tsv"
 
     with open(out_fname, "wt", newline="", encoding="utf-8") as csvReport:
-        reportWriter = csv.DictWriter(csvReport, KolumnyTabeliRaportu,
-                                      dialect="excel-tab", extrasaction="ignore")
-        reportWriter.writeheader()
-        reportWriter.writerows(warzalDictRows)
+        reportWriter = csv.writer(csvReport, dialect="excel-tab")
+        reportWriter.writerow(KolumnyTabeliRaportu)
+        reportWriter.writerows(przedm.wierszRaportu(nazwaPrzedm)
+                               for nazwaPrzedm, przedm in warzalDict.items())
 
 
 
 def warzal_formatWyjsciaINI(warzalDict, in_fname, out_fname=None):
-    confpars = configparser.ConfigParser(interpolation=None)
-    confpars.optionxform = lambda x: x
-
-    for nazwaPrzedm, przedmDict in warzalDict.items():
-        # Pierwsza pętla idzie po przedmiotach.
-        for nazwaWlasc, wartoscWlasc in przedmDict.items():
-            # Druga pętla idzie po właściwościach poszczególnych przedmiotów.
-            # Właściwości zaczynające się od podkreślenia `_` są uznawane
-            # za prywatne (do wewnętrznego użytku) dla programu i nie będą
-            # wstawiane do pliku.
-            if not nazwaWlasc.startswith("_"):
-                confpars[nazwaPrzedm][nazwaWlasc] = wartoscWlasc
+    # Plik ma postać zapisu `configparser.ConfigParser` (sekcja na przedmiot,
+    # "klucz = wartość", kolejne linie wartości wcięte tabulatorem), ale jest
+    # składany wprost z pól rekordów, bez budowania słowników. Właściwości
+    # zaczynające się od podkreślenia `_` są prywatne (do wewnętrznego użytku)
+    # i nie trafiają do pliku.
+    if not out_fname:
+        out_fname = _nazwaBazowaRaportu(in_fname) + "_raport.ini"
+
+    with open(out_fname, "wt", encoding="utf-8") as plikWyj:
+        for nazwaPrzedm, przedmDict in warzalDict.items():
+            plikWyj.write(f"[{nazwaPrzedm}]\n")
+            plikWyj.writelines(f"{nazwaWlasc} = {str(wartoscWlasc).replace(chr(10), chr(10) + chr(9))}\n"
+                               for nazwaWlasc, wartoscWlasc in przedmDict.pary(prywatne=False))
+            plikWyj.write("\n")
+
+
+def warzal_formatWyjsciaJSONL(rekordy, in_fname, out_fname=None):
+    """
+    Zapisz przedmioty - pary (nazwa, `RekordPrzedmiotu`), np. z `warzal_rekordy` -
+    do pliku JSON Lines, po jednym obiekcie na linię. Każdy przedmiot jest
+    zapisywany na dysk od razu, więc plik można czytać w trakcie
+    przetwarzania. Pola strukturalne (np. ``_sposobyRealizacji``) są
+    zachowane.
+
+    Returns
+    -------
+    int
+        Liczba zapisanych przedmiotów.
 
+    """
     if not out_fname:
-        out_fname = in_fname.lstrip(TEMPFILE_PREFIX) + "_raport.tsv"
+        out_fname = _nazwaBazowaRaportu(in_fname) + "_raport.jsonl"
 
+    liczba = 0
     with open(out_fname, "wt", encoding="utf-8") as plikWyj:
-        confpars.write(plikWyj)
+        for nazwaPrzedm, przedmDict in rekordy:
+            plikWyj.write(przedmDict.wierszJSON(nazwaPrzedm) + "\n")
+            plikWyj.flush()
+            liczba += 1
+
+    return liczba
+
+
+# Schemat bazy raportu SQLite (-f sqlite). Przedmioty i ich zajęcia są
+# przypisane do dokumentu źródłowego; ponowny zapis tego samego dokumentu
+# zastępuje jego poprzednie wiersze.
+SchematSQLite = """
+PRAGMA foreign_keys = ON;
+CREATE TABLE IF NOT EXISTS dokumenty (
+    id INTEGER PRIMARY KEY,
+    plik TEXT NOT NULL UNIQUE,
+    skrot TEXT,
+    wersja TEXT,
+    przetworzono TEXT
+);
+CREATE TABLE IF NOT EXISTS przedmioty (
+    id INTEGER PRIMARY KEY,
+    dokument INTEGER NOT NULL REFERENCES dokumenty(id) ON DELETE CASCADE,
+    nazwa TEXT NOT NULL,
+    strona INTEGER,
+    formaWeryfikacji TEXT,
+    sposobyRealizacji TEXT,
+    wymaganiaWstepne TEXT,
+    inneUwagi TEXT,
+    UNIQUE (dokument, nazwa)
+);
+CREATE TABLE IF NOT EXISTS zajecia (
+    przedmiot INTEGER NOT NULL REFERENCES przedmioty(id) ON DELETE CASCADE,
+    rodzaj TEXT NOT NULL,
+    formaZal TEXT,
+    warunkiZal TEXT,
+    PRIMARY KEY (przedmiot, rodzaj)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS ostrzezenia (
+    dokument INTEGER NOT NULL REFERENCES dokumenty(id) ON DELETE CASCADE,
+    nr INTEGER NOT NULL,
+    tresc TEXT NOT NULL,
+    PRIMARY KEY (dokument, nr)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS przedmioty_nazwa ON przedmioty (nazwa);
+CREATE INDEX IF NOT EXISTS zajecia_rodzaj ON zajecia (rodzaj, warunkiZal);
+"""
+
+
+def _otworzBazeSQLite(nazwaPliku):
+    polaczenie = sqlite3.connect(nazwaPliku)
+    polaczenie.executescript(SchematSQLite)
+    return polaczenie
+
+
+def _zapiszDokumentSQLite(polaczenie, warzalDict, in_fname, ostrzezenia=()):
+    # Dokument jest identyfikowany znormalizowaną ścieżką bezwzględną pliku -
+    # programy o tej samej nazwie pliku z różnych katalogów to różne
+    # dokumenty; skrót treści pozwala rozpoznać zmienioną wersję dokumentu.
+    plik = os.path.normcase(os.path.abspath(_bezPrefiksuTymczasowego(in_fname)))
+    polaczenie.execute(
+        "INSERT INTO dokumenty (plik, skrot, wersja, przetworzono) "
+        "VALUES (?, ?, ?, datetime('now')) "
+        "ON CONFLICT (plik) DO UPDATE SET skrot = excluded.skrot, wersja = excluded.wersja, "
+        "przetworzono = excluded.przetworzono",
+        (plik, _skrotPliku(in_fname), _wersjaNarzedzia()))
+    idDokumentu = polaczenie.execute("SELECT id FROM dokumenty WHERE plik = ?", (plik,)).fetchone()[0]
+    polaczenie.execute("DELETE FROM przedmioty WHERE dokument = ?", (idDokumentu,))
+    polaczenie.execute("DELETE FROM ostrzezenia WHERE dokument = ?", (idDokumentu,))
+
+    zajecia = []
+    for nazwaPrzedm, przedm in warzalDict.items():
+        idPrzedmiotu = polaczenie.execute(
+            "INSERT INTO przedmioty (dokument, nazwa, strona, formaWeryfikacji, sposobyRealizacji, "
+            "wymaganiaWstepne, inneUwagi) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (idDokumentu, nazwaPrzedm, przedm.strona, przedm.formaWeryfikacji,
+             przedm.sposobyRealizacji, przedm.wymaganiaWstepne, przedm.inneUwagi)).lastrowid
+        # Grupy kolumn rodzajów zajęć z raportu TSV jako osobne wiersze.
+        zajecia.extend((idPrzedmiotu, *zaj) for zaj in sorted(przedm.zajecia(),
+                                                              key=lambda zaj: _IndeksyRodzajow[zaj[0]]))
+
+    polaczenie.executemany("INSERT INTO zajecia VALUES (?, ?, ?, ?)", zajecia)
+    polaczenie.executemany("INSERT INTO ostrzezenia VALUES (?, ?, ?)",
+                           ((idDokumentu, nr, tresc) for nr, tresc in enumerate(ostrzezenia, 1)))
+
+
+def warzal_formatWyjsciaSQLite(warzalDict, in_fname, out_fname=None, ostrzezenia=()):
+    """
+    Zapisz przedmioty, ich rodzaje zajęć i ostrzeżenia do bazy SQLite
+    (schemat `SchematSQLite`) w jednej transakcji. Jeśli baza istnieje, jest
+    uzupełniana, a wcześniejsze dane tego samego dokumentu są zastępowane.
+    """
+    if not out_fname:
+        out_fname = _nazwaBazowaRaportu(in_fname) + "_raport.sqlite"
+
+    polaczenie = _otworzBazeSQLite(out_fname)
+    try:
+        with polaczenie:
+            _zapiszDokumentSQLite(polaczenie, warzalDict, in_fname, ostrzezenia)
+    finally:
+        polaczenie.close()
 
 
 def _plantab_is_cont(linetxt):
     return linetxt.startswith("ocenę") and linetxt[-1] in {"O", "F"}
 
-def plantab_copypastetxt(nazwaPliku, verbosity=0):
-    re_tyt = re.compile("Przedmiot Liczba\n+godzin\n+Punkty\n+ECTS\n+Forma\n+weryfikacji\n+", re.M)
-    re_formyWer = re.compile("egzamin|zaliczenie\\sna|zaliczenie")
-    re_ECTS = re.compile(" \\d{1,2},\\d | - ")
-    re_godz = re.compile(" \\d{1,3} ")
+# Nagłówek tabeli skopiowanej z planu studiów - rozbity na osobne linie.
+NaglowekPlanTab = ["Przedmiot Liczba", "godzin", "Punkty", "ECTS", "Forma", "weryfikacji"]
+_re_PlanTabFormyWer = re.compile("egzamin|zaliczenie\\sna|zaliczenie")
+_re_PlanTabECTS = re.compile(" \\d{1,2},\\d | - ")
+_re_PlanTabGodz = re.compile(" \\d{1,3} ")
 
-    pola_tyt = ["Przedmiot", "Liczba godzin", "Punkty ECTS", "Forma weryfikacji"]
 
-    liniePrzedmDicts = []
-
-    filestr = None
+def _plantab_linie(plik):
+    """
+    Numerowane (od 1) niepuste linie pliku planu, bez nagłówka tabeli, jeśli
+    ten występuje na początku pliku.
+    """
+    niepuste = ((nr, linia.rstrip("\n")) for nr, linia in enumerate(plik, 1) if linia.strip())
+    poczatek = list(itertools.islice(niepuste, len(NaglowekPlanTab)))
 
-    with open(nazwaPliku, "rt", encoding="utf-8") as infile:
-        filestr = infile.read()
+    if [linia for _, linia in poczatek] != NaglowekPlanTab:
+        yield from poczatek
+    yield from niepuste
 
-    if linia_tyt := re_tyt.match(filestr):
-        # Wyrzuć linię tytułową.
-        tyt_end = linia_tyt.end(0)
-        filestr = filestr[tyt_end:]
 
-    # Rozbija plik na linijki.
-    fileln = filestr.split("\n")
+def _plantab_parsujWiersz(line, line_cont):
+    """
+    Przetwórz linię `line` tabeli planu (z następną linią `line_cont`, która
+    może być kontynuacją) na słownik z polami `KolumnyPlanTab`.
+    """
+    lineDict = {
+            "Kategoria": None,
+            "Forma weryfikacji": None,
+            "Punkty ECTS": 0,
+            "Liczba godzin": 0,
+            "Przedmiot": None
+        }
+
+    # Na linii kontynuacji już powinno się znaleźć "O" lub "F"
+    # - jesli nie ma, to gruby błąd danych wejsciowych.
+    if line[-1] in {"O", "F"}:
+        lineDict["Kategoria"] = line[-1]
+    elif line_cont[-1:] in {"O", "F"}:
+        lineDict["Kategoria"] = line_cont[-1]
+    else:
+        raise ValueError(f"błąd danych: brak kategorii (O/F) w linii z treścią '{line}'")
 
-    # while zamiast for, gdyż trzeba czasem przeskakiwać linijki i patrzeć do przodu +1
-    i = 0
-    while i < len(fileln):
-        line = fileln[i]
-        if _plantab_is_cont(line):
-            i += 1
-            continue
+    if formaMatch := _re_PlanTabFormyWer.search(line):
+        if formaMatch.group(0) == "zaliczenie na":
+            formaWer = "zaliczenie na ocenę"
         else:
-            line_cont = fileln[i + 1] if i < len(fileln) - 1 else ""
+            formaWer = formaMatch.group(0) # inne się mieszczą w jednej linijce
+        lineDict["Forma weryfikacji"] = formaWer
+    else:
+        raise ValueError(f"błąd danych: brak warunków zaliczenia w linii z trescią '{line}'")
 
-        formaWer = None
+    matchECTS = _re_PlanTabECTS.search(line)
+    if not matchECTS:
+        raise ValueError(f"błąd danych: brak punktów ECTS w linii z treścią '{line}'")
+    line = line[0:matchECTS.start() + 1] # Ucinia końcówkę linijki przed kolejnymi krokami obróbki.
+    lineDict["Punkty ECTS"] = matchECTS.group(0).strip()
 
-        lineDict = {
-                "Kategoria": None,
-                "Forma weryfikacji": None,
-                "Punkty ECTS": 0,
-                "Liczba godzin": 0,
-                "Przedmiot": None
-            }
+    matchGodz = _re_PlanTabGodz.search(line)
+    if not matchGodz:
+        raise ValueError(f"błąd danych: brak liczby godzin w linii z treścią '{line}'")
+    line = line[0:(matchGodz.start())]
+    lineDict["Liczba godzin"] = matchGodz.group(0).strip()
 
-        lineDict["Kategoria"] = line[-1] if line[-1] in {"O", "F"} else line_cont[-1]
-        # Na linii kontynuacji już powinno się znaleźć "O" lub "F"
-        # - jesli nie ma, to gruby błąd danych wejsciowych.
+    # Co pozostało to nazwa przedmiotu - są tam zbyt dziwne znaki, by
+    # to sensownie przetwarzać wyrażeniem regularnym.
+    lineDict["Przedmiot"] = line
 
-        if formaMatch := re_formyWer.search(line):
-            if formaMatch.group(0) == "zaliczenie na":
-                formaWer = "zaliczenie na ocenę"
-            else:
-                formaWer = formaMatch.group(0) # inne się mieszczą w jednej linijce
-            lineDict["Forma weryfikacji"] = formaWer
+    return lineDict
 
-        else:
-            raise ValueError(f"błąd danych: brak warunków zaliczenia w linii z trescią '{line}'")
 
+def plantab_wiersze(nazwaPliku, bledy=None, verbosity=0):
+    """
+    Czytaj plik z tabelą planu studiów (skopiowaną jako tekst) linia po linii
+    i zwracaj kolejne przedmioty zaraz po ich przetworzeniu.
+
+    Linie kontynuacji (np. "ocenę O" po "zaliczenie na") są rozpoznawane
+    przez podgląd jednej linii do przodu.
+
+    Parameters
+    ----------
+    nazwaPliku : str
+        Nazwa pliku tekstowego z planem.
+    bledy : list, optional
+        Jeśli podano, błędne wiersze są do niej dołączane (jako słowniki
+        z polami `KolumnyBledowPlanTab`) i przetwarzanie jest kontynuowane.
+        W przeciwnym razie pierwszy błędny wiersz przerywa je wyjątkiem
+        ValueError.
+
+    Yields
+    ------
+    dict
+        Wiersz planu z polami `KolumnyPlanTab`.
+
+    """
+    with open(nazwaPliku, "rt", encoding="utf-8") as plik:
+        linie = _plantab_linie(plik)
+        biezaca = next(linie, None)
 
-        matchECTS = re_ECTS.search(line)
-        line = line[0:matchECTS.start() + 1] # Ucinia końcówkę linijki przed kolejnymi krokami obróbki.
-        lineDict["Punkty ECTS"] = matchECTS.group(0).strip()
+        while biezaca is not None:
+            nastepna = next(linie, None)
+            nrLinii, line = biezaca
+            biezaca = nastepna
 
-        matchGodz = re_godz.search(line)
-        line = line[0:(matchGodz.start())]
-        lineDict["Liczba godzin"] = matchGodz.group(0).strip()
+            if _plantab_is_cont(line):
+                continue
 
-        # Co pozostało to nazwa przedmiotu - są tam zbyt dziwne znaki, by
-        # to sensownie przetwarzać wyrażeniem regularnym.
-        lineDict["Przedmiot"] = line
+            try:
+                lineDict = _plantab_parsujWiersz(line, nastepna[1] if nastepna else "")
+            except ValueError as e:
+                if bledy is None:
+                    raise
+                bledy.append({"plik": nazwaPliku, "linia": nrLinii, "treść": line, "błąd": str(e)})
+                continue
 
-        liniePrzedmDicts.append(lineDict)
+            yield lineDict
 
-        i += 1
 
-    return liniePrzedmDicts
+def plantab_copypastetxt(nazwaPliku, verbosity=0, bledy=None):
+    """Lista wszystkich wierszy planu z pliku - zob. `plantab_wiersze`."""
+    return list(plantab_wiersze(nazwaPliku, bledy, verbosity))
 
 
 def plantab_formatWyjsciaTSV(liniePrzedmDicts, in_fname, out_fname=None):
-    NazwyKolumn = ["Przedmiot", "Liczba godzin", "Punkty ECTS", "Forma weryfikacji",
-                   "Kategoria"]
-
-    nazwaPlikuWyj = out_fname or (in_fname.lstrip(TEMPFILE_PREFIX) + "_plantab.tsv")
+    nazwaPlikuWyj = out_fname or (_bezPrefiksuTymczasowego(in_fname) + "_plantab.tsv")
 
     with open(nazwaPlikuWyj, "wt", encoding="utf-8", newline="") as outf:
-        writer = csv.DictWriter(outf, NazwyKolumn, dialect="excel-tab")
+        writer = csv.DictWriter(outf, KolumnyPlanTab, dialect="excel-tab")
         writer.writeheader()
         writer.writerows(liniePrzedmDicts)
 
 
-def main(argv):
-    parser = argparse.ArgumentParser(
-            description="Narzędzie wspomagające analizę sylabusów w plikach PDF, "
+def _nazwaPlikuBledow(nazwaRaportu):
+    return os.path.splitext(nazwaRaportu)[0] + "_bledy.tsv"
+
+
+def plantab_zapiszBledy(bledy, out_fname):
+    """Zapisz błędne wiersze planu (zob. `plantab_wiersze`) do pliku TSV."""
+    with open(out_fname, "wt", encoding="utf-8", newline="") as outf:
+        writer = csv.DictWriter(outf, KolumnyBledowPlanTab, dialect="excel-tab")
+        writer.writeheader()
+        writer.writerows(bledy)
+
+
+def plantab_przetworzPliki(pliki, out_fname=None, zbiorczy_fname=None, ostrzezenia=None):
+    """
+    Przetwórz pliki planów studiów jednym przebiegiem: każdy wiersz jest
+    zapisywany do raportu pliku (i, opcjonalnie, raportu zbiorczego z kolumną
+    "plik") zaraz po przetworzeniu, bez gromadzenia wyników w pamięci.
+
+    Błędne wiersze nie przerywają pracy - trafiają do pliku błędów obok
+    raportu (``<raport>_bledy.tsv``, tylko jeśli wystąpiły) i są zgłaszane
+    ostrzeżeniem. Tak samo traktowane są pliki, których nie da się odczytać.
+
+    Returns
+    -------
+    tuple
+        (liczba zapisanych wierszy, lista błędów)
+
+    """
+    liczbaWierszy = 0
+    wszystkieBledy = []
+
+    with contextlib.ExitStack() as stos:
+        zbiorczy = None
+        if zbiorczy_fname:
+            plikZbiorczy = stos.enter_context(open(zbiorczy_fname, "wt", encoding="utf-8", newline=""))
+            zbiorczy = csv.DictWriter(plikZbiorczy, ["plik"] + KolumnyPlanTab, dialect="excel-tab")
+            zbiorczy.writeheader()
+
+        def zapisywane(nazwaPliku, wiersze):
+            nonlocal liczbaWierszy
+            for lineDict in wiersze:
+                if zbiorczy is not None:
+                    zbiorczy.writerow({"plik": nazwaPliku, **lineDict})
+                liczbaWierszy += 1
+                yield lineDict
+
+        for nazwaPliku in pliki:
+            bledy = []
+            nazwaRaportu = out_fname or (_bezPrefiksuTymczasowego(nazwaPliku) + "_plantab.tsv")
+
+            try:
+                # Nieczytelny plik nie powinien zostawiać po sobie pustego raportu.
+                with open(nazwaPliku, "rb"):
+                    pass
+                plantab_formatWyjsciaTSV(zapisywane(nazwaPliku, plantab_wiersze(nazwaPliku, bledy)),
+                                         nazwaPliku, nazwaRaportu)
+            except (OSError, UnicodeDecodeError) as e:
+                bledy.append({"plik": nazwaPliku, "linia": None, "treść": None,
+                              "błąd": f"nie można odczytać pliku: {e}"})
+
+            if bledy:
+                plantab_zapiszBledy(bledy, _nazwaPlikuBledow(nazwaRaportu))
+                _ostrzez(ostrzezenia, f"Uwaga: pominięto {len(bledy)} błędnych wierszy pliku "
+                                      f"'{nazwaPliku}', zob. '{_nazwaPlikuBledow(nazwaRaportu)}'")
+            wszystkieBledy.extend(bledy)
+
+    if zbiorczy_fname and wszystkieBledy:
+        plantab_zapiszBledy(wszystkieBledy, _nazwaPlikuBledow(zbiorczy_fname))
+
+    return liczbaWierszy, wszystkieBledy
+
+
+def zbiorczy_formatWyjsciaJSONL(pliki, out_fname):
+    """
+    Połącz raporty JSON Lines plików `pliki` (zapisane pod domyślnymi
+    nazwami) w jeden plik, dodając do każdego przedmiotu pole "plik".
+    """
+    with open(out_fname, "wt", encoding="utf-8") as plikWyj:
+        for plik in pliki:
+            with open(_nazwaBazowaRaportu(plik) + "_raport.jsonl", "rt", encoding="utf-8") as raport:
+                for linia in raport:
+                    plikWyj.write(json.dumps({"plik": plik, **json.loads(linia)}, ensure_ascii=False) + "\n")
+
+
+def zbiorczy_formatWyjsciaSQLite(wyniki, out_fname):
+    """
+    Zapisz wyniki WarZal wielu plików - trójki (plik, słownik przedmiotów,
+    ostrzeżenia) - do jednej bazy SQLite w jednej transakcji.
+    """
+    polaczenie = _otworzBazeSQLite(out_fname)
+    try:
+        with polaczenie:
+            for plik, warzalDict, ostrzezenia in wyniki:
+                _zapiszDokumentSQLite(polaczenie, warzalDict, plik, ostrzezenia)
+    finally:
+        polaczenie.close()
+
+
+def zbiorczy_formatWyjsciaTSV(wyniki, tryb, out_fname):
+    """
+    Zapisz jeden raport zbiorczy dla wielu plików wejściowych, z dodatkową
+    pierwszą kolumną "plik" wskazującą źródło każdego wiersza.
+
+    Parameters
+    ----------
+    wyniki : list
+        Lista par (nazwa pliku wejściowego, wynik przetwarzania) w kolejności
+        plików wejściowych.
+    tryb : str
+        'warzal' lub 'plantab'.
+    out_fname : str
+        Nazwa pliku raportu zbiorczego.
+
+    """
+    with open(out_fname, "wt", newline="", encoding="utf-8") as csvReport:
+        if tryb == "warzal":
+            reportWriter = csv.writer(csvReport, dialect="excel-tab")
+            reportWriter.writerow(["plik"] + KolumnyTabeliRaportu)
+            reportWriter.writerows([plik] + przedm.wierszRaportu(nazwaPrzedm)
+                                   for plik, warzalDict in wyniki
+                                   for nazwaPrzedm, przedm in warzalDict.items())
+        else:
+            reportWriter = csv.DictWriter(csvReport, ["plik"] + KolumnyPlanTab,
+                                          dialect="excel-tab", extrasaction="ignore")
+            reportWriter.writeheader()
+            reportWriter.writerows({"plik": plik, **lineDict}
+                                   for plik, liniePrzedmDicts in wyniki
+                                   for lineDict in liniePrzedmDicts)
+
+
+_re_SufiksSciezki = re.compile("\\s*\\[[^\\[\\]]*\\]$")
+
+
+def _kluczNazwy(nazwaPrzedm):
+    """Nazwa przedmiotu do porównań: bez różnic w wielkości liter i białych znakach."""
+    return " ".join(nazwaPrzedm.split()).casefold()
+
+
+def _kluczBezSciezki(klucz):
+    """Klucz nazwy bez przyrostka ścieżki ``[ścieżka]`` (zob. `warzal_rekordy`)."""
+    return _re_SufiksSciezki.sub("", klucz)
+
+
+def _godzinySylabusu(przedm):
+    """Łączna liczba godzin wszystkich sposobów realizacji przedmiotu."""
+    return sum(int(godziny) for godziny in przedm["_sposobyRealizacji"].values())
+
+
+def _niezgodnosciPrzedmiotu(wierszPlanu, przedm):
+    # Pary (pole, wartość w planie, wartość w sylabusie) dla różniących się pól.
+    niezgodne = []
+    formaPlan = wierszPlanu["Forma weryfikacji"] or ""
+    formaSylabus = przedm["formaWeryfikacji"] or ""
+    if _kluczNazwy(formaPlan) != _kluczNazwy(formaSylabus):
+        niezgodne.append(("Forma weryfikacji", formaPlan, formaSylabus))
+
+    godziny = _godzinySylabusu(przedm)
+    if str(wierszPlanu["Liczba godzin"]).strip() != str(godziny):
+        niezgodne.append(("Liczba godzin", wierszPlanu["Liczba godzin"], godziny))
+
+    return niezgodne
+
+
+def porownajPlanZSylabusami(wierszePlanu, przedmioty):
+    """
+    Zestaw wiersze planu studiów (jak z `plantab_wiersze`) z przedmiotami
+    z sylabusów i zwracaj niezgodności formy weryfikacji i liczby godzin.
+
+    Przedmioty są łączone po nazwie przez indeks haszujący planu, więc
+    czas jest liniowy względem liczby wierszy i przedmiotów. Nazwa jest
+    najpierw szukana dokładnie (bez różnic w wielkości liter i białych
+    znakach), a potem bez przyrostka ścieżki ``[ścieżka]``, który
+    `warzal_rekordy` dodaje do nazw przedmiotów ze ścieżką. Jeśli nazwa
+    występuje w planie kilka razy, przedmiot jest porównywany z wierszem
+    o najmniejszej liczbie niezgodności, a wszystkie te wiersze są uznawane
+    za pokryte.
+
+    Parameters
+    ----------
+    wierszePlanu : iterable of dict
+        Wiersze planu z polami `KolumnyPlanTab`.
+    przedmioty : iterable of tuple
+        Trójki (plik, nazwa przedmiotu, `RekordPrzedmiotu` lub słownik
+        przedmiotu z polem ``_sposobyRealizacji``).
+
+    Yields
+    ------
+    dict
+        Niezgodność z polami `KolumnyNiezgodnosci`: różniące się pole albo
+        "brak sylabusu" (wiersz planu bez przedmiotu) i "brak w planie".
+
+    """
+    wierszePlanu = list(wierszePlanu)
+    dokladne = collections.defaultdict(list)
+    bezSciezki = collections.defaultdict(list)
+    for i, wierszPlanu in enumerate(wierszePlanu):
+        klucz = _kluczNazwy(wierszPlanu["Przedmiot"] or "")
+        dokladne[klucz].append(i)
+        bezSciezki[_kluczBezSciezki(klucz)].append(i)
+
+    pokryte = [False] * len(wierszePlanu)
+
+    for plik, nazwaPrzedm, przedm in przedmioty:
+        klucz = _kluczNazwy(nazwaPrzedm)
+        dopasowanie = "dokładne"
+        kandydaci = dokladne.get(klucz)
+        if not kandydaci:
+            dopasowanie = "bez ścieżki"
+            kandydaci = bezSciezki.get(_kluczBezSciezki(klucz))
+
+        wspolne = {"przedmiot w sylabusie": nazwaPrzedm, "plik": plik, "strona": przedm["strona"]}
+        if not kandydaci:
+            yield {"przedmiot": None, "dopasowanie": None, "pole": "brak w planie",
+                   "plan": None, "sylabus": None, **wspolne}
+            continue
+
+        # Najlepiej pasujący wiersz to ten z najmniejszą liczbą niezgodności
+        # (przy remisie - pierwszy w planie).
+        i = min(kandydaci, key=lambda i: (len(_niezgodnosciPrzedmiotu(wierszePlanu[i], przedm)), i))
+        niezgodne = _niezgodnosciPrzedmiotu(wierszePlanu[i], przedm)
+        for j in kandydaci:
+            pokryte[j] = True
+        for pole, wartoscPlan, wartoscSylabus in niezgodne:
+            yield {"przedmiot": wierszePlanu[i]["Przedmiot"], "dopasowanie": dopasowanie, "pole": pole,
+                   "plan": wartoscPlan, "sylabus": wartoscSylabus, **wspolne}
+
+    for wierszPlanu, pokryty in zip(wierszePlanu, pokryte):
+        if not pokryty:
+            yield {"przedmiot": wierszPlanu["Przedmiot"], "przedmiot w sylabusie": None,
+                   "dopasowanie": None, "pole": "brak sylabusu", "plan": None, "sylabus": None,
+                   "plik": None, "strona": None}
+
+
+def porownanie_formatWyjsciaTSV(niezgodnosci, in_fname, out_fname=None):
+    """
+    Zapisz niezgodności z `porownajPlanZSylabusami` do raportu TSV.
+
+    Returns
+    -------
+    int
+        Liczba zapisanych niezgodności.
+
+    """
+    nazwaPlikuWyj = out_fname or (_bezPrefiksuTymczasowego(in_fname) + "_niezgodnosci.tsv")
+    liczba = 0
+
+    with open(nazwaPlikuWyj, "wt", encoding="utf-8", newline="") as outf:
+        writer = csv.DictWriter(outf, KolumnyNiezgodnosci, dialect="excel-tab")
+        writer.writeheader()
+        for niezgodnosc in niezgodnosci:
+            writer.writerow(niezgodnosc)
+            liczba += 1
+
+    return liczba
+
+
+def _wierszePlanu(nazwaPliku, ostrzezenia=None):
+    # Plan jako tekst skopiowanej tabeli albo gotowy raport PlanTab (TSV).
+    if nazwaPliku.lower().endswith(".tsv"):
+        with open(nazwaPliku, "rt", encoding="utf-8", newline="") as plik:
+            yield from csv.DictReader(plik, dialect="excel-tab")
+        return
+
+    bledy = []
+    yield from plantab_wiersze(nazwaPliku, bledy)
+    if bledy:
+        _ostrzez(ostrzezenia, f"Uwaga: pominięto {len(bledy)} błędnych wierszy planu '{nazwaPliku}'")
+
+
+def _przedmiotySylabusow(pliki, args, ostrzezenia=None, metryki=None):
+    # Przedmioty kolejnych dokumentów jako trójki (plik, nazwa, przedmiot);
+    # raporty JSON Lines (-f jsonl) są czytane bez ponownej ekstrakcji, a dla
+    # PDF korzysta się z pamięci podręcznej wyników.
+    with _pamiecBlokow(args) as pamiecBlokow:
+        for plik in pliki:
+            if plik.lower().endswith(".jsonl"):
+                with open(plik, "rt", encoding="utf-8") as raport:
+                    for linia in raport:
+                        przedm = json.loads(linia)
+                        yield plik, przedm.pop("nazwa"), przedm
+                continue
+
+            ostrzezeniaPliku = []
+            wynik = _wyciagnijWarZal(plik, args, ostrzezeniaPliku, metryki, pamiecBlokow=pamiecBlokow)
+            for komunikat in ostrzezeniaPliku:
+                _ostrzez(ostrzezenia, f"{plik}: {komunikat}")
+            for nazwaPrzedm, przedm in wynik.items():
+                yield plik, nazwaPrzedm, przedm
+
+
+def porownajZPlanem(pliki, plany, args, out_fname=None, metryki=None):
+    """
+    Tryb porównania (``--plan``): zestaw plany studiów `plany` (pliki tekstowe
+    PlanTab lub raporty ``*_plantab.tsv``) z przedmiotami z sylabusów
+    `pliki` (dokumenty WarZal lub raporty ``*_raport.jsonl``) i zapisz jeden
+    raport niezgodności - zob. `porownajPlanZSylabusami`.
+    """
+    ostrzezenia = []
+    wierszePlanu = itertools.chain.from_iterable(_wierszePlanu(plan, ostrzezenia) for plan in plany)
+    niezgodnosci = porownajPlanZSylabusami(wierszePlanu, _przedmiotySylabusow(pliki, args, ostrzezenia, metryki))
+
+    nazwaRaportu = out_fname or (_bezPrefiksuTymczasowego(plany[0]) + "_niezgodnosci.tsv")
+    with _etap(metryki, "porownanie"):
+        liczba = porownanie_formatWyjsciaTSV(niezgodnosci, plany[0], nazwaRaportu)
+
+    for komunikat in ostrzezenia:
+        print(komunikat)
+    print(f"Niezgodności planu z sylabusami: {liczba}, raport zapisany do {nazwaRaportu}")
+
+
+def _skrotPliku(nazwaPliku):
+    skrot = hashlib.sha256()
+    with open(nazwaPliku, "rb") as plik:
+        for blok in iter(lambda: plik.read(1 << 20), b""):
+            skrot.update(blok)
+    return skrot.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _wersjaMutool():
+    """Wersja programu mutool (odczytywana raz na proces) albo None, jeśli go nie ma."""
+    try:
+        mutool_exe_path = _sciezkaMutool()
+    except RuntimeError:
+        return None
+    wynik = subprocess.run([mutool_exe_path, "-v"], capture_output=True, text=True)
+    return (wynik.stdout + wynik.stderr).strip()
+
+
+def _domyslnyKatalogPamieci():
+    if "AUTOSYLABUSUJ_CACHE" in os.environ:
+        return os.environ["AUTOSYLABUSUJ_CACHE"]
+
+    baza = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") \
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(baza, "autosylabusuj")
+
+
+class PamiecPodreczna:
+    """
+    Pamięć podręczna na dysku dla przetwarzania plików PDF.
+
+    Każdy wpis to katalog nazwany kluczem wyliczonym z zawartości PDF (SHA-256),
+    wersji mutool i formatu pośredniego. Wpis zawiera dokument pośredni
+    (HTML lub stext) oraz wyniki ekstrakcji WarZal, osobno dla każdej wersji
+    tego skryptu (skrót jego kodu) - zmiana kodu unieważnia więc wyniki
+    ekstrakcji, ale nie konwersję.
+
+    Rozmiar jest ograniczony; po przekroczeniu limitu usuwane są najdawniej
+    używane wpisy (LRU, wg czasu modyfikacji katalogu wpisu, który jest
+    odświeżany przy każdym użyciu).
+    """
+
+    def __init__(self, katalog, limitBajtow):
+        self.katalog = katalog
+        self.limitBajtow = limitBajtow
+        self._wersjaMutool = None
+        os.makedirs(katalog, exist_ok=True)
+
+    @classmethod
+    def zArgumentow(cls, args):
+        return cls(args.cache_katalog or _domyslnyKatalogPamieci(), args.cache_limit * 1024 * 1024)
+
+    def klucz(self, nazwa_plik_wej, format, obrazki=True, tylkoSylabusy=False):
+        if self._wersjaMutool is None:
+            self._wersjaMutool = _wersjaMutool() or ""
+        opis = "\n".join([_skrotPliku(nazwa_plik_wej), self._wersjaMutool,
+                          " ".join(_argumentyMutoolDraw(format, obrazki))]
+                         + ["bez obrazków"] * (not obrazki) + ["tylko sylabusy"] * tylkoSylabusy)
+        klucz = hashlib.sha256(opis.encode("utf-8")).hexdigest()[:32]
+
+        katalogWpisu = os.path.join(self.katalog, klucz)
+        if not os.path.isdir(katalogWpisu):
+            os.makedirs(katalogWpisu, exist_ok=True)
+            with open(os.path.join(katalogWpisu, "opis.json"), "wt", encoding="utf-8") as plik:
+                json.dump({"plik": os.path.basename(nazwa_plik_wej), "mutool": self._wersjaMutool,
+                           "format": format, "obrazki": obrazki, "tylkoSylabusy": tylkoSylabusy,
+                           "utworzono": time.time()},
+                          plik, ensure_ascii=False)
+
+        return klucz
+
+    def _dotknij(self, klucz):
+        try:
+            os.utime(os.path.join(self.katalog, klucz))
+        except FileNotFoundError:
+            pass
+
+    def sciezkaDokumentu(self, klucz, format):
+        self._dotknij(klucz)
+        return os.path.join(self.katalog, klucz, f"dokument.{format}")
+
+    def _sciezkaWyniku(self, klucz, silnik):
+        return os.path.join(self.katalog, klucz, f"warzal-{silnik}-{_wersjaNarzedzia()}.json")
+
+    def wczytajWynik(self, klucz, silnik="pyquery"):
+        """Zwróć (słownik przedmiotów, ostrzeżenia) albo None, jeśli brak wpisu."""
+        try:
+            with open(self._sciezkaWyniku(klucz, silnik), "rt", encoding="utf-8") as plik:
+                zapis = json.load(plik)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        self._dotknij(klucz)
+        wynik = {nazwaPrzedm: RekordPrzedmiotu.zeSlownika(przedmDict)
+                 for nazwaPrzedm, przedmDict in zapis["wynik"].items()}
+        return wynik, zapis["ostrzezenia"]
+
+    def zapiszWynik(self, klucz, wynik, ostrzezenia, silnik="pyquery"):
+        sciezka = self._sciezkaWyniku(klucz, silnik)
+        with open(f"{sciezka}.{os.getpid()}.tmp", "wt", encoding="utf-8") as plik:
+            json.dump({"wynik": {nazwaPrzedm: przedm.slownik() for nazwaPrzedm, przedm in wynik.items()},
+                       "ostrzezenia": ostrzezenia}, plik, ensure_ascii=False)
+        os.replace(f"{sciezka}.{os.getpid()}.tmp", sciezka)
+        self.przytnij()
+
+    def wpisy(self):
+        """Lista (klucz, rozmiar w bajtach, czas ostatniego użycia, opis) od najdawniej użytego."""
+        wpisy = []
+
+        for klucz in os.listdir(self.katalog):
+            katalogWpisu = os.path.join(self.katalog, klucz)
+            if not os.path.isdir(katalogWpisu):
+                continue
+
+            rozmiar = sum(os.path.getsize(os.path.join(katalogWpisu, n)) for n in os.listdir(katalogWpisu))
+            try:
+                with open(os.path.join(katalogWpisu, "opis.json"), "rt", encoding="utf-8") as plik:
+                    opis = json.load(plik)
+            except (FileNotFoundError, ValueError):
+                opis = {}
+            wpisy.append((klucz, rozmiar, os.path.getmtime(katalogWpisu), opis))
+
+        return sorted(wpisy, key=lambda wpis: wpis[2])
+
+    def przytnij(self):
+        """Usuwaj najdawniej używane wpisy, dopóki łączny rozmiar przekracza limit."""
+        wpisy = self.wpisy()
+        lacznie = sum(wpis[1] for wpis in wpisy)
+
+        for klucz, rozmiar, _, _ in wpisy:
+            if lacznie <= self.limitBajtow:
+                break
+            shutil.rmtree(os.path.join(self.katalog, klucz), ignore_errors=True)
+            lacznie -= rozmiar
+
+    def wyczysc(self):
+        for klucz, _, _, _ in self.wpisy():
+            shutil.rmtree(os.path.join(self.katalog, klucz), ignore_errors=True)
+
+    def wypiszInformacje(self):
+        wpisy = self.wpisy()
+        print(f"Katalog pamięci podręcznej: {self.katalog}")
+        print(f"Wpisów: {len(wpisy)}, rozmiar: {sum(w[1] for w in wpisy) / 2**20:.1f} MB "
+              f"(limit {self.limitBajtow / 2**20:.0f} MB)")
+
+        for klucz, rozmiar, uzyto, opis in reversed(wpisy):
+            print(f"{klucz}  {rozmiar / 2**20:8.1f} MB  {time.strftime('%Y-%m-%d %H:%M', time.localtime(uzyto))}  "
+                  f"{opis.get('format', '?'):5}  {opis.get('plik', '?')}")
+
+
+NazwaPamieciBlokow = "bloki.sqlite"
+
+SchematPamieciBlokow = """
+CREATE TABLE IF NOT EXISTS bloki (
+    odcisk TEXT NOT NULL,
+    wersja TEXT NOT NULL,
+    nazwa TEXT NOT NULL,
+    rekord TEXT NOT NULL,
+    rozmiar INTEGER NOT NULL,
+    uzyto REAL NOT NULL,
+    PRIMARY KEY (odcisk, wersja)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS bloki_uzyto ON bloki (uzyto);
+CREATE TABLE IF NOT EXISTS statystyki (
+    nazwa TEXT PRIMARY KEY,
+    wartosc INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class PamiecBlokow:
+    """
+    Trwała pamięć przedmiotów wyciągniętych z bloków stron, wspólna dla
+    wszystkich dokumentów. Te same sylabusy (lektoraty, BHP, przedmioty
+    ogólnouczelniane) powtarzają się bez zmian w wielu programach studiów,
+    więc wystarczy wyciągnąć je raz - kolejne wystąpienia są rozpoznawane
+    po odcisku bloku (`_odciskBloku`).
+
+    Wpisy są przechowywane w bazie SQLite w katalogu pamięci podręcznej,
+    osobno dla każdej wersji tego skryptu. Nowe wpisy i czasy użycia są
+    zapisywane jedną transakcją w `zatwierdz` (po przetworzeniu dokumentu),
+    więc z pamięci mogą równocześnie korzystać procesy przetwarzania
+    wsadowego. Rozmiar jest ograniczony; po przekroczeniu limitu usuwane są
+    najdawniej używane wpisy (LRU). Liczby trafień i chybień są sumowane
+    w bazie między uruchomieniami (zob. `statystyki`).
+    """
+
+    def __init__(self, sciezka, limitBajtow):
+        self.sciezka = sciezka
+        self.limitBajtow = limitBajtow
+        self.wersja = _wersjaNarzedzia()
+        self.trafienia = 0
+        self.chybienia = 0
+        self._nowe = {} # odcisk -> (nazwa, rekord w JSON)
+        self._uzyte = set()
+        os.makedirs(os.path.dirname(os.path.abspath(sciezka)), exist_ok=True)
+        self._polaczenie = sqlite3.connect(sciezka, timeout=60)
+        self._polaczenie.executescript(SchematPamieciBlokow)
+
+    @classmethod
+    def zArgumentow(cls, args):
+        return cls(os.path.join(args.cache_katalog or _domyslnyKatalogPamieci(), NazwaPamieciBlokow),
+                   args.pamiec_blokow_limit * 1024 * 1024)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *wyjatek):
+        try:
+            self.zatwierdz()
+        finally:
+            self._polaczenie.close()
+
+    def wczytaj(self, odcisk):
+        """Zwróć (nazwa przedmiotu, `RekordPrzedmiotu`) albo None, jeśli bloku nie ma w pamięci."""
+        if odcisk in self._nowe:
+            nazwaPrzedm, rekord = self._nowe[odcisk]
+        else:
+            wiersz = self._polaczenie.execute("SELECT nazwa, rekord FROM bloki WHERE odcisk = ? AND wersja = ?",
+                                              (odcisk, self.wersja)).fetchone()
+            if wiersz is None:
+                self.chybienia += 1
+                return None
+            nazwaPrzedm, rekord = wiersz
+            self._uzyte.add(odcisk)
+
+        self.trafienia += 1
+        return nazwaPrzedm, RekordPrzedmiotu.zeSlownika(json.loads(rekord))
+
+    def zapisz(self, odcisk, nazwaPrzedm, przedm):
+        # Rekord jest serializowany od razu - przedmiot może być potem
+        # uzupełniany (powtórzone sylabusy w `warzal_PyQuery`).
+        self._nowe[odcisk] = (nazwaPrzedm, json.dumps(przedm.slownik(), ensure_ascii=False))
+
+    def zatwierdz(self):
+        """Zapisz nowe wpisy, czasy użycia i liczniki, a potem przytnij pamięć do limitu."""
+        teraz = time.time()
+        with self._polaczenie:
+            self._polaczenie.executemany(
+                "INSERT OR REPLACE INTO bloki VALUES (?, ?, ?, ?, ?, ?)",
+                ((odcisk, self.wersja, nazwaPrzedm, rekord, len(nazwaPrzedm.encode("utf-8")) + len(rekord.encode("utf-8")), teraz)
+                 for odcisk, (nazwaPrzedm, rekord) in self._nowe.items()))
+            self._polaczenie.executemany("UPDATE bloki SET uzyto = ? WHERE odcisk = ? AND wersja = ?",
+                                         ((teraz, odcisk, self.wersja) for odcisk in self._uzyte))
+            self._polaczenie.executemany(
+                "INSERT INTO statystyki VALUES (?, ?) "
+                "ON CONFLICT (nazwa) DO UPDATE SET wartosc = wartosc + excluded.wartosc",
+                [("trafienia", self.trafienia), ("chybienia", self.chybienia)])
+            self._przytnij()
+
+        self._nowe.clear()
+        self._uzyte.clear()
+        self.trafienia = self.chybienia = 0
+
+    def _przytnij(self):
+        lacznie = self._polaczenie.execute("SELECT coalesce(sum(rozmiar), 0) FROM bloki").fetchone()[0]
+        if lacznie <= self.limitBajtow:
+            return
+
+        usuwane = []
+        for odcisk, wersja, rozmiar in self._polaczenie.execute(
+                "SELECT odcisk, wersja, rozmiar FROM bloki ORDER BY uzyto"):
+            if lacznie <= self.limitBajtow:
+                break
+            usuwane.append((odcisk, wersja))
+            lacznie -= rozmiar
+        self._polaczenie.executemany("DELETE FROM bloki WHERE odcisk = ? AND wersja = ?", usuwane)
+
+    def statystyki(self):
+        """Słownik z liczbą wpisów, ich rozmiarem w bajtach i łącznymi liczbami trafień i chybień."""
+        wpisy, rozmiar = self._polaczenie.execute("SELECT count(*), coalesce(sum(rozmiar), 0) FROM bloki").fetchone()
+        liczniki = dict(self._polaczenie.execute("SELECT nazwa, wartosc FROM statystyki"))
+        return {"wpisy": wpisy, "rozmiar": rozmiar,
+                "trafienia": liczniki.get("trafienia", 0), "chybienia": liczniki.get("chybienia", 0)}
+
+    def wypiszInformacje(self):
+        stat = self.statystyki()
+        odczyty = stat["trafienia"] + stat["chybienia"]
+        print(f"Pamięć bloków: {self.sciezka}")
+        print(f"Wpisów: {stat['wpisy']}, rozmiar: {stat['rozmiar'] / 2**20:.1f} MB "
+              f"(limit {self.limitBajtow / 2**20:.0f} MB)")
+        print(f"Trafienia: {stat['trafienia']} z {odczyty} bloków "
+              f"({_procent(stat['trafienia'], odczyty)})")
+
+
+def _procent(ile, zIlu):
+    return f"{100 * ile / zIlu:.1f}%" if zIlu else "-"
+
+
+def _pamiecBlokow(args):
+    """`PamiecBlokow` dla opcji ``--pamiec-blokow`` albo pusty kontekst (wartość None)."""
+    return PamiecBlokow.zArgumentow(args) if args.pamiec_blokow else contextlib.nullcontext()
+
+
+def _liczbaStronPDF(mutool_exe_path, nazwa_plik_wej):
+    wynik = subprocess.run([mutool_exe_path, "show", nazwa_plik_wej, "trailer/Root/Pages/Count"],
+                           capture_output=True, text=True)
+    return int(wynik.stdout.split()[-1])
+
+
+def _czySylabusTekst(pierwszaLinia):
+    """
+    Odpowiednik `isSylabusPage` dla tekstu strony z `mutool draw -F txt`:
+    pierwsza niepusta linia strony to nagłówek "Sylabusy".
+    """
+    return pierwszaLinia is not None and " ".join(pierwszaLinia.split()) == "Sylabusy"
+
+
+def _czyTytulowaTekst(strona):
+    # Odpowiednik `_czyTytulowaSurowa` dla tekstu strony z `mutool draw -F txt`
+    # (bez obrazków, więc tylko kotwice tekstowe).
+    return "Karta opisu przedmiotu" in strona and "Ścieżka" in strona
+
+
+def _stronyTekstu(tekst):
+    # Tekst kolejnych stron - każda strona kończy się znakiem nowej strony (\f).
+    strona = []
+    for linia in tekst:
+        while "\f" in linia:
+            przed, _, linia = linia.partition("\f")
+            strona.append(przed)
+            yield "".join(strona)
+            strona = []
+        strona.append(linia)
+
+    yield "".join(strona)
+
+
+def stronySylabusowPDF(mutool_exe_path, nazwa_plik_wej):
+    """
+    Wstępne przejrzenie PDF: numery stron (od 1), które są stronami
+    sylabusów. Wystarcza do tego sam tekst stron (`mutool draw -F txt`, bez
+    położeń i stylów), więc jest to dużo tańsze niż pełna konwersja.
+
+    Zakłada to, że pierwszą linią tekstu każdej strony sylabusu jest
+    nagłówek "Sylabusy". Niezależnie od nagłówka zliczane są więc też strony
+    z kotwicami strony tytułowej - `konwertujPDF` sprawdza na tej podstawie,
+    czy żadna strona tytułowa nie została pominięta.
+
+    Returns
+    -------
+    tuple or None
+        (rosnąca lista numerów stron sylabusów, liczba stron tytułowych
+        w całym tekście) albo None, jeśli mutool zakończył się błędem.
+
+    """
+    proces = subprocess.Popen([mutool_exe_path, "draw", "-F", "txt", "-o", "-", nazwa_plik_wej],
+                              stdout=subprocess.PIPE)
+    strony, liczbaTytulowych = [], 0
+
+    with io.TextIOWrapper(proces.stdout, encoding="utf-8", errors="replace") as tekst:
+        for numer, strona in enumerate(_stronyTekstu(tekst), start=1):
+            pierwszaLinia = next((linia for linia in strona.splitlines() if linia.strip()), None)
+            if _czySylabusTekst(pierwszaLinia):
+                strony.append(numer)
+            liczbaTytulowych += _czyTytulowaTekst(strona)
+
+    return (strony, liczbaTytulowych) if proces.wait() == 0 else None
+
+
+def _stronyTytuloweDokumentu(dokument, format):
+    """
+    Liczba stron tytułowych sylabusów w dokumencie pośrednim - dla HTML
+    z szybkiego przejrzenia bez parsowania (`_przeskanujStrony`).
+    """
+    if format == "html":
+        return sum(tytulowa for _, tytulowa in _przeskanujStrony(dokument)[0])
+
+    indeksy = (IndeksStrony(div) for div in strony_stext(dokument))
+    return sum(indeks.czySylabus() and indeks.czyTytulowa() for indeks in indeksy)
+
+
+def _stronySylabusowDokumentu(dokument, format):
+    # Numery stron (z PDF) dokumentu pośredniego, które są stronami sylabusów.
+    strony = strony_stext(dokument) if format == "stext" else strony_html(dokument)
+    return [lx_wyciagnijNumerStrony(div) for div in strony if lx_czySylabus(div)]
+
+
+def _zakresyMutool(numeryStron):
+    """Rosnące numery stron w postaci zakresów dla `mutool draw`, np. "1-3,5,8-9"."""
+    zakresy = []
+    for _, grupa in itertools.groupby(enumerate(numeryStron), lambda para: para[1] - para[0]):
+        grupa = [numer for _, numer in grupa]
+        zakresy.append(f"{grupa[0]}-{grupa[-1]}" if len(grupa) > 1 else f"{grupa[0]}")
+    return ",".join(zakresy)
+
+
+def _zakresyStron(liczbaStron, liczbaZakresow):
+    """
+    Podziel strony 1..`liczbaStron` na co najwyżej `liczbaZakresow` ciągłych
+    zakresów o możliwie równej długości.
+
+    Returns
+    -------
+    list
+        Lista par (pierwsza strona, ostatnia strona), numeracja od 1.
+
+    """
+    liczbaZakresow = max(1, min(liczbaZakresow, liczbaStron))
+    dlugosc, reszta = divmod(liczbaStron, liczbaZakresow)
+    zakresy = []
+    poczatek = 1
+
+    for k in range(liczbaZakresow):
+        koniec = poczatek + dlugosc - 1 + (1 if k < reszta else 0)
+        zakresy.append((poczatek, koniec))
+        poczatek = koniec + 1
+
+    return zakresy
+
+
+def _przenumerujStrony(html, numeryStron):
+    """
+    Nadaj kolejnym stronom ``<div id="pageN">`` (lub ``<page id="pageN">``
+    w stext) numery z `numeryStron`, tak aby numeracja odpowiadała stronom
+    całego PDF, a nie pozycji w przekonwertowanym fragmencie.
+    """
+    numery = iter(numeryStron)
+    return re.sub('<(div|page) id="page\\d+"', lambda m: f'<{m[1]} id="page{next(numery)}"', html)
+
+
+def _argumentyMutoolDraw(format, obrazki=True):
+    """
+    Argumenty `mutool draw` dla danego formatu pośredniego ('html' lub
+    'stext'). Bez `obrazki` stext nie zawiera bloków z obrazkami (HTML od
+    mutool zawsze je zawiera - zob. `_StrumienBezObrazkow`).
+    """
+    if format == "stext":
+        # Z `preserve-images` w stext są bloki z obrazkami, po których
+        # rozpoznawana jest strona tytułowa przedmiotu. Bez nich rozpoznaje
+        # się ją po kotwicach tekstowych (zob. `IndeksStrony.czyTytulowa`).
+        return ["draw", "-F", "stext", "-O", "preserve-images"] if obrazki else ["draw", "-F", "stext"]
+    else:
+        return ["draw", "-F", "html"]
+
+
+# Treść obrazka osadzona w HTML od mutool jako data URI w atrybucie src.
+_ZnacznikDanychObrazka = b'src="data:'
+_re_DaneObrazka = re.compile('src="data:[^"]*"')
+
+
+def _usunDaneObrazkow(html):
+    """Usuń z HTML treść obrazków (data URI), zostawiając same znaczniki ``<img>``."""
+    return _re_DaneObrazka.sub('src=""', html)
+
+
+class _StrumienBezObrazkow:
+    """
+    Obiekt plikowy do czytania HTML od mutool draw ze strumienia `zrodlo`
+    (otwartego binarnie) z pominięciem treści obrazków, jak w
+    `_usunDaneObrazkow`. Obrazki to większość bajtów dokumentu, a do
+    ekstrakcji wystarczą same znaczniki ``<img>`` z położeniem.
+
+    Treść obrazka jest pomijana w miarę czytania, bez buforowania całego
+    atrybutu.
+    """
+
+    def __init__(self, zrodlo):
+        self.zrodlo = zrodlo
+        self._reszta = b"" # Końcówka bloku, która może być początkiem znacznika.
+        self._wObrazku = False
+
+    def _przefiltruj(self, dane):
+        dane = self._reszta + dane
+        self._reszta = b""
+        wynik = []
+
+        while dane:
+            if self._wObrazku:
+                koniec = dane.find(b'"')
+                if koniec < 0:
+                    return b"".join(wynik)
+                wynik.append(b'"')
+                dane = dane[koniec + 1:]
+                self._wObrazku = False
+            else:
+                poczatek = dane.find(_ZnacznikDanychObrazka)
+                if poczatek < 0:
+                    # Znacznik może być przecięty granicą bloku.
+                    ciecie = max(len(dane) - len(_ZnacznikDanychObrazka) + 1, 0)
+                    wynik.append(dane[:ciecie])
+                    self._reszta = dane[ciecie:]
+                    return b"".join(wynik)
+                wynik.append(dane[:poczatek] + b'src="')
+                dane = dane[poczatek + len(_ZnacznikDanychObrazka):]
+                self._wObrazku = True
+
+        return b"".join(wynik)
+
+    def read1(self, rozmiar=-1):
+        while True:
+            dane = self.zrodlo.read1(rozmiar) if rozmiar > 0 else self.zrodlo.read()
+            if not dane:
+                reszta, self._reszta = self._reszta, b""
+                return reszta
+            przefiltrowane = self._przefiltruj(dane)
+            if przefiltrowane:
+                return przefiltrowane
+
+    def read(self, rozmiar=-1):
+        if rozmiar > 0:
+            return self.read1(rozmiar)
+        return b"".join(iter(lambda: self.read1(1 << 16), b""))
+
+
+def _granicaTresci(dokument, format):
+    """Początek i koniec części dokumentu zawierającej strony."""
+    if format == "stext":
+        return re.search("<document[^>]*>", dokument).end(), dokument.rindex("</document>")
+    else:
+        return dokument.index("<body>") + len("<body>"), dokument.rindex("</body>")
+
+
+def _konwertujPDFRownolegle(mutool_exe_path, nazwa_plik_wej, temp_html_fname, procesy, format="html",
+                            obrazki=True, strony=None):
+    """
+    Konwertuj PDF na HTML w kilku równoległych procesach `mutool draw`, każdy
+    dla innego zakresu stron, a potem połącz wyniki w jeden dokument.
+
+    Połączony dokument jest równoważny temu z jednego wywołania `mutool
+    draw` - numeracja stron jest globalna, a ekstrakcja działa dopiero na
+    całości, więc granice zakresów nie muszą pokrywać się z granicami
+    sylabusów.
+
+    Jeśli podano `strony` (rosnące numery stron, zob. `stronySylabusowPDF`),
+    konwertowane są tylko te strony - z ich numerami z PDF - nawet przy
+    jednym procesie.
+    """
+    if strony is None:
+        try:
+            liczbaStron = _liczbaStronPDF(mutool_exe_path, nazwa_plik_wej)
+        except (ValueError, IndexError):
+            logging.warning("nie udało się odczytać liczby stron %s, konwersja w jednym procesie",
+                            nazwa_plik_wej)
+            liczbaStron = 1
+        strony = range(1, liczbaStron + 1)
+    elif not strony:
+        raise ValueError("pusta lista stron do konwersji")
+    else:
+        liczbaStron = None
+
+    zakresy = _zakresyStron(len(strony), procesy)
+    if len(zakresy) == 1 and liczbaStron is not None:
+        _konwertujPDFJednymProcesem(mutool_exe_path, nazwa_plik_wej, temp_html_fname, format, obrazki)
+        return
+
+    czesci = [strony[pocz - 1:kon] for pocz, kon in zakresy]
+    fragmenty = [f"{temp_html_fname}.{k}" for k in range(len(czesci))]
+
+    konwersje = [subprocess.Popen([mutool_exe_path, *_argumentyMutoolDraw(format, obrazki), "-o", fragment,
+                                   nazwa_plik_wej, _zakresyMutool(czesc)])
+                 for fragment, czesc in zip(fragmenty, czesci)]
+    kodyWyjscia = [konwersja.wait() for konwersja in konwersje]
+    if any(kodyWyjscia):
+        # Fragment nieudanej konwersji może nie istnieć albo być urwany -
+        # nie może trafić do dokumentu (ani do pamięci podręcznej).
+        for fragment in fragmenty:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(fragment)
+        _sprawdzKodMutool(max(kodyWyjscia, key=bool), nazwa_plik_wej)
+
+    with open(temp_html_fname, "wt", encoding="utf-8") as plikWyj:
+        for k, (fragment, czesc) in enumerate(zip(fragmenty, czesci)):
+            with open(fragment, "rt", encoding="utf-8") as plikFrag:
+                html = plikFrag.read()
+            os.remove(fragment)
+
+            poczBody, konBody = _granicaTresci(html, format)
+            if not obrazki and format == "html":
+                html = html[:poczBody] + _usunDaneObrazkow(html[poczBody:konBody]) + html[konBody:]
+                poczBody, konBody = _granicaTresci(html, format)
+
+            if k == 0:
+                plikWyj.write(html[:poczBody])
+            plikWyj.write(_przenumerujStrony(html[poczBody:konBody], czesc))
+            if k == len(czesci) - 1:
+                plikWyj.write(html[konBody:])
+
+
+@functools.lru_cache(maxsize=None)
+def _sciezkaMutool():
+    """
+    Ścieżka do programu mutool (wyszukiwana raz na proces); błąd
+    RuntimeError, jeśli go nie ma.
+    """
+    mutool_exe_path = shutil.which("mutool")
+    if mutool_exe_path is None:
+        raise RuntimeError("nie można znaleźć programu mutool, który jest niezbędny do przetwarzania plików PDF. "
+                           "Sprawdź swoje środowisko i/lub zainstaluj mutool z mupdf w miejscu, które będzie widoczne dla "
+                           "programu tzn. np. w tym samym katalogu lub w innym katalogu znajdującym się w PATH.")
+    else:
+        logging.info("using mutool at %s", mutool_exe_path)
+
+    return mutool_exe_path
+
+
+def _sprawdzKodMutool(kodWyjscia, nazwa_plik_wej):
+    if kodWyjscia != 0:
+        raise RuntimeError(f"mutool draw zakończył się kodem {kodWyjscia} dla pliku {nazwa_plik_wej}")
+
+
+def _konwertujPDFJednymProcesem(mutool_exe_path, nazwa_plik_wej, plik_wyj, format="html", obrazki=True):
+    if obrazki or format != "html":
+        wynik = subprocess.run([mutool_exe_path, *_argumentyMutoolDraw(format, obrazki),
+                                "-o", plik_wyj, nazwa_plik_wej], text=True)
+        _sprawdzKodMutool(wynik.returncode, nazwa_plik_wej)
+        return
+
+    # Treść obrazków jest odfiltrowywana z wyjścia mutool, zanim trafi na dysk.
+    proces = subprocess.Popen([mutool_exe_path, *_argumentyMutoolDraw(format), "-o", "-",
+                               nazwa_plik_wej], stdout=subprocess.PIPE)
+    with proces.stdout, open(plik_wyj, "wb") as plik:
+        shutil.copyfileobj(_StrumienBezObrazkow(proces.stdout), plik)
+    _sprawdzKodMutool(proces.wait(), nazwa_plik_wej)
+
+
+def konwertujPDF(nazwa_plik_wej, plik_wyj, procesy=1, format="html", obrazki=True, tylkoSylabusy=False,
+                 ostrzezenia=None):
+    """
+    Przekonwertuj plik PDF na HTML (lub stext) z użyciem `mutool draw`.
+
+    Plik wyjściowy pojawia się pod docelową nazwą dopiero po zakończeniu
+    konwersji, więc przerwana konwersja nie zostawia niepełnego dokumentu.
+    Jeśli którykolwiek proces `mutool draw` zakończy się błędem, zgłaszany
+    jest RuntimeError, a plik wyjściowy nie powstaje.
+
+    Parameters
+    ----------
+    nazwa_plik_wej : str
+        Nazwa pliku PDF.
+    plik_wyj : str
+        Nazwa pliku, do którego zostanie zapisany dokument pośredni.
+    procesy : int
+        Liczba równoległych procesów `mutool draw`, z których każdy
+        konwertuje inny zakres stron.
+    format : str
+        Format pośredni: 'html' albo 'stext' (tekst strukturalny).
+    obrazki : bool
+        Jeśli fałsz, dokument pośredni nie zawiera treści obrazków (HTML ma
+        puste znaczniki ``<img>``, stext - nie ma bloków z obrazkami).
+    tylkoSylabusy : bool
+        Jeśli prawda, konwertowane są tylko strony sylabusów wyznaczone przez
+        `stronySylabusowPDF` (z numerami stron z PDF). Gdy nie uda się ich
+        wyznaczyć albo przekonwertowane strony zawierają mniej stron
+        tytułowych, niż znalazło wstępne przejrzenie tekstu (pominięte
+        strony sylabusów), konwertowany jest cały dokument.
+    ostrzezenia : list, optional
+        Lista na ostrzeżenie o pominiętych stronach tytułowych (zob.
+        `_ostrzez`).
+
+    """
+    # Try if mutool is available
+    mutool_exe_path = _sciezkaMutool()
+
+    temp_fname = f"{plik_wyj}.{os.getpid()}.tmp"
+
+    strony, liczbaTytulowych = (stronySylabusowPDF(mutool_exe_path, nazwa_plik_wej) if tylkoSylabusy
+                                else None) or (None, 0)
+    if tylkoSylabusy and not strony:
+        logging.warning("nie znaleziono stron sylabusów w %s, konwersja całego dokumentu", nazwa_plik_wej)
+        strony = None
+    elif strony is not None:
+        logging.info("konwersja %d stron sylabusów z %s", len(strony), nazwa_plik_wej)
+
+    def konwertuj(strony):
+        if procesy > 1 or strony is not None:
+            _konwertujPDFRownolegle(mutool_exe_path, nazwa_plik_wej, temp_fname, procesy, format, obrazki,
+                                    strony)
+        else:
+            _konwertujPDFJednymProcesem(mutool_exe_path, nazwa_plik_wej, temp_fname, format, obrazki)
+
+    try:
+        konwertuj(strony)
+
+        if strony is not None:
+            # Strona sylabusu, której tekst nie zaczyna się nagłówkiem
+            # "Sylabusy", zostałaby pominięta bez śladu; widać to po
+            # brakujących stronach tytułowych.
+            znalezione = _stronyTytuloweDokumentu(temp_fname, format)
+            if znalezione < liczbaTytulowych:
+                _ostrzez(ostrzezenia, f"Uwaga: wstępne przejrzenie tekstu {nazwa_plik_wej} znalazło "
+                                      f"{liczbaTytulowych} stron tytułowych sylabusów, a strony z nagłówkiem "
+                                      f"'Sylabusy' zawierają tylko {znalezione} - konwersja całego dokumentu")
+                konwertuj(None)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temp_fname)
+        raise
+
+    os.replace(temp_fname, plik_wyj)
+
+
+class _KopiaStrumienia:
+    """
+    Obiekt plikowy do czytania strumienia `zrodlo` (np. stdout procesu),
+    który wszystko, co zostało przeczytane, zapisuje również do plików `kopie`.
+    """
+
+    def __init__(self, zrodlo, kopie):
+        self.zrodlo = zrodlo
+        self.kopie = kopie
+
+    def read(self, rozmiar=-1):
+        # read1 oddaje dane zaraz, gdy są dostępne w potoku, zamiast czekać
+        # na pełny bufor - parser może ruszyć, zanim mutool skończy stronę.
+        dane = self.zrodlo.read1(rozmiar) if rozmiar > 0 else self.zrodlo.read()
+        for kopia in self.kopie:
+            kopia.write(dane)
+        return dane
+
+    def doczytaj(self):
+        """Przeczytaj (i skopiuj) resztę strumienia."""
+        while self.read(1 << 16):
+            pass
+
+
+def strony_mutool(nazwa_plik_wej, format="html", kopie=(), obrazki=True):
+    """
+    Uruchom `mutool draw` z wyjściem na standardowe wyjście i zwracaj strony
+    dokumentu pośredniego w miarę, jak mutool je generuje - konwersja PDF
+    i ekstrakcja przebiegają równolegle, bez pliku tymczasowego.
+
+    Parameters
+    ----------
+    nazwa_plik_wej : str
+        Nazwa pliku PDF.
+    format : str
+        Format pośredni: 'html' albo 'stext'.
+    kopie : iterable of str
+        Pliki, do których zostanie zapisany również cały dokument pośredni
+        (np. ``--keep-html`` albo pamięć podręczna). Pojawiają się pod
+        docelowymi nazwami dopiero po pomyślnym zakończeniu konwersji.
+    obrazki : bool
+        Jak w `konwertujPDF` - bez treści obrazków dotyczy to także kopii.
+
+    Yields
+    ------
+    lxml.etree._Element
+        Element ``<div>`` reprezentujący pojedynczą stronę, jak w
+        `strony_html` i `strony_stext`.
+
+    """
+    proces = subprocess.Popen([_sciezkaMutool(), *_argumentyMutoolDraw(format, obrazki), "-o", "-",
+                               nazwa_plik_wej], stdout=subprocess.PIPE)
+    tymczasowe = [f"{kopia}.{os.getpid()}.tmp" for kopia in kopie]
+    plikiKopii = [open(tymcz, "wb") for tymcz in tymczasowe]
+    wyjscie = proces.stdout if obrazki or format != "html" else _StrumienBezObrazkow(proces.stdout)
+    strumien = _KopiaStrumienia(wyjscie, plikiKopii)
+    ukonczono = False
+
+    try:
+        yield from (strony_stext if format == "stext" else strony_html)(strumien)
+        strumien.doczytaj()
+        ukonczono = True
+    finally:
+        if not ukonczono:
+            proces.kill()
+        proces.stdout.close()
+        kodWyjscia = proces.wait()
+        for plik in plikiKopii:
+            plik.close()
+
+        if ukonczono and kodWyjscia == 0:
+            for tymcz, kopia in zip(tymczasowe, kopie):
+                os.replace(tymcz, kopia)
+        else:
+            for tymcz in tymczasowe:
+                os.remove(tymcz)
+
+    _sprawdzKodMutool(kodWyjscia, nazwa_plik_wej)
+
+
+def _dokumentPosredni(nazwa_plik_wej, args, format, pamiec=None, ostrzezenia=None):
+    """
+    Zwróć ścieżkę dokumentu pośredniego (HTML lub stext) dla pliku PDF -
+    z pamięci podręcznej, jeśli jest tam już gotowy, a w przeciwnym razie
+    po konwersji (z ostrzeżeniami konwersji w `ostrzezenia`).
+
+    Returns
+    -------
+    tuple
+        (ścieżka dokumentu, katalog tymczasowy do usunięcia po użyciu lub None)
+
+    """
+    if pamiec is not None:
+        sciezka = pamiec.sciezkaDokumentu(pamiec.klucz(nazwa_plik_wej, format, not args.bez_obrazkow,
+                                                       args.tylko_sylabusy), format)
+        if not os.path.exists(sciezka):
+            konwertujPDF(nazwa_plik_wej, sciezka, args.mutool_j, format, not args.bez_obrazkow,
+                         args.tylko_sylabusy, ostrzezenia)
+            pamiec.przytnij()
+        else:
+            logging.info("dokument pośredni %s z pamięci podręcznej", sciezka)
+        return sciezka, None
+
+    katalogTymcz = tempfile.mkdtemp(prefix="autosylabusuj-")
+    sciezka = os.path.join(katalogTymcz, f"{os.path.basename(nazwa_plik_wej)}.{format}")
+    konwertujPDF(nazwa_plik_wej, sciezka, args.mutool_j, format, not args.bez_obrazkow, args.tylko_sylabusy,
+                 ostrzezenia)
+    return sciezka, katalogTymcz
+
+
+def roznicePrzedmiotow(warzalA, warzalB):
+    """
+    Porównaj pole po polu dwa wyniki trybu WarZal (słowniki przedmiotów).
+
+    Yields
+    ------
+    tuple
+        (nazwa przedmiotu, nazwa pola, wartość w A, wartość w B) dla każdej
+        różnicy. Brak przedmiotu po jednej ze stron jest zgłaszany z nazwą
+        pola ``None``.
+
+    """
+    for nazwaPrzedm in list(warzalA) + [n for n in warzalB if n not in warzalA]:
+        if nazwaPrzedm not in warzalA or nazwaPrzedm not in warzalB:
+            yield nazwaPrzedm, None, nazwaPrzedm in warzalA, nazwaPrzedm in warzalB
+            continue
+
+        przedmA, przedmB = warzalA[nazwaPrzedm], warzalB[nazwaPrzedm]
+        for pole in list(przedmA) + [p for p in przedmB if p not in przedmA]:
+            if przedmA.get(pole) != przedmB.get(pole):
+                yield nazwaPrzedm, pole, przedmA.get(pole), przedmB.get(pole)
+
+
+def _sprawdzZgodnoscBackendow(nazwa_plik_wej, args, warzalDict, ostrzezenia=None, pamiec=None):
+    # Ekstrakcja tego samego PDF z drugim formatem pośrednim i porównanie wyników.
+    innyBackend = "html" if args.backend == "stext" else "stext"
+    dokument, katalogTymcz = _dokumentPosredni(nazwa_plik_wej, args, innyBackend, pamiec, ostrzezenia)
+    warzalInny = warzal_PyQuery(dokument, strumieniowo=True, ostrzezenia=[], silnik=args.silnik)
+    if katalogTymcz is not None:
+        shutil.rmtree(katalogTymcz, ignore_errors=True)
+
+    liczbaRoznic = 0
+    for nazwaPrzedm, pole, wartosc, wartoscInna in roznicePrzedmiotow(warzalDict, warzalInny):
+        liczbaRoznic += 1
+        _ostrzez(ostrzezenia, f"Uwaga: różnica między backendami {args.backend} i {innyBackend} "
+                              f"w przedmiocie '{nazwaPrzedm}', pole {pole}: {wartosc!r} != {wartoscInna!r}")
+
+    if args.v >= 1:
+        print(f"Zgodność backendów {args.backend}/{innyBackend}: {liczbaRoznic} różnic")
+
+    if args.tylko_sylabusy:
+        _sprawdzStronySylabusow(nazwa_plik_wej, args, ostrzezenia, pamiec)
+
+
+def _sprawdzStronySylabusow(nazwa_plik_wej, args, ostrzezenia=None, pamiec=None):
+    # Wstępne przejrzenie tekstu (--tylko-sylabusy) zakłada, że każda strona
+    # sylabusu zaczyna się nagłówkiem "Sylabusy" - porównanie wybranych stron
+    # ze stronami sylabusów w konwersji całego dokumentu.
+    wybrane = stronySylabusowPDF(_sciezkaMutool(), nazwa_plik_wej)
+    argsPelne = argparse.Namespace(**{**vars(args), "tylko_sylabusy": False})
+    dokument, katalogTymcz = _dokumentPosredni(nazwa_plik_wej, argsPelne, args.backend, pamiec)
+    try:
+        pominiete = sorted(set(_stronySylabusowDokumentu(dokument, args.backend))
+                           - set(wybrane[0] if wybrane else ()))
+    finally:
+        if katalogTymcz is not None:
+            shutil.rmtree(katalogTymcz, ignore_errors=True)
+
+    for numer in pominiete:
+        _ostrzez(ostrzezenia, f"Uwaga: strona {numer} jest stroną sylabusu w konwersji całego dokumentu, "
+                              f"ale wstępne przejrzenie tekstu (--tylko-sylabusy) ją pomija")
+
+    if args.v >= 1:
+        print(f"Zgodność --tylko-sylabusy z konwersją całego dokumentu: {len(pominiete)} pominiętych stron")
+
+
+def _zapiszRaport(wynik, nazwa_plik_wej, args, out_fname=None, metryki=None, ostrzezenia=()):
+    with _etap(metryki, "zapis"):
+        _zapiszRaportFormat(wynik, nazwa_plik_wej, args, out_fname, ostrzezenia)
+
+
+def _zapiszRaportFormat(wynik, nazwa_plik_wej, args, out_fname=None, ostrzezenia=()):
+    if args.tryb.lower() == "warzal":
+        if args.format.lower() in {"tsv", "csv"}:
+            warzal_formatWyjsciaTSV(wynik, nazwa_plik_wej, out_fname)
+        elif args.format.lower() in {"ini"}:
+            warzal_formatWyjsciaINI(wynik, nazwa_plik_wej, out_fname)
+        elif args.format.lower() in {"sqlite"}:
+            warzal_formatWyjsciaSQLite(wynik, nazwa_plik_wej, out_fname, ostrzezenia)
+        elif args.format.lower() in {"jsonl"}:
+            warzal_formatWyjsciaJSONL(wynik.items(), nazwa_plik_wej, out_fname)
+    elif args.tryb.lower() == "plantab":
+        plantab_formatWyjsciaTSV(wynik, nazwa_plik_wej, out_fname)
+
+
+def przetworzPlik(nazwa_plik_wej, args, out_fname=None, ostrzezenia=None, metryki=None):
+    """
+    Przetwórz jeden plik wejściowy zgodnie z opcjami wiersza poleceń `args`
+    i zapisz dla niego raport.
+
+    Dla plików PDF w trybie WarZal używana jest pamięć podręczna (o ile nie
+    wyłączono jej opcją ``--bez-cache``): dokument pośredni i wynik
+    ekstrakcji są zapamiętywane pod kluczem wyliczonym z zawartości PDF, więc
+    ponowne przetworzenie tego samego pliku pomija oba etapy.
+
+    Jeśli podano `metryki` (obiekt `Metryki`), zbierane są w nim pomiary
+    czasu etapów, a ekstrakcja jest profilowana, o ile profiler jest włączony.
+
+    Returns
+    -------
+    dict or tuple
+        Słownik przedmiotów (tryb WarZal) lub, w trybie PlanTab, liczba
+        zapisanych wierszy i lista błędnych wierszy (zob.
+        `plantab_przetworzPliki`).
+
+    """
+    if metryki is not None:
+        metryki.licz("pliki")
+
+    if args.tryb.lower() == "plantab":
+        # Wiersze planu są zapisywane na bieżąco, więc parsowanie i zapis to
+        # jeden etap.
+        with _profiluj(metryki), _etap(metryki, "plantab"):
+            return plantab_przetworzPliki([nazwa_plik_wej], out_fname, ostrzezenia=ostrzezenia)
+
+    # Ostrzeżenia pliku są potrzebne także przy zapisie raportu (np. do bazy
+    # SQLite), więc są zbierane i przekazywane dalej dopiero po ekstrakcji.
+    ostrzezeniaPliku = []
+
+    if args.format.lower() == "jsonl" and not args.porownaj_backendy:
+        # Przedmioty są zapisywane, gdy tylko są kompletne - bez gromadzenia
+        # wyników całego dokumentu.
+        zapisRekordow = lambda rekordy: warzal_formatWyjsciaJSONL(rekordy, nazwa_plik_wej, out_fname)
+        with _pamiecBlokow(args) as pamiecBlokow:
+            _wyciagnijWarZal(nazwa_plik_wej, args, ostrzezeniaPliku, metryki, zapisRekordow, pamiecBlokow)
+        for komunikat in ostrzezeniaPliku:
+            _ostrzez(ostrzezenia, komunikat)
+        return None
+
+    with _pamiecBlokow(args) as pamiecBlokow:
+        wynik = _wyciagnijWarZal(nazwa_plik_wej, args, ostrzezeniaPliku, metryki, pamiecBlokow=pamiecBlokow)
+    for komunikat in ostrzezeniaPliku:
+        _ostrzez(ostrzezenia, komunikat)
+
+    _zapiszRaport(wynik, nazwa_plik_wej, args, out_fname, metryki, ostrzezeniaPliku)
+
+    return wynik
+
+
+def _wyciagnijWarZal(nazwa_plik_wej, args, ostrzezenia, metryki=None, zapisRekordow=None,
+                     pamiecBlokow=None, postep=None):
+    # Ekstrakcja WarZal z jednego pliku (z konwersją i pamięcią podręczną dla
+    # PDF) - zob. `przetworzPlik`. Jeśli podano `zapisRekordow`, przedmioty
+    # są przekazywane do tej funkcji na bieżąco (zob. `warzal_rekordy`)
+    # zamiast zbierania ich w słowniku, a zwracane jest None. `postep`
+    # (`PostepDokumentu`) - zob. `warzal_PyQuery`; wynik dokumentu wznawianego
+    # w połowie nie jest brany z pamięci podręcznej, a wynik z błędami stron
+    # do niej nie trafia.
+    if not nazwa_plik_wej.lower().endswith(".pdf"):
+        with _profiluj(metryki):
+            if zapisRekordow is not None:
+                zapisRekordow(warzal_rekordy(nazwa_plik_wej, verbosity=args.v,
+                                             strumieniowo=args.strumieniowo, ostrzezenia=ostrzezenia,
+                                             metryki=metryki, silnik=args.silnik,
+                                             pamiecBlokow=pamiecBlokow))
+                return None
+            return _warzalDokument(nazwa_plik_wej, args, ostrzezenia, metryki, pamiecBlokow=pamiecBlokow,
+                                   postep=postep)
+
+    pamiec = None if args.bez_cache else PamiecPodreczna.zArgumentow(args)
+    klucz = pamiec.klucz(nazwa_plik_wej, args.backend, not args.bez_obrazkow,
+                         args.tylko_sylabusy) if pamiec is not None else None
+    zapamietany = pamiec.wczytajWynik(klucz, args.silnik) \
+        if pamiec is not None and not (postep is not None and postep.przedmioty) else None
+
+    if zapamietany is not None and not args.keep_html and not args.porownaj_backendy:
+        wynik, zapamietaneOstrzezenia = zapamietany
+        logging.info("wynik ekstrakcji %s z pamięci podręcznej", nazwa_plik_wej)
+        if metryki is not None:
+            metryki.licz("pamiec_podreczna_wyniki")
+        ostrzezenia.extend(zapamietaneOstrzezenia)
+        pamiec.przytnij()
+        if zapisRekordow is not None:
+            zapisRekordow(wynik.items())
+            return None
+        return wynik
+
+    katalog, nazwa = os.path.split(nazwa_plik_wej)
+    zachowany = os.path.join(katalog, f"{TEMPFILE_PREFIX}{nazwa}.{args.backend}")
+    sciezkaDok = pamiec.sciezkaDokumentu(klucz, args.backend) if pamiec is not None else None
+    dokument, katalogTymcz, strony = None, None, None
+
+    if args.potok and args.mutool_j == 1 and not args.tylko_sylabusy and zapamietany is None \
+            and not (sciezkaDok and os.path.exists(sciezkaDok)):
+        # Ekstrakcja czyta wyjście mutool na bieżąco; dokument pośredni trafia
+        # na dysk tylko jako kopia (pamięć podręczna, --keep-html).
+        strony = strony_mutool(nazwa_plik_wej, args.backend,
+                               [sciezkaDok] * (pamiec is not None) + [zachowany] * args.keep_html,
+                               not args.bez_obrazkow)
+    else:
+        with _etap(metryki, "konwersja"):
+            dokument, katalogTymcz = _dokumentPosredni(nazwa_plik_wej, args, args.backend, pamiec, ostrzezenia)
+
+        if args.keep_html:
+            shutil.copyfile(dokument, zachowany)
+
+    if zapamietany is not None:
+        wynik, zapamietaneOstrzezenia = zapamietany
+        ostrzezenia.extend(zapamietaneOstrzezenia)
+        if zapisRekordow is not None:
+            zapisRekordow(wynik.items())
+            wynik = None
+    elif zapisRekordow is not None:
+        # Wynik nie jest gromadzony, więc nie trafia do pamięci podręcznej
+        # (dokument pośredni - tak).
+        with _profiluj(metryki):
+            zapisRekordow(warzal_rekordy(dokument or nazwa_plik_wej, verbosity=args.v,
+                                         strumieniowo=args.strumieniowo, ostrzezenia=ostrzezenia,
+                                         metryki=metryki, silnik=args.silnik, strony=strony,
+                                         pamiecBlokow=pamiecBlokow))
+        wynik = None
+    else:
+        with _profiluj(metryki):
+            wynik = _warzalDokument(dokument or nazwa_plik_wej, args, ostrzezenia, metryki, strony,
+                                    pamiecBlokow, postep)
+        if pamiec is not None and not (postep is not None and postep.bledy):
+            pamiec.zapiszWynik(klucz, wynik, ostrzezenia, args.silnik)
+
+    if args.porownaj_backendy:
+        _sprawdzZgodnoscBackendow(nazwa_plik_wej, args, wynik, ostrzezenia, pamiec)
+
+    if katalogTymcz is not None:
+        shutil.rmtree(katalogTymcz, ignore_errors=True)
+    if pamiec is not None:
+        pamiec.przytnij()
+
+    return wynik
+
+
+def _warzalDokument(dokument, args, ostrzezenia, metryki=None, strony=None, pamiecBlokow=None,
+                    postep=None):
+    # Ekstrakcja WarZal do słownika: w wielu procesach (--ekstrakcja-j), o ile
+    # dokument jest plikiem HTML, w przeciwnym razie w bieżącym procesie.
+    # Pamięć bloków i dziennik przetwarzania dotyczą tylko ekstrakcji
+    # w bieżącym procesie.
+    if args.ekstrakcja_j > 1 and strony is None and postep is None \
+            and not dokument.lower().endswith(".stext"):
+        return warzal_rownolegle(dokument, args.ekstrakcja_j, args.v, ostrzezenia, metryki, args.silnik)
+
+    return warzal_PyQuery(dokument, verbosity=args.v, strumieniowo=args.strumieniowo,
+                          ostrzezenia=ostrzezenia, metryki=metryki, silnik=args.silnik, strony=strony,
+                          pamiecBlokow=pamiecBlokow, postep=postep)
+
+
+def _profiluj(metryki):
+    """`Metryki.profiluj` albo pusty kontekst, gdy nie zbieramy metryk."""
+    return metryki.profiluj() if metryki is not None else contextlib.nullcontext()
+
+
+def _przetworzPlikWsadowo(nazwa_plik_wej, args, metryki=None):
+    # Musi być funkcją na poziomie modułu, żeby dało się ją przekazać do
+    # procesów w puli (pickle). W procesie z puli metryki są zbierane do
+    # nowego obiektu, który wraca do procesu głównego razem z wynikiem.
+    ostrzezenia = []
+    if metryki is None and args.metryki:
+        metryki = Metryki()
+    wynik = przetworzPlik(nazwa_plik_wej, args, ostrzezenia=ostrzezenia, metryki=metryki)
+    if metryki is not None:
+        metryki.zanotujPamiec()
+    return wynik, ostrzezenia, metryki
+
+
+def przetworzWsadowo(pliki, args, metryki=None):
+    """
+    Przetwórz wiele plików w puli procesów (`args.j` procesów roboczych)
+    i zapisz raporty dla każdego z nich oraz, opcjonalnie, raport zbiorczy.
+
+    Ostrzeżenia są zbierane osobno dla każdego pliku i wypisywane w kolejności
+    plików wejściowych, więc wynik nie zależy od liczby procesów. Metryki
+    z procesów roboczych są dołączane do `metryki`.
+
+    Pliki planów (PlanTab) są przetwarzane w jednym przebiegu, bez puli -
+    wiersze trafiają do raportów (także zbiorczego) na bieżąco.
+
+    Z dziennikiem przetwarzania (``--dziennik``) - zob.
+    `przetworzWsadowoZDziennikiem`.
+    """
+    if args.tryb.lower() == "plantab":
+        with _etap(metryki, "plantab"):
+            plantab_przetworzPliki(pliki, zbiorczy_fname=args.raport_zbiorczy)
+        return
+
+    if args.dziennik:
+        przetworzWsadowoZDziennikiem(pliki, args, metryki)
+        return
+
+    if args.j == 1:
+        wyniki = [_przetworzPlikWsadowo(plik, args, metryki) for plik in pliki]
+    else:
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.j) as pula:
+            wyniki = list(pula.map(_przetworzPlikWsadowo, pliki, itertools.repeat(args)))
+
+    for plik, (wynik, ostrzezenia, metrykiPliku) in zip(pliki, wyniki):
+        for komunikat in ostrzezenia:
+            print(f"{plik}: {komunikat}")
+        if metryki is not None and metrykiPliku is not None and metrykiPliku is not metryki:
+            metryki.polacz(metrykiPliku)
+
+    _zapiszRaportZbiorczy([(plik, wynik, ostrzezenia) for plik, (wynik, ostrzezenia, _)
+                           in zip(pliki, wyniki)], args, metryki)
+
+
+def _zapiszRaportZbiorczy(wyniki, args, metryki=None):
+    # Raport zbiorczy (--raport-zbiorczy) z listy (plik, wynik, ostrzeżenia)
+    # w kolejności plików wejściowych.
+    if args.raport_zbiorczy and args.tryb.lower() == "warzal" and args.format.lower() == "sqlite":
+        with _etap(metryki, "zapis"):
+            zbiorczy_formatWyjsciaSQLite(wyniki, args.raport_zbiorczy)
+    elif args.raport_zbiorczy and args.tryb.lower() == "warzal" and args.format.lower() == "jsonl":
+        with _etap(metryki, "zapis"):
+            zbiorczy_formatWyjsciaJSONL([plik for plik, _, _ in wyniki], args.raport_zbiorczy)
+    elif args.raport_zbiorczy:
+        with _etap(metryki, "zapis"):
+            zbiorczy_formatWyjsciaTSV([(plik, wynik) for plik, wynik, _ in wyniki],
+                                      args.tryb.lower(), args.raport_zbiorczy)
+
+
+class PostepDokumentu:
+    """
+    Stan jednego dokumentu w dzienniku przetwarzania (opcja ``--dziennik``).
+
+    Dziennik to plik JSON Lines, do którego wpisy są tylko dopisywane - każdy
+    jednym wywołaniem `os.write` na deskryptorze otwartym z ``O_APPEND``, więc
+    procesy robocze puli piszą do wspólnego pliku bez przeplatania wierszy.
+    Wpisy (pole "typ"):
+
+    - "dokument" - początek przetwarzania, z tożsamością pliku (rozmiar i czas
+      modyfikacji, jak w manifeście `ObserwatorKatalogu`); inna tożsamość niż
+      we wcześniejszych wpisach unieważnia je,
+    - "przedmiot" - kompletny przedmiot (`RekordPrzedmiotu.slownik`),
+    - "koniec" - dokument przetworzony w całości,
+    - "blad" - wyjątek, który przerwał dokument.
+
+    Wpisy "przedmiot" i "koniec" niosą ostrzeżenia i błędy stron (zob.
+    `warzal_rekordy`) zgłoszone od poprzedniego wpisu, więc po wznowieniu
+    obowiązuje stan z ostatniego z nich - dalsze strony są przetwarzane
+    ponownie.
+    """
+
+    def __init__(self, sciezka, plik, tozsamosc=None):
+        self.sciezka = sciezka
+        self.plik = plik
+        self.tozsamosc = tozsamosc
+        self.przedmioty = [] # (nazwa, postać słownikowa rekordu) w kolejności dokumentu
+        self.ostrzezenia = []
+        self.bledy = []
+        self.zakonczony = False
+        self.wyjatek = None
+        self._zapisane = (0, 0) # Liczba ostrzeżeń i błędów stron już w dzienniku.
+        self._fd = None
+
+    @property
+    def odStrony(self):
+        """Ostatnia strona dokumentu objęta dziennikiem (zob. `warzal_rekordy`)."""
+        strony = [rekord["strona"] for _, rekord in self.przedmioty[-1:]]
+        strony += [blad["strona"] for blad in self.bledy if blad["strona"] is not None]
+        return max(strony, default=None)
+
+    def _zapisz(self, wpis, trwale=False):
+        if self._fd is None:
+            self._fd = os.open(self.sciezka, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        wiersz = json.dumps(dict(wpis, plik=self.plik), ensure_ascii=False) + "\n"
+        os.write(self._fd, wiersz.encode("utf-8"))
+        if trwale:
+            os.fsync(self._fd)
+
+    def _przyrost(self):
+        # Ostrzeżenia i błędy stron zgłoszone od poprzedniego wpisu.
+        ostrzezenia, bledy = self._zapisane
+        self._zapisane = (len(self.ostrzezenia), len(self.bledy))
+        return {"ostrzezenia": self.ostrzezenia[ostrzezenia:], "bledy": self.bledy[bledy:]}
+
+    def _zastosuj(self, wpis):
+        # Odtworzenie stanu z wpisu "przedmiot" lub "koniec" (`wczytajDziennik`).
+        self.ostrzezenia.extend(wpis["ostrzezenia"])
+        self.bledy.extend(wpis["bledy"])
+        self._zapisane = (len(self.ostrzezenia), len(self.bledy))
+        if wpis["typ"] == "przedmiot":
+            self.przedmioty.append((wpis["nazwa"], wpis["rekord"]))
+        else:
+            self.zakonczony = True
+
+    def rozpocznij(self):
+        """Zapisz początek przetwarzania dokumentu."""
+        self._zapisz({"typ": "dokument", "tozsamosc": self.tozsamosc})
+
+    def zanotuj(self, nazwaPrzedm, przedmDict):
+        """
+        Zapisz kompletny przedmiot - zanim trafi do słownika wyników, gdzie
+        powtórzony sylabus może go uzupełnić.
+        """
+        rekord = przedmDict.slownik()
+        self._zapisz(dict({"typ": "przedmiot", "nazwa": nazwaPrzedm, "rekord": rekord},
+                          **self._przyrost()))
+        self.przedmioty.append((nazwaPrzedm, rekord))
+
+    def zakoncz(self, wynik):
+        """Zapisz koniec dokumentu, którego wynikiem jest słownik `wynik`."""
+        if not self.przedmioty:
+            # Wynik z pamięci podręcznej - przedmioty nie przeszły przez
+            # `zanotuj`.
+            for nazwaPrzedm, przedmDict in wynik.items():
+                self.zanotuj(nazwaPrzedm, przedmDict)
+        self._zapisz(dict({"typ": "koniec"}, **self._przyrost()), trwale=True)
+        self.zakonczony = True
+
+    def przerwij(self, wyjatek):
+        """Zapisz wyjątek, który przerwał przetwarzanie dokumentu."""
+        self.wyjatek = f"{type(wyjatek).__name__}: {wyjatek}"
+        self._zapisz({"typ": "blad", "wyjatek": self.wyjatek}, trwale=True)
+
+    def zamknij(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def wynik(self):
+        """Słownik przedmiotów odtworzony z dziennika (jak w `warzal_PyQuery`)."""
+        warZalicz = dict()
+        for nazwaPrzedm, rekord in self.przedmioty:
+            _dolaczPrzedmiot(warZalicz, nazwaPrzedm, RekordPrzedmiotu.zeSlownika(rekord))
+        return warZalicz
+
+
+def wczytajDziennik(sciezka):
+    """
+    Stan dokumentów z dziennika przetwarzania: plik -> `PostepDokumentu`.
+    Uszkodzone wiersze (np. urwany zapis ostatniego wpisu) są pomijane.
+    """
+    stany = {}
+    try:
+        plik = open(sciezka, "rt", encoding="utf-8")
+    except FileNotFoundError:
+        return stany
+
+    with plik:
+        for linia in plik:
+            try:
+                wpis = json.loads(linia)
+            except ValueError:
+                logging.warning("pominięto uszkodzony wpis dziennika %s", sciezka)
+                continue
+
+            stan = stany.get(wpis["plik"])
+            if wpis["typ"] == "dokument":
+                if stan is None or stan.tozsamosc != wpis["tozsamosc"]:
+                    stany[wpis["plik"]] = PostepDokumentu(sciezka, wpis["plik"], wpis["tozsamosc"])
+                else:
+                    stan.wyjatek = None
+            elif stan is None:
+                continue
+            elif wpis["typ"] == "blad":
+                stan.wyjatek = wpis["wyjatek"]
+            else:
+                stan._zastosuj(wpis)
+
+    return stany
+
+
+def _domknijDziennik(sciezka):
+    # Urwany ostatni wiersz (przerwany zapis) musi zostać zamknięty, zanim
+    # kolejne wpisy zostaną dopisane - inaczej zlałyby się z nim.
+    try:
+        with open(sciezka, "r+b") as plik:
+            if plik.seek(0, os.SEEK_END) == 0:
+                return
+            plik.seek(-1, os.SEEK_END)
+            if plik.read(1) != b"\n":
+                plik.write(b"\n")
+    except FileNotFoundError:
+        pass
+
+
+def _tozsamoscPliku(nazwa):
+    try:
+        st = os.stat(nazwa)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _przetworzPlikZDziennikiem(postep, args, metryki=None):
+    # Funkcja procesu z puli (zob. `_przetworzPlikWsadowo`). Wyjątek trafia do
+    # dziennika i nie przerywa przetwarzania pozostałych plików.
+    if metryki is None and args.metryki:
+        metryki = Metryki()
+    if metryki is not None:
+        metryki.licz("pliki")
+
+    try:
+        postep.rozpocznij()
+        with _pamiecBlokow(args) as pamiecBlokow:
+            wynik = _wyciagnijWarZal(postep.plik, args, postep.ostrzezenia, metryki,
+                                     pamiecBlokow=pamiecBlokow, postep=postep)
+        postep.zakoncz(wynik)
+    except Exception as e:
+        logging.debug("błąd przetwarzania %s", postep.plik, exc_info=True)
+        postep.przerwij(e)
+    finally:
+        postep.zamknij()
+
+    if metryki is not None:
+        metryki.zanotujPamiec()
+    return metryki
+
+
+def przetworzWsadowoZDziennikiem(pliki, args, metryki=None):
+    """
+    Przetwarzanie wsadowe (WarZal) z dziennikiem przetwarzania `args.dziennik`
+    (zob. `PostepDokumentu`).
+
+    Bez `args.wznow` dziennik jest zakładany od nowa. Z `args.wznow` pliki
+    zakończone według dziennika (o niezmienionej tożsamości) są pomijane,
+    a dokument przerwany w połowie jest przetwarzany od strony po ostatnim
+    zapisanym przedmiocie. Dokument, który zakończył się wyjątkiem, jest przy
+    wznowieniu przetwarzany ponownie.
+
+    Raporty (także zbiorczy) są odtwarzane z dziennika po przetworzeniu
+    wszystkich plików, w kolejności plików wejściowych - tak samo jak przy
+    przebiegu bez przerw. Pliki, które zakończyły się wyjątkiem, nie mają
+    raportu.
+    """
+    if args.wznow:
+        _domknijDziennik(args.dziennik)
+        stany = wczytajDziennik(args.dziennik)
+    else:
+        open(args.dziennik, "wb").close()
+        stany = {}
+
+    doPrzetworzenia = {}
+    for plik in pliki:
+        tozsamosc = _tozsamoscPliku(plik)
+        stan = stany.get(plik)
+        if stan is None or stan.tozsamosc != tozsamosc:
+            stan = PostepDokumentu(args.dziennik, plik, tozsamosc)
+        if not stan.zakonczony:
+            doPrzetworzenia.setdefault(plik, stan)
+
+    if args.wznow:
+        print(f"Wznowienie: {len(pliki) - len(doPrzetworzenia)} z {len(pliki)} plików "
+              "przetworzonych wcześniej")
+
+    if args.j == 1:
+        metrykiPlikow = [_przetworzPlikZDziennikiem(stan, args, metryki)
+                         for stan in doPrzetworzenia.values()]
+    else:
+        import concurrent.futures
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.j) as pula:
+            metrykiPlikow = list(pula.map(_przetworzPlikZDziennikiem, doPrzetworzenia.values(),
+                                          itertools.repeat(args)))
+
+    for metrykiPliku in metrykiPlikow:
+        if metryki is not None and metrykiPliku is not None and metrykiPliku is not metryki:
+            metryki.polacz(metrykiPliku)
+
+    stany = wczytajDziennik(args.dziennik)
+    wyniki = []
+    for plik in pliki:
+        stan = stany.get(plik)
+        if stan is None or not stan.zakonczony:
+            print(f"{plik}: błąd: {stan.wyjatek if stan is not None else 'brak wpisu w dzienniku'}")
+            continue
+        for komunikat in stan.ostrzezenia:
+            print(f"{plik}: {komunikat}")
+        wynik = stan.wynik()
+        _zapiszRaport(wynik, plik, args, None, metryki, stan.ostrzezenia)
+        wyniki.append((plik, wynik, stan.ostrzezenia))
+
+    _zapiszRaportZbiorczy(wyniki, args, metryki)
+
+
+def _rozwinPlikiWejsciowe(nazwy, tryb):
+    """
+    Zamień listę plików i katalogów na listę plików. Z katalogów brane są
+    (bez rekurencji, w kolejności alfabetycznej) pliki o rozszerzeniach
+    właściwych dla trybu, z pominięciem plików tymczasowych.
+    """
+    rozszerzenia = RozszerzeniaWejscia.get(tryb, ())
+    pliki = []
+
+    for nazwa in nazwy:
+        if os.path.isdir(nazwa):
+            pliki.extend(sorted(os.path.join(nazwa, n) for n in os.listdir(nazwa)
+                                if n.lower().endswith(rozszerzenia)
+                                and not n.startswith(TEMPFILE_PREFIX)))
+        else:
+            pliki.append(nazwa)
+
+    return pliki
+
+
+FormatyRaportu = {"warzal": ("tsv", "csv", "ini", "jsonl"), "plantab": ("tsv",)}
+
+
+def _wykonajZadanie(nazwa_plik_wej, args, out_fname):
+    # Funkcja procesu z puli serwera (musi dać się przekazać przez pickle).
+    # Zwraca ostrzeżenia, błędne wiersze planu i czas rozpoczęcia zadania.
+    rozpoczeto = time.time()
+    ostrzezenia = []
+    wynik = przetworzPlik(nazwa_plik_wej, args, out_fname, ostrzezenia=ostrzezenia)
+    bledy = wynik[1] if args.tryb.lower() == "plantab" else []
+    return ostrzezenia, bledy, rozpoczeto
+
+
+def _inicjujProcesSerwera():
+    # Ctrl+C trafia do całej grupy procesów - serwer zamyka pulę sam,
+    # procesy robocze kończą wtedy bieżące zadania.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Procesy robocze działają przez cały czas pracy serwera, więc importy
+    # (leniwe w zwykłym uruchomieniu, zob. `_LeniwyModul`) i odczyt ścieżki
+    # oraz wersji mutool odbywają się raz, przy starcie procesu, a nie przy
+    # jego pierwszym zadaniu.
+    for modul in ("lxml.etree", "pyquery", "pyquery.text", "cssselect"):
+        importlib.import_module(modul)
+    with contextlib.suppress(RuntimeError): # Bez mutool - tylko HTML i stext.
+        _sciezkaMutool()
+    _wersjaMutool()
+
+
+def _pulaProcesowSerwera(procesy):
+    """
+    Pula `procesy` procesów roboczych (serwera albo obserwatora katalogu)
+    uruchomionych od razu, a nie - jak domyślnie w ProcessPoolExecutor -
+    przy pierwszych zadaniach; `_inicjujProcesSerwera` jest więc wykonane
+    w każdym z nich, zanim przyjdzie pierwsze zadanie.
+    """
+    import concurrent.futures
+    pula = concurrent.futures.ProcessPoolExecutor(max_workers=procesy, initializer=_inicjujProcesSerwera)
+    for _ in range(procesy):
+        pula.submit(os.getpid)
+    return pula
+
+
+class SerwerZadan:
+    """
+    Kolejka zadań przetwarzania dla trybu serwera (opcja ``--serwer``).
+
+    Zadania (przesłany plik, tryb i format raportu) są wykonywane w puli
+    `procesy` procesów roboczych, które działają przez cały czas pracy
+    serwera - koszt uruchomienia interpretera i importu PyQuery/lxml jest
+    ponoszony raz, a nie przy każdym pliku. Pamięć podręczna dokumentów PDF
+    jest wspólna dla wszystkich zadań.
+
+    Zadania czekają we własnej kolejce serwera i trafiają do puli dopiero,
+    gdy zwolni się proces, więc głębokość kolejki i czas oczekiwania są
+    mierzone dokładnie. Przyjmowanych jest co najwyżej `maksKolejka` zadań
+    oczekujących; zakończone zadania (z treścią raportu) są przechowywane
+    w pamięci przez `ttlZakonczonych` sekund od zakończenia - niezależnie od
+    tego, ile zadań skończy się w tym czasie, więc klient, który odpytuje
+    o stan zadania albo czeka na nie, zdąży odczytać wynik.
+    """
+
+    def __init__(self, args, procesy=None, maksKolejka=64, ttlZakonczonych=3600.0):
+        self.args = args
+        self.procesy = procesy or os.cpu_count() or 1
+        self.maksKolejka = maksKolejka
+        self.ttlZakonczonych = ttlZakonczonych
+        self.pula = _pulaProcesowSerwera(self.procesy)
+        self.katalog = tempfile.mkdtemp(prefix=TEMPFILE_PREFIX + "serwer")
+        self.zadania = {} # id -> słownik stanu zadania
+        self.kolejka = collections.deque()
+        self.wToku = 0
+        self.zakonczone = collections.deque() # (czas zakończenia, id) w kolejności zakończenia
+        self.opoznienia = []
+        self.oczekiwania = []
+        self.liczniki = {"przyjete": 0, "odrzucone": 0, "gotowe": 0, "bledy": 0}
+        # Wywołanie zwrotne zakończonego zadania może nastąpić w wątku, który
+        # trzyma już blokadę (przy przekazywaniu kolejnego zadania do puli).
+        self.blokada = threading.RLock()
+
+    def zglos(self, tresc, nazwa, tryb="WarZal", format="tsv"):
+        """
+        Dodaj zadanie do kolejki i zwróć jego identyfikator.
+
+        Raises
+        ------
+        ValueError
+            Nieznany tryb lub format raportu.
+        OverflowError
+            Kolejka jest pełna.
+
+        """
+        if tryb.lower() not in FormatyRaportu:
+            raise ValueError(f"nieznany tryb '{tryb}'")
+        if format.lower() not in FormatyRaportu[tryb.lower()]:
+            raise ValueError(f"format '{format}' nie jest dostępny w trybie '{tryb}'")
+
+        with self.blokada:
+            if len(self.kolejka) >= self.maksKolejka:
+                self.liczniki["odrzucone"] += 1
+                raise OverflowError(f"kolejka jest pełna ({self.maksKolejka} zadań)")
+
+            idZadania = uuid.uuid4().hex
+            katalogZadania = os.path.join(self.katalog, idZadania)
+            os.mkdir(katalogZadania)
+            plik = os.path.join(katalogZadania, os.path.basename(nazwa) or "dokument")
+            with open(plik, "wb") as f:
+                f.write(tresc)
+
+            self.zadania[idZadania] = {
+                "id": idZadania, "plik": nazwa, "tryb": tryb, "format": format.lower(),
+                "stan": "w_kolejce", "zgloszono": time.time(), "rozpoczeto": None,
+                "zakonczono": None, "ostrzezenia": [], "bledy": [], "raport": None, "blad": None,
+                "_plik": plik, "_koniec": threading.Event()}
+            self.liczniki["przyjete"] += 1
+            self.kolejka.append(idZadania)
+            self._uruchomOczekujace()
+
+        return idZadania
+
+    def _uruchomOczekujace(self):
+        with self.blokada:
+            while self.kolejka and self.wToku < self.procesy:
+                zadanie = self.zadania[self.kolejka.popleft()]
+                args = argparse.Namespace(**{**vars(self.args), "tryb": zadanie["tryb"],
+                                             "format": zadanie["format"], "o": None,
+                                             "metryki": None, "profil": None})
+                raport = os.path.join(os.path.dirname(zadanie["_plik"]),
+                                      "raport." + zadanie["format"])
+                zadanie["stan"] = "w_toku"
+                self.wToku += 1
+                przyszlosc = self.pula.submit(_wykonajZadanie, zadanie["_plik"], args, raport)
+                przyszlosc.add_done_callback(
+                    lambda p, zadanie=zadanie, raport=raport: self._zakoncz(zadanie, p, raport))
+
+    def _zakoncz(self, zadanie, przyszlosc, raport):
+        try:
+            zadanie["ostrzezenia"], zadanie["bledy"], zadanie["rozpoczeto"] = przyszlosc.result()
+            with open(raport, "rt", encoding="utf-8", newline="") as f:
+                zadanie["raport"] = f.read()
+            # Ścieżki w katalogu zadania nic nie mówią klientowi.
+            katalogZadania = os.path.dirname(raport) + os.sep
+            zadanie["ostrzezenia"] = [k.replace(katalogZadania, "") for k in zadanie["ostrzezenia"]]
+            for blad in zadanie["bledy"]:
+                blad["plik"] = zadanie["plik"]
+            stan = "gotowe"
+        except Exception as e:
+            zadanie["blad"] = f"{type(e).__name__}: {e}"
+            stan = "blad"
+        finally:
+            shutil.rmtree(os.path.dirname(raport), ignore_errors=True)
+
+        with self.blokada:
+            zadanie["zakonczono"] = time.time()
+            zadanie["stan"] = stan
+            self.wToku -= 1
+            self.liczniki["gotowe" if stan == "gotowe" else "bledy"] += 1
+            self.opoznienia.append(zadanie["zakonczono"] - zadanie["zgloszono"])
+            if zadanie["rozpoczeto"] is not None:
+                self.oczekiwania.append(zadanie["rozpoczeto"] - zadanie["zgloszono"])
+
+            self.zakonczone.append((zadanie["zakonczono"], zadanie["id"]))
+            self._usunPrzeterminowane()
+            zadanie["_koniec"].set()
+            self._uruchomOczekujace()
+
+    def _usunPrzeterminowane(self):
+        # Zadania są usuwane tylko według wieku - nigdy zaraz po zakończeniu.
+        with self.blokada:
+            granica = time.time() - self.ttlZakonczonych
+            while self.zakonczone and self.zakonczone[0][0] < granica:
+                self.zadania.pop(self.zakonczone.popleft()[1], None)
+
+    def czekaj(self, idZadania, limit=None):
+        """Poczekaj (najwyżej `limit` sekund) na zakończenie zadania."""
+        with self.blokada:
+            koniec = self.zadania[idZadania]["_koniec"]
+        return koniec.wait(limit)
+
+    def stan(self, idZadania):
+        """
+        Stan zadania jako słownik gotowy do zapisu w JSON; KeyError, jeśli
+        zadania nie ma (nieznane lub przeterminowane).
+        """
+        with self.blokada:
+            self._usunPrzeterminowane()
+            zadanie = self.zadania[idZadania]
+            stan = {k: v for k, v in zadanie.items() if not k.startswith("_")}
+        if zadanie["zakonczono"] is not None:
+            stan["czas_s"] = zadanie["zakonczono"] - zadanie["zgloszono"]
+        return stan
+
+    def statystyki(self):
+        """Głębokość kolejki, liczniki zadań i rozkłady czasów (w sekundach)."""
+        with self.blokada:
+            return {"procesy": self.procesy, "kolejka": len(self.kolejka), "w_toku": self.wToku,
+                    "maks_kolejka": self.maksKolejka, "liczniki": dict(self.liczniki),
+                    "rozklady_s": {nazwa: _rozklad(probki) for nazwa, probki in
+                                   (("opoznienie", self.opoznienia),
+                                    ("oczekiwanie", self.oczekiwania)) if probki}}
+
+    def zamknij(self):
+        with self.blokada:
+            self.kolejka.clear()
+        self.pula.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.katalog, ignore_errors=True)
+
+
+class _ObslugaHTTP:
+    """
+    Interfejs HTTP serwera zadań (domieszka do
+    ``http.server.BaseHTTPRequestHandler``, zob. `uruchomSerwer`):
+
+    * ``POST /zadania?tryb=WarZal&format=tsv&nazwa=sylabus.pdf[&czekaj=1]``
+      - treścią żądania jest plik wejściowy; odpowiedź to stan zadania
+      (JSON), a z ``czekaj=1`` - stan po zakończeniu, razem z raportem,
+    * ``GET /zadania/<id>`` - stan zadania (z raportem, jeśli gotowy),
+    * ``GET /zadania/<id>/raport`` - sam raport,
+    * ``GET /metryki`` - głębokość kolejki i rozkłady czasów zadań.
+
+    Zakończone zadanie jest dostępne przez ``--serwer-ttl`` sekund od
+    zakończenia (zob. `SerwerZadan`), także gdy w tym czasie skończy się
+    wiele innych - klient odpytujący ``GET /zadania/<id>`` lub czekający
+    z ``czekaj=1`` nie dostanie 404 dla zadania, które się udało. Dopiero
+    po tym czasie zadanie znika i odpowiedzią jest 404.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def _odpowiedz(self, kod, tresc, typ="application/json; charset=utf-8"):
+        if not isinstance(tresc, str):
+            tresc = json.dumps(tresc, ensure_ascii=False, indent=1)
+        dane = tresc.encode("utf-8")
+        self.send_response(kod)
+        self.send_header("Content-Type", typ)
+        self.send_header("Content-Length", str(len(dane)))
+        self.end_headers()
+        self.wfile.write(dane)
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path.rstrip("/") != "/zadania":
+            return self._odpowiedz(404, {"blad": "nieznany adres"})
+
+        parametry = dict(urllib.parse.parse_qsl(url.query))
+        tresc = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        serwer = self.server.zadania
+        try:
+            idZadania = serwer.zglos(tresc, parametry.get("nazwa", "dokument.pdf"),
+                                     parametry.get("tryb", "WarZal"), parametry.get("format", "tsv"))
+        except ValueError as e:
+            return self._odpowiedz(400, {"blad": str(e)})
+        except OverflowError as e:
+            return self._odpowiedz(503, {"blad": str(e)})
+
+        if parametry.get("czekaj", "0") not in {"", "0"}:
+            serwer.czekaj(idZadania)
+            stan = serwer.stan(idZadania)
+            return self._odpowiedz(200 if stan["stan"] == "gotowe" else 500, stan)
+
+        self._odpowiedz(202, serwer.stan(idZadania))
+
+    def do_GET(self):
+        czesci = urllib.parse.urlsplit(self.path).path.strip("/").split("/")
+        serwer = self.server.zadania
+
+        if czesci == ["metryki"]:
+            return self._odpowiedz(200, serwer.statystyki())
+        if len(czesci) not in {2, 3} or czesci[0] != "zadania" or czesci[2:] not in ([], ["raport"]):
+            return self._odpowiedz(404, {"blad": "nieznany adres"})
+        try:
+            stan = serwer.stan(czesci[1])
+        except KeyError:
+            return self._odpowiedz(404, {"blad": "nieznane lub przeterminowane zadanie"})
+
+        if len(czesci) == 2:
+            return self._odpowiedz(200, stan)
+        if stan["raport"] is None:
+            return self._odpowiedz(409 if stan["stan"] == "blad" else 202,
+                                   {k: v for k, v in stan.items() if k != "raport"})
+        self._odpowiedz(200, stan["raport"], "text/plain; charset=utf-8")
+
+    def log_message(self, format, *args):
+        # Przez gniazdo uniksowe nie ma adresu klienta.
+        logging.info("%s", format % args)
+
+
+def uruchomSerwer(adres, args, procesy=None, maksKolejka=64, ttlZakonczonych=3600.0):
+    """
+    Uruchom serwer zadań pod adresem `adres`: ``host:port`` (albo sam port)
+    lub ``unix:<ścieżka>`` dla gniazda uniksowego. Działa do przerwania
+    (Ctrl+C).
+    """
+    # Moduły serwera HTTP są importowane tylko w tym trybie.
+    import http.server
+    import socketserver
+
+    zadania = SerwerZadan(args, procesy, maksKolejka, ttlZakonczonych)
+    obsluga = type("ObslugaHTTP", (_ObslugaHTTP, http.server.BaseHTTPRequestHandler), {})
+
+    if adres.startswith("unix:"):
+        sciezka = adres[len("unix:"):]
+        if os.path.exists(sciezka):
+            os.remove(sciezka)
+        klasaSerwera = type("SerwerHTTPUnix", (socketserver.ThreadingMixIn, socketserver.UnixStreamServer),
+                            {"daemon_threads": True})
+        serwer = klasaSerwera(sciezka, obsluga)
+    else:
+        host, _, port = adres.rpartition(":")
+        sciezka = None
+        klasaSerwera = type("SerwerHTTP", (http.server.ThreadingHTTPServer,), {"daemon_threads": True})
+        serwer = klasaSerwera((host or "127.0.0.1", int(port)), obsluga)
+    serwer.zadania = zadania
+
+    print(f"Serwer zadań nasłuchuje pod adresem {adres} ({zadania.procesy} procesów roboczych).")
+    try:
+        serwer.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        serwer.server_close()
+        if sciezka is not None and os.path.exists(sciezka):
+            os.remove(sciezka)
+        zadania.zamknij()
+
+
+def _nazwaRaportu(nazwa_plik_wej, tryb, format):
+    """Domyślna nazwa raportu dla pliku wejściowego (jak w funkcjach ``*_formatWyjscia*``)."""
+    if tryb == "plantab":
+        return _bezPrefiksuTymczasowego(nazwa_plik_wej) + "_plantab.tsv"
+    return _nazwaBazowaRaportu(nazwa_plik_wej) + "_raport." + ("tsv" if format == "csv" else format)
+
+
+NazwaManifestu = "autosylabusuj_manifest.json"
+
+
+class ObserwatorKatalogu:
+    """
+    Obserwacja katalogu i automatyczne przetwarzanie nowych lub zmienionych
+    plików (opcja ``--obserwuj``).
+
+    Stan plików jest zapisywany w manifeście JSON (domyślnie `NazwaManifestu`
+    w obserwowanym katalogu): rozmiar, czas modyfikacji, skrót SHA-256
+    zawartości, ścieżki raportów i stan przetwarzania. Plik, którego rozmiar
+    i czas modyfikacji zgadzają się z manifestem, nie jest przetwarzany
+    ponownie - także po ponownym uruchomieniu. Plik z nowym czasem
+    modyfikacji, ale tą samą zawartością, tylko uaktualnia wpis. Plik,
+    którego przetwarzanie zakończyło się błędem, czeka na kolejną zmianę.
+
+    Plik jest brany do przetwarzania dopiero, gdy nie zmienia się przez
+    `stabilizacja` sekund (i między dwoma kolejnymi przeglądami), żeby nie
+    czytać pliku w trakcie kopiowania. Pliki trafiają do puli `procesy`
+    procesów roboczych dopiero, gdy zwolni się proces - napływ wielu plików
+    naraz nie obciąża maszyny ponad pulę.
+
+    Katalog jest przeglądany co `interwal` sekund, a jeśli dostępny jest
+    pakiet ``watchdog`` - także zaraz po każdym zdarzeniu w katalogu.
+    """
+
+    def __init__(self, katalog, args, procesy=None, manifest=None, interwal=2.0, stabilizacja=1.0):
+        self.katalog = katalog
+        self.args = args
+        self.tryb = args.tryb.lower()
+        self.procesy = procesy or os.cpu_count() or 1
+        self.sciezkaManifestu = manifest or os.path.join(katalog, NazwaManifestu)
+        self.interwal = interwal
+        self.stabilizacja = stabilizacja
+        self.manifest = self._wczytajManifest()
+        self.widziane = {} # nazwa -> (rozmiar, czas modyfikacji) z poprzedniego przeglądu
+        self.kolejka = collections.deque()
+        self.zgloszone = set() # Pliki w kolejce lub w toku.
+        self.wToku = 0
+        self.zdarzenie = threading.Event()
+        self.blokada = threading.RLock()
+        self.pula = _pulaProcesowSerwera(self.procesy)
+
+    def _wczytajManifest(self):
+        try:
+            with open(self.sciezkaManifestu, "rt", encoding="utf-8") as plik:
+                return json.load(plik)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logging.warning("uszkodzony manifest %s - wszystkie pliki zostaną przetworzone",
+                            self.sciezkaManifestu)
+            return {}
+
+    def _zapiszManifest(self):
+        with self.blokada:
+            tymczasowy = f"{self.sciezkaManifestu}.{os.getpid()}.tmp"
+            with open(tymczasowy, "wt", encoding="utf-8") as plik:
+                json.dump(self.manifest, plik, ensure_ascii=False, indent=1)
+            os.replace(tymczasowy, self.sciezkaManifestu)
+
+    def przejrzyj(self):
+        """
+        Przejrzyj katalog i dodaj do kolejki pliki nowe lub zmienione.
+        Zwraca prawdę, jeśli któryś plik jeszcze się zmienia (trzeba
+        przejrzeć katalog ponownie po czasie `stabilizacja`).
+        """
+        teraz = time.time()
+        niestabilne = False
+        pliki = {os.path.basename(plik): plik for plik in _rozwinPlikiWejsciowe([self.katalog], self.tryb)}
+
+        with self.blokada:
+            zmieniony = False
+            for nazwa in [n for n in self.manifest if n not in pliki]:
+                # Plik usunięty - raporty zostają, wpis nie jest już potrzebny.
+                del self.manifest[nazwa]
+                zmieniony = True
+
+            for nazwa, plik in pliki.items():
+                try:
+                    st = os.stat(plik)
+                except FileNotFoundError:
+                    continue
+                stan = (st.st_size, st.st_mtime_ns)
+                wpis = self.manifest.get(nazwa)
+
+                if nazwa in self.zgloszone or (wpis and (wpis["rozmiar"], wpis["mtime_ns"]) == stan):
+                    continue
+                if self.widziane.get(nazwa) != stan or teraz - st.st_mtime < self.stabilizacja:
+                    self.widziane[nazwa] = stan
+                    niestabilne = True
+                    continue
+
+                skrot = _skrotPliku(plik)
+                if wpis and wpis["skrot"] == skrot and wpis["stan"] == "gotowy":
+                    wpis["rozmiar"], wpis["mtime_ns"] = stan
+                    zmieniony = True
+                    continue
+
+                self.zgloszone.add(nazwa)
+                self.kolejka.append((nazwa, plik, stan, skrot))
+
+            if zmieniony:
+                self._zapiszManifest()
+            self._uruchomOczekujace()
+
+        return niestabilne
+
+    def _uruchomOczekujace(self):
+        with self.blokada:
+            while self.kolejka and self.wToku < self.procesy:
+                nazwa, plik, stan, skrot = self.kolejka.popleft()
+                raport = _nazwaRaportu(plik, self.tryb, self.args.format.lower())
+                self.wToku += 1
+                przyszlosc = self.pula.submit(_wykonajZadanie, plik, self.args, raport)
+                przyszlosc.add_done_callback(
+                    lambda p, nazwa=nazwa, stan=stan, skrot=skrot, raport=raport:
+                        self._zakoncz(nazwa, stan, skrot, raport, p))
+
+    def _zakoncz(self, nazwa, stan, skrot, raport, przyszlosc):
+        wpis = {"rozmiar": stan[0], "mtime_ns": stan[1], "skrot": skrot, "raporty": [raport],
+                "stan": "gotowy", "blad": None, "ostrzezenia": 0, "przetworzono": time.time()}
+        try:
+            ostrzezenia, bledy, _ = przyszlosc.result()
+        except Exception as e:
+            wpis["stan"], wpis["raporty"] = "blad", []
+            wpis["blad"] = f"{type(e).__name__}: {e}"
+            print(f"{nazwa}: błąd przetwarzania - {wpis['blad']}")
+        else:
+            for komunikat in ostrzezenia:
+                print(f"{nazwa}: {komunikat}")
+            if bledy:
+                wpis["raporty"].append(_nazwaPlikuBledow(raport))
+            wpis["ostrzezenia"] = len(ostrzezenia)
+            print(f"{nazwa}: raport zapisany do {raport}")
+
+        with self.blokada:
+            self.manifest[nazwa] = wpis
+            self._zapiszManifest()
+            self.zgloszone.discard(nazwa)
+            self.wToku -= 1
+            self._uruchomOczekujace()
+
+    def _obserwujZdarzenia(self):
+        # Zdarzenia w katalogu tylko budzą pętlę w `dzialaj`; o tym, co
+        # przetworzyć, decyduje zawsze przegląd katalogu.
+        try:
+            import watchdog.events
+            import watchdog.observers
+        except ImportError: # Katalog jest wtedy tylko okresowo przeglądany.
+            return None
+
+        class Obsluga(watchdog.events.FileSystemEventHandler):
+            def on_any_event(obsluga, zdarzenie):
+                self.zdarzenie.set()
+
+        obserwator = watchdog.observers.Observer()
+        obserwator.schedule(Obsluga(), self.katalog, recursive=False)
+        obserwator.start()
+        return obserwator
+
+    def dzialaj(self):
+        """Obserwuj katalog do przerwania (Ctrl+C)."""
+        obserwator = self._obserwujZdarzenia()
+        print(f"Obserwacja katalogu {self.katalog} ({self.procesy} procesów roboczych, "
+              f"{'zdarzenia systemu plików' if obserwator else f'przegląd co {self.interwal:g} s'}).")
+        try:
+            while True:
+                niestabilne = self.przejrzyj()
+                self.zdarzenie.wait(min(self.interwal, self.stabilizacja) if niestabilne else self.interwal)
+                self.zdarzenie.clear()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if obserwator is not None:
+                obserwator.stop()
+                obserwator.join()
+            self.zamknij()
+
+    def zamknij(self):
+        # Pliki z kolejki nie trafiają do manifestu, więc zostaną przetworzone
+        # po ponownym uruchomieniu.
+        with self.blokada:
+            self.kolejka.clear()
+        self.pula.shutdown(wait=True, cancel_futures=True)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+            description="Narzędzie wspomagające analizę sylabusów w plikach PDF, "
             "po konwersji do pliku HTML z użyciem `mutool draw` z zestawu MuPDF."
         )
 
-    parser.add_argument("nazwa_plik_wej", type=str, help="Nazwa pliku wejściowego.")
+    parser.add_argument("nazwa_plik_wej", type=str, nargs="*", help="Nazwa pliku wejściowego. "
+                        "Można podać wiele plików lub katalogów - wtedy narzędzie działa "
+                        "wsadowo i zapisuje osobny raport dla każdego pliku.")
     parser.add_argument("-v", action="count", help="Pokaż więcej informacji podczas "
                         "przetwarzania (na razie słabo zaimplementowane).", default=0)
     parser.add_argument("-o", type=str, help="Nazwa pliku wyjściowego.",
@@ -555,7 +4300,12 @@ def main(argv):
                         help="Format pliku wyjściowego "
                         "(raportu) do wygenerowania. Domyślnie jest to tabela "
                         "tekstowa TSV (tab separated values), którą można łatwo "
-                        "wkleić do arkusza kalkulacyjnego.")
+                        "wkleić do arkusza kalkulacyjnego. W trybie WarZal dostępne "
+                        "są też 'ini' (sekcja na przedmiot, plik *_raport.ini), 'sqlite' "
+                        "(baza SQLite z tabelami przedmiotów, "
+                        "rodzajów zajęć i ostrzeżeń, uzupełniana przy kolejnych "
+                        "uruchomieniach) i 'jsonl' (JSON Lines - każdy przedmiot jest "
+                        "zapisywany, gdy tylko zostanie przetworzony).")
     parser.add_argument("-t", dest="tryb", type=str, default="WarZal", help=""
                         "Tryb działania. Dopuszczalne wartości to: {'WarZal', "
                         "'PlanTab'} (rozmiar liter nie ma znaczenia); "
@@ -563,6 +4313,145 @@ def main(argv):
     parser.add_argument("--keep-html", action="store_true", default=False,
                         help="Zachowaj pośrednio wygenerowany plik HTML. Ma znaczenie tylko gdy"
                              "plik wejściowy jest w PDF.")
+    parser.add_argument("--strumieniowo", action="store_true", default=False,
+                        help="Czytaj dokument HTML strona po stronie zamiast wczytywać "
+                             "całe drzewo do pamięci (tryb WarZal). Zużycie pamięci nie "
+                             "rośnie wtedy z rozmiarem dokumentu.")
+    parser.add_argument("-j", type=int, default=None, metavar="N",
+                        help="Liczba procesów roboczych przy przetwarzaniu wielu plików. "
+                             "Domyślnie tyle, ile jest rdzeni procesora.")
+    parser.add_argument("--mutool-j", type=int, default=1, metavar="N",
+                        help="Konwertuj PDF na HTML w N równoległych procesach mutool draw, "
+                             "każdy dla innego zakresu stron. Przydatne dla dużych plików PDF.")
+    parser.add_argument("--ekstrakcja-j", type=int, default=1, metavar="N",
+                        help="Wyciągaj dane z jednego dokumentu HTML w N procesach: dokument "
+                             "jest dzielony na ciągłe fragmenty zaczynające się od stron "
+                             "tytułowych sylabusów, a wyniki są łączone w kolejności (z "
+                             "wykrywaniem powtórzonych przedmiotów). Nie dotyczy --potok, "
+                             "plików *.stext ani -f jsonl.")
+    parser.add_argument("--potok", action="store_true", default=False,
+                        help="Czytaj wyjście mutool draw bezpośrednio z potoku, strona po "
+                             "stronie, bez pliku pośredniego - konwersja i ekstrakcja "
+                             "przebiegają równolegle. Dokument pośredni jest zapisywany tylko "
+                             "jako kopia (pamięć podręczna, --keep-html). Nie dotyczy "
+                             "--mutool-j większego niż 1 ani --tylko-sylabusy.")
+    parser.add_argument("--backend", choices=["html", "stext"], default="html",
+                        help="Format pośredni, na który mutool konwertuje PDF: 'html' "
+                             "(domyślnie) albo 'stext' - tekst strukturalny z liczbowymi "
+                             "współrzędnymi, bez generowania stylizowanego HTML. Pliki "
+                             "*.stext można też podawać bezpośrednio jako wejście.")
+    parser.add_argument("--bez-obrazkow", action="store_true", default=False,
+                        help="Dokument pośredni z PDF bez treści obrazków: z HTML usuwane są "
+                             "osadzone obrazki (zostają puste znaczniki <img>), a stext powstaje "
+                             "bez bloków z obrazkami - strony tytułowe są wtedy rozpoznawane po "
+                             "kotwicach tekstowych. Mniejszy dokument i szybsze parsowanie, te "
+                             "same wyniki.")
+    parser.add_argument("--tylko-sylabusy", action="store_true", default=False,
+                        help="Przy konwersji PDF najpierw przejrzyj sam tekst stron (mutool draw "
+                             "-F txt) i konwertuj do dokumentu pośredniego tylko strony sylabusów "
+                             "(zaczynające się nagłówkiem 'Sylabusy'), z ich numerami z PDF. "
+                             "Strony tytułowe programu, plany studiów i matryce efektów nie są "
+                             "wtedy konwertowane ani parsowane. Jeśli przekonwertowane strony "
+                             "zawierają mniej stron tytułowych sylabusów, niż widać w tekście, "
+                             "konwertowany jest cały dokument (z ostrzeżeniem).")
+    parser.add_argument("--porownaj-backendy", action="store_true", default=False,
+                        help="Dla plików PDF wykonaj dodatkowo ekstrakcję z drugim formatem "
+                             "pośrednim i zgłoś każdą różnicę w wynikach jako ostrzeżenie. Z "
+                             "--tylko-sylabusy zgłoś też strony sylabusów z konwersji całego "
+                             "dokumentu pominięte przez wstępne przejrzenie tekstu.")
+    parser.add_argument("--silnik", choices=sorted(SilnikiEkstrakcji), default="pyquery",
+                        help="Silnik ekstrakcji (tryb WarZal): 'pyquery' (domyślnie) albo "
+                             "'lxml' - bezpośrednio na elementach lxml z prekompilowanymi "
+                             "wyrażeniami XPath, bez importu pyquery. Oba dają te same wyniki; "
+                             "porównuje je z wzorcem na selektorach PyQuery skrypt "
+                             "roznice_silnikow.py.")
+    parser.add_argument("--bez-cache", action="store_true", default=False,
+                        help="Nie używaj pamięci podręcznej przekonwertowanych dokumentów "
+                             "i wyników ekstrakcji dla plików PDF (domyślnie jest włączona, "
+                             "zob. --cache-katalog i --cache-limit).")
+    parser.add_argument("--cache-katalog", type=str, default=None, metavar="KATALOG",
+                        help="Katalog pamięci podręcznej (domyślnie zmienna środowiskowa "
+                             "AUTOSYLABUSUJ_CACHE, a bez niej autosylabusuj w katalogu cache "
+                             "użytkownika: %%LOCALAPPDATA%%, $XDG_CACHE_HOME lub ~/.cache).")
+    parser.add_argument("--cache-limit", type=int, default=2048, metavar="MB",
+                        help="Maksymalny rozmiar pamięci podręcznej w MB; najdawniej używane "
+                             "wpisy są usuwane. Domyślnie 2048.")
+    parser.add_argument("--pamiec-blokow", action="store_true", default=False,
+                        help="Zapamiętuj przedmioty wyciągnięte z bloków stron (od strony "
+                             "tytułowej do następnej) w pamięci wspólnej dla wszystkich "
+                             "dokumentów, w katalogu pamięci podręcznej. Sylabus identyczny "
+                             "z już przetworzonym (np. lektorat, BHP) nie jest wtedy wyciągany "
+                             "ponownie. Na końcu wypisywany jest odsetek trafień. Nie dotyczy "
+                             "--ekstrakcja-j większego niż 1.")
+    parser.add_argument("--pamiec-blokow-limit", type=int, default=256, metavar="MB",
+                        help="Maksymalny rozmiar pamięci bloków w MB; najdawniej używane wpisy "
+                             "są usuwane. Domyślnie 256.")
+    parser.add_argument("--cache-info", action="store_true", default=False,
+                        help="Wypisz zawartość pamięci podręcznej (także pamięci bloków) "
+                             "i zakończ.")
+    parser.add_argument("--cache-wyczysc", action="store_true", default=False,
+                        help="Wyczyść pamięć podręczną i zakończ.")
+    parser.add_argument("--raport-zbiorczy", type=str, default=None, metavar="PLIK",
+                        help="Zapisz dodatkowo jeden raport TSV dla wszystkich plików "
+                             "wejściowych, z kolumną 'plik' wskazującą źródło wiersza "
+                             "(przy -f sqlite: jedną bazę SQLite ze wszystkimi plikami, "
+                             "przy -f jsonl: plik JSON Lines z polem 'plik').")
+    parser.add_argument("--plan", type=str, action="append", default=None, metavar="PLIK",
+                        help="Porównaj sylabusy z plikami wejściowymi z planem studiów (plik "
+                             "tekstowy jak w trybie PlanTab lub raport *_plantab.tsv; opcję "
+                             "można powtórzyć) i zapisz jeden raport niezgodności formy "
+                             "weryfikacji i liczby godzin, a także przedmiotów bez sylabusu "
+                             "lub spoza planu. Przedmioty są łączone po nazwie, także bez "
+                             "przyrostka ścieżki [ścieżka]. Wejściem mogą być też raporty "
+                             "*_raport.jsonl (-f jsonl).")
+    parser.add_argument("--dziennik", type=str, default=None, metavar="PLIK",
+                        help="Zapisuj postęp przetwarzania wsadowego (tryb WarZal) w dzienniku "
+                             "JSON Lines: każdy kompletny przedmiot, koniec każdego pliku "
+                             "i błędy z wyjątkami. Błąd strony pomija tylko jej przedmiot, "
+                             "a błąd pliku - tylko ten plik. Raporty są zapisywane na końcu, "
+                             "odtworzone z dziennika. Nie dotyczy --ekstrakcja-j.")
+    parser.add_argument("--wznow", "--resume", dest="wznow", action="store_true", default=False,
+                        help="Wznów przerwany przebieg z --dziennik: pliki zakończone według "
+                             "dziennika są pomijane, a przerwany plik jest przetwarzany od "
+                             "ostatniego zapisanego przedmiotu. Bez tej opcji dziennik jest "
+                             "zakładany od nowa.")
+    parser.add_argument("--metryki", "--metrics", dest="metryki", type=str, default=None,
+                        metavar="PLIK",
+                        help="Zapisz do pliku JSON pomiary wydajności: czas zegarowy i czas "
+                             "procesora etapów (konwersja, parsowanie, funkcje pgq_, zapis), "
+                             "rozkłady czasów przetwarzania stron i przedmiotów, liczby stron "
+                             "wg rodzaju i szczytowe zużycie pamięci.")
+    parser.add_argument("--profil", type=str, default=None, metavar="PLIK",
+                        help="Profiluj ekstrakcję przy pomocy cProfile i zapisz statystyki do "
+                             "pliku (do odczytu modułem pstats).")
+
+    parser.add_argument("--serwer", type=str, nargs="?", const="127.0.0.1:8765", default=None,
+                        metavar="ADRES",
+                        help="Uruchom jako usługę lokalną: serwer HTTP pod adresem host:port "
+                             "(domyślnie 127.0.0.1:8765) lub unix:<ścieżka> (gniazdo "
+                             "uniksowe), który przyjmuje pliki do przetworzenia i wykonuje je "
+                             "w puli -j procesów. Pozostałe opcje (np. --backend, --silnik, "
+                             "pamięć podręczna) dotyczą wszystkich zadań.")
+    parser.add_argument("--serwer-kolejka", type=int, default=64, metavar="N",
+                        help="Maksymalna liczba zadań oczekujących w kolejce serwera; "
+                             "kolejne są odrzucane (HTTP 503). Domyślnie 64.")
+    parser.add_argument("--serwer-ttl", type=float, default=3600.0, metavar="SEK",
+                        help="Jak długo (od zakończenia) serwer przechowuje zakończone zadania "
+                             "z raportami; potem zadanie jest usuwane (HTTP 404). Domyślnie "
+                             "3600 s.")
+
+    parser.add_argument("--obserwuj", type=str, default=None, metavar="KATALOG",
+                        help="Obserwuj katalog i przetwarzaj automatycznie nowe lub zmienione "
+                             "pliki (w puli -j procesów), zapisując raporty obok nich. Stan "
+                             "plików jest zapisywany w manifeście, więc po ponownym "
+                             "uruchomieniu niezmienione pliki nie są przetwarzane ponownie.")
+    parser.add_argument("--obserwuj-interwal", type=float, default=2.0, metavar="SEK",
+                        help="Co ile sekund przeglądać obserwowany katalog. Z pakietem "
+                             "watchdog katalog jest przeglądany także zaraz po każdej "
+                             "zmianie. Domyślnie 2 s.")
+    parser.add_argument("--manifest", type=str, default=None, metavar="PLIK",
+                        help=f"Plik manifestu dla --obserwuj; domyślnie {NazwaManifestu} "
+                             "w obserwowanym katalogu.")
 
     #parser.add_argument("plik_wyj", type=argparse.FileType("wt"))
     args = parser.parse_args(argv[1:])
@@ -576,44 +4465,82 @@ def main(argv):
     #     print(lineno)
     #     warzal.feed(line)
 
-    temp_html_fname = None
-    if args.nazwa_plik_wej.lower().endswith(".pdf"):
-        # Try if mutool is available
-        mutool_exe_path = shutil.which("mutool")
-        if mutool_exe_path is None:
-            raise RuntimeError("nie można znaleźć programu mutool, który jest niezbędny do przetwarzania plików PDF. "
-                               "Sprawdź swoje środowisko i/lub zainstaluj mutool z mupdf w miejscu, które będzie widoczne dla "
-                               "programu tzn. np. w tym samym katalogu lub w innym katalogu znajdującym się w PATH.")
-        else:
-            logging.info("using mutool at %s", mutool_exe_path)
-
-        subproc_result = subprocess.run([mutool_exe_path, "-v"],  text=True)
-
-        temp_html_fname = f"{TEMPFILE_PREFIX}{args.nazwa_plik_wej}.html"
-        if os.path.exists(temp_html_fname):
-            other_temp_fname = input("UWAGA: żeby kontynuować przetwarzanie PDF, niezbędny jest plik tymczasowy, jednak istnieje już "
-                    f"plik o sugerowanej nazwie '{temp_html_fname}'. Wpisz inną nazwę pliku lub wpisz 'y' lub '.' żeby nadpisać:")
-
-            if other_temp_fname not in {"y", "."}:
-                temp_html_fname = str(Path(other_temp_fname).with_suffix(".html"))
-
-        pdf2html_result = subprocess.run([mutool_exe_path, "draw", "-F", "html", "-o", temp_html_fname, args.nazwa_plik_wej], text=True)
-        args.nazwa_plik_wej = temp_html_fname
-
-    input_process_fname = temp_html_fname or args.nazwa_plik_wej
-
-    if args.tryb.lower() == "warzal":
-        warzalDict = warzal_PyQuery(input_process_fname, verbosity=args.v)
-        if args.format.lower() in {"tsv", "csv"}:
-            warzal_formatWyjsciaTSV(warzalDict, input_process_fname, args.o)
-        elif args.format.lower() in {"ini"}:
-            warzal_formatWyjsciaINI(warzalDict, input_process_fname, args.o)
-    elif args.tryb.lower() == "plantab":
-        liniePrzedmDicts = plantab_copypastetxt(input_process_fname, verbosity=args.v)
-        plantab_formatWyjsciaTSV(liniePrzedmDicts, input_process_fname, args.o)
-
-    if temp_html_fname is not None:
-        os.remove(temp_html_fname) # clean up temp file
+    if args.cache_info or args.cache_wyczysc:
+        pamiec = PamiecPodreczna.zArgumentow(args)
+        sciezkaBlokow = os.path.join(pamiec.katalog, NazwaPamieciBlokow)
+        if args.cache_wyczysc:
+            pamiec.wyczysc()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(sciezkaBlokow)
+        if args.cache_info:
+            pamiec.wypiszInformacje()
+            if os.path.exists(sciezkaBlokow):
+                with PamiecBlokow.zArgumentow(args) as pamiecBlokow:
+                    pamiecBlokow.wypiszInformacje()
+        return
+
+    if args.serwer:
+        uruchomSerwer(args.serwer, args, args.j, args.serwer_kolejka, args.serwer_ttl)
+        return
+
+    if args.obserwuj:
+        if args.nazwa_plik_wej or args.o or args.raport_zbiorczy:
+            parser.error("opcja --obserwuj nie łączy się z plikami wejściowymi, -o "
+                         "ani --raport-zbiorczy")
+        if not os.path.isdir(args.obserwuj):
+            parser.error(f"{args.obserwuj} nie jest katalogiem")
+        ObserwatorKatalogu(args.obserwuj, args, args.j, args.manifest, args.obserwuj_interwal).dzialaj()
+        return
+
+    if not args.nazwa_plik_wej:
+        parser.error("wymagany jest co najmniej jeden plik wejściowy")
+
+    pliki = _rozwinPlikiWejsciowe(args.nazwa_plik_wej, args.tryb.lower())
+    metryki = Metryki(profilowanie=bool(args.profil)) if args.metryki or args.profil else None
+
+    wsadowo = len(pliki) != 1 or os.path.isdir(args.nazwa_plik_wej[0]) or args.raport_zbiorczy \
+        or args.dziennik
+
+    if args.wznow and not args.dziennik:
+        parser.error("opcja --wznow wymaga --dziennik")
+    if args.dziennik and (args.tryb.lower() != "warzal" or args.plan):
+        parser.error("opcja --dziennik dotyczy przetwarzania wsadowego w trybie WarZal")
+
+    if args.pamiec_blokow:
+        with PamiecBlokow.zArgumentow(args) as pamiecBlokow:
+            statPrzed = pamiecBlokow.statystyki()
+
+    if args.plan:
+        if args.tryb.lower() != "warzal":
+            parser.error("opcja --plan dotyczy trybu WarZal")
+        with _etap(metryki, "calosc"):
+            porownajZPlanem(pliki, args.plan, args, args.o, metryki)
+    elif wsadowo:
+        if args.o:
+            parser.error("opcja -o dotyczy pojedynczego pliku wejściowego; przy wielu "
+                         "plikach użyj --raport-zbiorczy")
+        if args.profil and args.j != 1:
+            parser.error("opcja --profil przy wielu plikach wymaga -j 1")
+        with _etap(metryki, "calosc"):
+            przetworzWsadowo(pliki, args, metryki)
+    else:
+        with _etap(metryki, "calosc"):
+            przetworzPlik(pliki[0], args, args.o, metryki=metryki)
+
+    if args.pamiec_blokow:
+        # Liczniki w bazie są wspólne dla procesów roboczych, więc odsetek
+        # trafień tego uruchomienia to przyrost liczników.
+        with PamiecBlokow.zArgumentow(args) as pamiecBlokow:
+            stat = pamiecBlokow.statystyki()
+        trafienia = stat["trafienia"] - statPrzed["trafienia"]
+        odczyty = trafienia + stat["chybienia"] - statPrzed["chybienia"]
+        print(f"Pamięć bloków: trafienia {trafienia} z {odczyty} bloków ({_procent(trafienia, odczyty)}), "
+              f"wpisów {stat['wpisy']}")
+
+    if args.metryki:
+        metryki.zapisz(args.metryki)
+    if args.profil:
+        metryki.profiler.dump_stats(args.profil)
 
 if __name__ == "__main__":
     main(sys.argv)
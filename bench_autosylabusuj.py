@@ -0,0 +1,608 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pomiary wydajności dla autosylabusuj
+====================================
+Skrypt generuje syntetyczne dokumenty HTML naśladujące wyjście
+``mutool draw -F html`` dla plików z sylabusami (oraz pliki tekstowe planu
+studiów dla trybu PlanTab) i mierzy na nich czas działania wybranych części
+narzędzia.
+
+Stosowanie
+----------
+::
+
+    python bench_autosylabusuj.py kotwice -n 1000
+    python bench_autosylabusuj.py zestaw --zapisz baza.json
+    python bench_autosylabusuj.py zestaw --porownaj baza.json
+    python bench_autosylabusuj.py start -r 20
+
+Pomiar ``zestaw`` mierzy ekstrakcję (``warzal_PyQuery``,
+``plantab_copypastetxt``) i zapis raportów (TSV/INI) dla kilku rozmiarów
+dokumentów. Każdy przypadek jest uruchamiany w osobnym, świeżym procesie,
+więc szczytowe zużycie pamięci (przyrost maksymalnego RSS ponad stan po
+przygotowaniu danych; na Linuksie szczyt jest przed pomiarem zerowany)
+nie zależy od kolejności przypadków. Wyniki zapisane
+opcją ``--zapisz`` można porównać z pomiarem na innej wersji kodu opcją
+``--porownaj``; przypadki wolniejsze o więcej niż ``--prog`` procent są
+oznaczane jako regresje, a skrypt kończy się wtedy kodem 1.
+
+Pomiar ``start`` mierzy czas zimnego startu: sam import modułu i pełne
+uruchomienie narzędzia z wiersza poleceń w każdym trybie na bardzo małym
+dokumencie, więc wynik to niemal wyłącznie koszt uruchomienia interpretera,
+importów i przygotowania. Dla każdego przypadku podawane są też ciężkie
+moduły, które zostały zaimportowane.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pyquery import PyQuery
+
+import autosylabusuj
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+
+def _akapit(top, left, tekst, pogrubiony=False):
+    wnetrze = f'<span style="font-family:Arial,sans-serif;font-size:10.0pt">{tekst}</span>'
+    if pogrubiony:
+        wnetrze = f"<b>{wnetrze}</b>"
+    return f'<p style="top:{top:.1f}pt;left:{left:.1f}pt;line-height:10.0pt">{wnetrze}</p>\n'
+
+
+def generujHTML(liczbaPrzedm, ziarno=0, stronNaPrzedm=2, rodzaje=None, przelewanie=0.0,
+                powtorzenia=0.0):
+    """
+    Wygeneruj syntetyczny dokument w formacie HTML od mutool draw.
+
+    Każdy przedmiot zajmuje co najmniej dwie strony: stronę tytułową
+    (z obrazkiem nad tytułem) i stronę z tabelą warunków zaliczenia oraz
+    wymaganiami wstępnymi. Dodatkowe strony (``stronNaPrzedm > 2``) są
+    wstawiane pomiędzy nimi i zawierają tekst bez kotwic.
+
+    Parameters
+    ----------
+    liczbaPrzedm : int
+        Liczba sylabusów przedmiotów w dokumencie.
+    ziarno : int
+        Ziarno generatora liczb losowych (dla powtarzalności).
+    stronNaPrzedm : int
+        Liczba stron na sylabus (bez stron z przelaną tabelą).
+    rodzaje : list of str, optional
+        Rodzaje zajęć do losowania. Domyślnie `RodzajeZajec` i rodzaje
+        redukowane z `SlownikRodzajowZajecDoRedukcji`.
+    przelewanie : float
+        Prawdopodobieństwo, że tabela warunków zaliczenia (mająca co najmniej
+        dwa rzędy) przeleje się na kolejną stronę z powtórzonym nagłówkiem.
+    powtorzenia : float
+        Prawdopodobieństwo, że sylabus ma nazwę jednego z wcześniejszych
+        przedmiotów (powtórzony sylabus).
+
+    Returns
+    -------
+    str
+        Treść dokumentu HTML.
+
+    """
+    los = random.Random(ziarno)
+    rodzaje = rodzaje or (autosylabusuj.RodzajeZajec
+                          + list(autosylabusuj.SlownikRodzajowZajecDoRedukcji))
+
+    wyj = ['<!DOCTYPE html>\n<html>\n<head>\n<meta charset="UTF-8">\n<style>\n'
+           'p{position:absolute;white-space:pre;margin:0}\n</style>\n</head>\n<body>\n']
+    nrStrony = 0
+
+    def nowaStrona():
+        nonlocal nrStrony
+        nrStrony += 1
+        wyj.append(f'<div id="page{nrStrony}" style="width:595.3pt;height:841.9pt">\n')
+        wyj.append(_akapit(20, 40, "Sylabusy"))
+
+    for i in range(liczbaPrzedm):
+        rodzajeZaj = los.sample(rodzaje, los.randint(1, 3))
+        nazwa = i
+        if i and powtorzenia and los.random() < powtorzenia:
+            nazwa = los.randrange(i)
+
+        nowaStrona()
+        wyj.append('<img style="position:absolute;top:40pt;left:40pt;width:80pt;height:40pt" '
+                   'src="data:image/png;base64,' + "iVBORw0KGgo" * 50 + '">\n')
+        wyj.append(_akapit(90, 40, f"Przedmiot syntetyczny {nazwa}"))
+        wyj.append(_akapit(120, 40, "Karta opisu przedmiotu"))
+        for j in range(10):
+            wyj.append(_akapit(130 + j, 200, f"Informacja ogólna {j}"))
+        wyj.append(_akapit(140, 40, "Ścieżka", pogrubiony=True))
+        wyj.append(_akapit(140, 200, "-"))
+        wyj.append(_akapit(160, 40, "Forma weryfikacji uzyskanych efektów uczenia się"))
+        wyj.append(_akapit(160, 200, los.choice(["egzamin", "zaliczenie na ocenę"])))
+        wyj.append(_akapit(180, 40, "Sposób realizacji i godziny zajęć"))
+        for j, rodzajZaj in enumerate(rodzajeZaj):
+            wyj.append(_akapit(180 + 12 * j, 200, f"{rodzajZaj}: {los.choice([15, 30, 45])}"))
+        wyj.append(_akapit(240, 40, "Liczba punktów ECTS"))
+        wyj.append(_akapit(240, 200, str(los.randint(1, 10))))
+        wyj.append("</div>\n")
+
+        for j in range(stronNaPrzedm - 2):
+            nowaStrona()
+            for k in range(40):
+                wyj.append(_akapit(40 + 14 * k, 40, f"Efekt uczenia się {j}.{k}"))
+            wyj.append("</div>\n")
+
+        def naglowekTabeli():
+            wyj.append(_akapit(60, 56, "Rodzaj zajęć"))
+            wyj.append(_akapit(60, 160, "Formy zaliczenia"))
+            wyj.append(_akapit(60, 300, "Warunki zaliczenia przedmiotu"))
+
+        # Numer rzędu, przed którym tabela przelewa się na kolejną stronę.
+        rzadPrzelania = None
+        if przelewanie and len(rodzajeZaj) > 1 and los.random() < przelewanie:
+            rzadPrzelania = los.randint(1, len(rodzajeZaj) - 1)
+
+        nowaStrona()
+        wyj.append(_akapit(40, 40, "Informacje rozszerzone"))
+        naglowekTabeli()
+        top = 80
+        for j, rodzajZaj in enumerate(rodzajeZaj):
+            if j == rzadPrzelania:
+                wyj.append("</div>\n")
+                nowaStrona()
+                naglowekTabeli()
+                top = 80
+            wyj.append(_akapit(top, 56, rodzajZaj))
+            wyj.append(_akapit(top, 160, "zaliczenie na ocenę"))
+            wyj.append(_akapit(top, 300, "Obecność i aktywność na zajęciach"))
+            wyj.append(_akapit(top + 12, 300, "oraz pozytywna ocena z kolokwium."))
+            top += 30
+        wyj.append(_akapit(top, 40, "Wymagania wstępne i dodatkowe"))
+        wyj.append(_akapit(top + 14, 40, "Brak."))
+        wyj.append("</div>\n")
+
+    wyj.append("</body>\n</html>\n")
+    return "".join(wyj)
+
+
+def _nazwaLiterowa(i):
+    # Nazwy przedmiotów w planie nie mogą zawierać liczb, bo parser PlanTab
+    # szuka liczby godzin jako pierwszej liczby w linii.
+    litery = ""
+    while True:
+        i, r = divmod(i, 26)
+        litery = "abcdefghijklmnopqrstuvwxyz"[r] + litery
+        if not i:
+            return litery
+
+
+def generujPlanTab(liczbaPrzedm, ziarno=0):
+    """
+    Wygeneruj syntetyczny plik tekstowy planu studiów w formacie
+    skopiowanej tabeli (tryb PlanTab).
+
+    Część przedmiotów ma formę weryfikacji "zaliczenie na ocenę" złamaną
+    na dwie linie, a część nie ma punktów ECTS ("-").
+
+    Parameters
+    ----------
+    liczbaPrzedm : int
+        Liczba przedmiotów w planie.
+    ziarno : int
+        Ziarno generatora liczb losowych (dla powtarzalności).
+
+    Returns
+    -------
+    str
+        Treść pliku tekstowego.
+
+    """
+    los = random.Random(ziarno)
+    wyj = ["Przedmiot Liczba\ngodzin\nPunkty\nECTS\nForma\nweryfikacji\n"]
+
+    for i in range(liczbaPrzedm):
+        nazwa = f"Przedmiot planu {_nazwaLiterowa(i)}"
+        godziny = los.choice([15, 30, 45, 60])
+        ects = los.choice(["-", "2,0", "5,0", "6,0"])
+        kategoria = los.choice("OF")
+        forma = los.choice(["egzamin", "zaliczenie", "zaliczenie na"])
+
+        if forma == "zaliczenie na":
+            wyj.append(f"{nazwa} {godziny} {ects} zaliczenie na\nocenę {kategoria}\n")
+        else:
+            wyj.append(f"{nazwa} {godziny} {ects} {forma} {kategoria}\n")
+
+    # Bez końcowego znaku nowej linii, jak w tekście wklejonym ze schowka
+    # (parser PlanTab nie akceptuje pustych linii).
+    return "".join(wyj).rstrip("\n")
+
+
+def bench_kotwice(liczbaPrzedm):
+    """
+    Porównaj wyszukiwanie kotwic selektorami ``:contains()`` (po jednym
+    przebiegu przez akapity na kotwicę) z jednoprzebiegowym `IndeksStrony`.
+    """
+    strony = PyQuery(generujHTML(liczbaPrzedm))("div")
+    kotwice = ["Rodzaj zajęć", "Formy zaliczenia", "Warunki zaliczenia przedmiotu",
+               "Wymagania wstępne i dodatkowe", "Forma weryfikacji uzyskanych efekt",
+               "Sposób realizacji i godziny zajęć", "Liczba"]
+
+    t0 = time.perf_counter()
+    for div in strony:
+        pgq = PyQuery(div)
+        for kotwica in kotwice:
+            pgq.children(f"p:contains('{kotwica}')")
+    tSelektory = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for div in strony:
+        indeks = autosylabusuj.IndeksStrony(div)
+        for kotwica in kotwice:
+            indeks.elementy(kotwica)
+    tIndeks = time.perf_counter() - t0
+
+    print(f"stron: {len(strony)}")
+    print(f"selektory :contains()  {tSelektory:8.3f} s")
+    print(f"IndeksStrony           {tIndeks:8.3f} s")
+    print(f"przyspieszenie         {tSelektory / tIndeks:8.1f}x")
+
+
+# Przypadki pomiaru `zestaw`. Dla przypadków ekstrakcji z HTML wydajność jest
+# raportowana również w stronach na sekundę.
+PrzypadkiZestawu = ["warzal_PyQuery",
+                    "warzal_PyQuery_strumieniowo",
+                    "warzal_rekordy_JSONL",
+                    "warzal_rownolegle",
+                    "plantab_copypastetxt",
+                    "warzal_formatWyjsciaTSV",
+                    "warzal_formatWyjsciaINI",
+                    "plantab_formatWyjsciaTSV"]
+_PrzypadkiStronicowe = {"warzal_PyQuery", "warzal_PyQuery_strumieniowo", "warzal_rekordy_JSONL",
+                        "warzal_rownolegle"}
+
+
+def _pamiecProc():
+    """Bieżący i szczytowy RSS procesu w bajtach z /proc (Linux), albo None."""
+    try:
+        with open("/proc/self/status", "rt") as f:
+            status = dict(linia.split(":", 1) for linia in f if ":" in linia)
+        return int(status["VmRSS"].split()[0]) * 1024, int(status["VmHWM"].split()[0]) * 1024
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _zerujSzczytPamieci():
+    """
+    Wyzeruj szczytowy RSS procesu (Linux, ``/proc/self/clear_refs``).
+
+    Returns
+    -------
+    int or None
+        Bieżący RSS w bajtach, od którego liczony jest przyrost szczytu, albo
+        None, jeśli system na to nie pozwala.
+
+    """
+    try:
+        with open("/proc/self/clear_refs", "wt") as f:
+            f.write("5")
+    except OSError:
+        return None
+
+    pamiec = _pamiecProc()
+    return pamiec[0] if pamiec else None
+
+
+def _szczytPamieci():
+    """Maksymalny RSS procesu w bajtach (albo szczyt tracemalloc bez `resource`)."""
+    pamiec = _pamiecProc()
+    if pamiec:
+        return pamiec[1]
+
+    if resource is None:
+        return tracemalloc.get_traced_memory()[1]
+
+    szczyt = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux podaje wartość w KiB, macOS w bajtach.
+    return szczyt if sys.platform == "darwin" else szczyt * 1024
+
+
+def _zmierzPrzypadek(przypadek, plikHTML, plikPlan, katalogWyj, powtorzenia):
+    """
+    Zmierz jeden przypadek zestawu. Uruchamiane w osobnym procesie.
+
+    Returns
+    -------
+    dict
+        Najkrótszy czas z `powtorzenia` uruchomień (``czas_s``) i przyrost
+        szczytowego zużycia pamięci (``pamiec_MB``).
+
+    """
+    if resource is None:
+        tracemalloc.start()
+
+    plikWyj = os.path.join(katalogWyj, przypadek)
+
+    if przypadek == "warzal_PyQuery":
+        funkcja = lambda: autosylabusuj.warzal_PyQuery(plikHTML, ostrzezenia=[])
+    elif przypadek == "warzal_PyQuery_strumieniowo":
+        funkcja = lambda: autosylabusuj.warzal_PyQuery(plikHTML, strumieniowo=True, ostrzezenia=[])
+    elif przypadek == "warzal_rekordy_JSONL":
+        # Pełny potok strumieniowy: strony z iterparse, przedmioty zapisywane
+        # na bieżąco - pamięć nie powinna rosnąć z rozmiarem dokumentu.
+        funkcja = lambda: autosylabusuj.warzal_formatWyjsciaJSONL(
+            autosylabusuj.warzal_rekordy(plikHTML, strumieniowo=True, ostrzezenia=[]), plikHTML, plikWyj)
+    elif przypadek == "warzal_rownolegle":
+        # Tyle fragmentów dokumentu, ile rdzeni procesora.
+        funkcja = lambda: autosylabusuj.warzal_rownolegle(plikHTML, os.cpu_count() or 1, ostrzezenia=[])
+    elif przypadek == "plantab_copypastetxt":
+        funkcja = lambda: autosylabusuj.plantab_copypastetxt(plikPlan)
+    elif przypadek == "warzal_formatWyjsciaTSV":
+        wynik = autosylabusuj.warzal_PyQuery(plikHTML, ostrzezenia=[])
+        funkcja = lambda: autosylabusuj.warzal_formatWyjsciaTSV(wynik, plikHTML, plikWyj)
+    elif przypadek == "warzal_formatWyjsciaINI":
+        wynik = autosylabusuj.warzal_PyQuery(plikHTML, ostrzezenia=[])
+        funkcja = lambda: autosylabusuj.warzal_formatWyjsciaINI(wynik, plikHTML, plikWyj)
+    elif przypadek == "plantab_formatWyjsciaTSV":
+        wynik = autosylabusuj.plantab_copypastetxt(plikPlan)
+        funkcja = lambda: autosylabusuj.plantab_formatWyjsciaTSV(wynik, plikPlan, plikWyj)
+    else:
+        raise ValueError(f"nieznany przypadek pomiaru '{przypadek}'")
+
+    # Bez możliwości wyzerowania szczytu przyrost liczymy ponad szczyt po
+    # przygotowaniu danych (może być wtedy zaniżony).
+    pamiecPrzed = _zerujSzczytPamieci() or _szczytPamieci()
+    czasy = []
+
+    for _ in range(powtorzenia):
+        t0 = time.perf_counter()
+        funkcja()
+        czasy.append(time.perf_counter() - t0)
+
+    return {"czas_s": min(czasy),
+            "pamiec_MB": max(_szczytPamieci() - pamiecPrzed, 0) / 2**20}
+
+
+# Przypadki pomiaru `start` (argumenty autosylabusuj.py; None - sam import).
+PrzypadkiStartu = {"import": None,
+                   "pomoc": ["-h"],
+                   "PlanTab": ["-t", "PlanTab", "{plan}", "-o", "{wyj}.tsv"],
+                   "WarZal_pyquery": ["{html}", "-o", "{wyj}.tsv"],
+                   "WarZal_lxml": ["{html}", "--silnik", "lxml", "-o", "{wyj}.tsv"],
+                   "WarZal_jsonl": ["{html}", "-f", "jsonl", "--strumieniowo", "-o", "{wyj}.jsonl"]}
+
+# Moduły, których import jest wyraźnie widoczny w czasie startu.
+CiezkieModuly = ["lxml.etree", "pyquery", "cssselect", "http.server", "concurrent.futures"]
+
+
+def _poleceniePrzypadkuStartu(przypadek, plikHTML, plikPlan, katalogWyj):
+    # Po zakończeniu polecenie wypisuje na stderr listę załadowanych ciężkich
+    # modułów.
+    katalogKodu = os.path.dirname(os.path.abspath(__file__))
+    linie = ["import sys",
+             f"sys.path.insert(0, {katalogKodu!r})",
+             "import autosylabusuj"]
+    if PrzypadkiStartu[przypadek] is not None:
+        argumenty = [a.format(html=plikHTML, plan=plikPlan, wyj=os.path.join(katalogWyj, przypadek))
+                     for a in PrzypadkiStartu[przypadek]]
+        linie += ["try:",
+                  f"    autosylabusuj.main(['autosylabusuj.py'] + {argumenty!r})",
+                  "except SystemExit:",
+                  "    pass"]
+    linie.append(f"print(','.join(m for m in {CiezkieModuly!r} if m in sys.modules), file=sys.stderr)")
+    return [sys.executable, "-c", "\n".join(linie)]
+
+
+def bench_start(przypadki, powtorzenia=10):
+    """
+    Zmierz czas zimnego startu: każdy przypadek `PrzypadkiStartu` jest
+    uruchamiany `powtorzenia` razy w nowym procesie interpretera.
+
+    Returns
+    -------
+    dict
+        Metadane i słownik ``wyniki``: dla każdego przypadku najkrótszy
+        i środkowy czas (``czas_s``, ``mediana_s``) oraz lista
+        zaimportowanych modułów z `CiezkieModuly`.
+
+    """
+    wyniki = {}
+
+    with tempfile.TemporaryDirectory(prefix="bench_autosylabusuj_") as katalog:
+        plikHTML = os.path.join(katalog, "sylabusy.html")
+        plikPlan = os.path.join(katalog, "plan.txt")
+        with open(plikHTML, "wt", encoding="utf-8") as f:
+            f.write(generujHTML(2))
+        with open(plikPlan, "wt", encoding="utf-8") as f:
+            f.write(generujPlanTab(2))
+
+        for przypadek in przypadki:
+            polecenie = _poleceniePrzypadkuStartu(przypadek, plikHTML, plikPlan, katalog)
+            czasy = []
+            for _ in range(powtorzenia):
+                t0 = time.perf_counter()
+                wynik = subprocess.run(polecenie, capture_output=True, text=True, check=True)
+                czasy.append(time.perf_counter() - t0)
+
+            czasy.sort()
+            moduly = wynik.stderr.strip().splitlines()[-1] if wynik.stderr.strip() else ""
+            wyniki[przypadek] = {"czas_s": czasy[0], "mediana_s": czasy[len(czasy) // 2],
+                                 "moduly": [m for m in moduly.split(",") if m]}
+            print(f"{przypadek:20} {czasy[0] * 1000:8.1f} ms (mediana {czasy[len(czasy) // 2] * 1000:8.1f} ms)  "
+                  f"{', '.join(wyniki[przypadek]['moduly']) or '-'}", flush=True)
+
+    return {"commit": _wersjaKodu(),
+            "python": platform.python_version(),
+            "platforma": platform.platform(),
+            "powtorzenia": powtorzenia,
+            "wyniki": wyniki}
+
+
+def _wersjaKodu():
+    """Skrócony identyfikator commita git, jeśli jest dostępny."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_zestaw(skale, przypadki, powtorzenia=3, stronNaPrzedm=2, przelewanie=0.2):
+    """
+    Zmierz przypadki `przypadki` dla dokumentów o liczbie przedmiotów
+    z listy `skale`.
+
+    Returns
+    -------
+    dict
+        Wyniki w formacie zapisywanym opcją ``--zapisz``: metadane i słownik
+        ``wyniki`` z kluczami ``"<przypadek>/<liczba przedmiotów>"``.
+
+    """
+    wyniki = {}
+    # Świeży interpreter dla każdego przypadku, żeby maksymalny RSS nie był
+    # zawyżony przez poprzednie przypadki.
+    kontekst = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory(prefix="bench_autosylabusuj_") as katalog:
+        for liczbaPrzedm in skale:
+            html = generujHTML(liczbaPrzedm, stronNaPrzedm=stronNaPrzedm, przelewanie=przelewanie)
+            liczbaStron = html.count('<div id="page')
+            plikHTML = os.path.join(katalog, f"sylabusy_{liczbaPrzedm}.html")
+            plikPlan = os.path.join(katalog, f"plan_{liczbaPrzedm}.txt")
+
+            with open(plikHTML, "wt", encoding="utf-8") as f:
+                f.write(html)
+            with open(plikPlan, "wt", encoding="utf-8") as f:
+                f.write(generujPlanTab(liczbaPrzedm))
+            del html
+
+            for przypadek in przypadki:
+                with concurrent.futures.ProcessPoolExecutor(1, mp_context=kontekst) as pula:
+                    pomiar = pula.submit(_zmierzPrzypadek, przypadek, plikHTML, plikPlan,
+                                         katalog, powtorzenia).result()
+
+                pomiar["przedm_s"] = liczbaPrzedm / pomiar["czas_s"]
+                if przypadek in _PrzypadkiStronicowe:
+                    pomiar["stron_s"] = liczbaStron / pomiar["czas_s"]
+
+                wyniki[f"{przypadek}/{liczbaPrzedm}"] = pomiar
+                print(_wierszWyniku(f"{przypadek}/{liczbaPrzedm}", pomiar), flush=True)
+
+    return {"commit": _wersjaKodu(),
+            "python": platform.python_version(),
+            "platforma": platform.platform(),
+            "powtorzenia": powtorzenia,
+            "stronNaPrzedm": stronNaPrzedm,
+            "przelewanie": przelewanie,
+            "wyniki": wyniki}
+
+
+def _wierszWyniku(klucz, pomiar):
+    stron_s = f"{pomiar['stron_s']:10.0f}" if "stron_s" in pomiar else f"{'-':>10}"
+    return (f"{klucz:40} {pomiar['czas_s']:9.4f} s {stron_s} str/s "
+            f"{pomiar['przedm_s']:10.0f} przedm/s {pomiar['pamiec_MB']:8.1f} MB")
+
+
+def porownajZBaza(wyniki, baza, prog):
+    """
+    Wypisz porównanie wyników z bazowym pomiarem.
+
+    Parameters
+    ----------
+    wyniki, baza : dict
+        Wyniki pomiaru `bench_zestaw` (aktualne i bazowe).
+    prog : float
+        Próg regresji w procentach czasu wykonania.
+
+    Returns
+    -------
+    int
+        Liczba przypadków wolniejszych od bazy o więcej niż `prog` procent.
+
+    """
+    regresje = 0
+    print(f"\nPorównanie z bazą (commit {baza.get('commit')}):")
+
+    for klucz, pomiar in wyniki["wyniki"].items():
+        if klucz not in baza["wyniki"]:
+            print(f"{klucz:40} brak w bazie")
+            continue
+
+        bazowy = baza["wyniki"][klucz]
+        zmianaCzasu = (pomiar["czas_s"] / bazowy["czas_s"] - 1) * 100
+        zmianaPamieci = pomiar["pamiec_MB"] - bazowy["pamiec_MB"]
+        uwaga = ""
+        if zmianaCzasu > prog:
+            uwaga = "  REGRESJA"
+            regresje += 1
+
+        print(f"{klucz:40} {bazowy['czas_s']:9.4f} s -> {pomiar['czas_s']:9.4f} s "
+              f"({zmianaCzasu:+6.1f}%), pamięć {zmianaPamieci:+8.1f} MB{uwaga}")
+
+    return regresje
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Pomiary wydajności autosylabusuj "
+                                     "na syntetycznych dokumentach.")
+    parser.add_argument("pomiar", choices=["kotwice", "zestaw", "start"], help="Rodzaj pomiaru.")
+    parser.add_argument("-n", type=int, default=500, help="Liczba przedmiotów "
+                        "w syntetycznym dokumencie (pomiar 'kotwice').")
+    parser.add_argument("--skale", type=int, nargs="+", default=[10, 100, 1000],
+                        help="Liczby przedmiotów w dokumentach pomiaru 'zestaw'.")
+    parser.add_argument("--przypadki", nargs="+", choices=PrzypadkiZestawu,
+                        default=PrzypadkiZestawu, help="Mierzone przypadki (domyślnie wszystkie).")
+    parser.add_argument("-r", "--powtorzenia", type=int, default=3,
+                        help="Liczba powtórzeń każdego przypadku; liczy się najkrótszy czas.")
+    parser.add_argument("--stron-na-przedmiot", type=int, default=2,
+                        help="Liczba stron na sylabus w syntetycznym dokumencie.")
+    parser.add_argument("--przelewanie", type=float, default=0.2,
+                        help="Prawdopodobieństwo przelania tabeli warunków zaliczenia "
+                             "na kolejną stronę.")
+    parser.add_argument("--zapisz", type=str, default=None, metavar="PLIK",
+                        help="Zapisz wyniki jako JSON, np. jako bazę do porównań.")
+    parser.add_argument("--porownaj", type=str, default=None, metavar="PLIK",
+                        help="Porównaj wyniki z bazą zapisaną wcześniej opcją --zapisz.")
+    parser.add_argument("--prog", type=float, default=10.0,
+                        help="Próg regresji czasu w procentach (domyślnie 10).")
+
+    args = parser.parse_args(argv[1:])
+
+    if args.pomiar == "kotwice":
+        bench_kotwice(args.n)
+    elif args.pomiar == "start":
+        wyniki = bench_start(list(PrzypadkiStartu), args.powtorzenia)
+
+        if args.zapisz:
+            with open(args.zapisz, "wt", encoding="utf-8") as f:
+                json.dump(wyniki, f, ensure_ascii=False, indent=2)
+    elif args.pomiar == "zestaw":
+        wyniki = bench_zestaw(args.skale, args.przypadki, args.powtorzenia,
+                              args.stron_na_przedmiot, args.przelewanie)
+
+        if args.zapisz:
+            with open(args.zapisz, "wt", encoding="utf-8") as f:
+                json.dump(wyniki, f, ensure_ascii=False, indent=2)
+
+        if args.porownaj:
+            with open(args.porownaj, "rt", encoding="utf-8") as f:
+                baza = json.load(f)
+            if porownajZBaza(wyniki, baza, args.prog):
+                return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+"""
+Porównanie silników ekstrakcji autosylabusuj
+============================================
+Skrypt uruchamia ekstrakcję WarZal silnikiem ``pyquery`` i silnikiem
+``lxml`` na zbiorze dokumentów i porównuje oba wyniki z silnikiem wzorcowym
+``wzorzec``, zgłaszając każdą różnicę na poziomie pojedynczych pól
+przedmiotów (oraz różnice w ostrzeżeniach). Wypisuje też czasy silników.
+
+Oba silniki programu korzystają z tego samego `autosylabusuj.IndeksStrony`
+(większość funkcji ``lx_`` woła wprost funkcje ``pgq_``), więc porównanie
+ich ze sobą sprawdza głównie przeglądanie stron. Silnik ``wzorzec`` jest
+zdefiniowany w tym skrypcie i wyciąga pola prawdziwymi selektorami PyQuery
+(``:contains()``, ``nextAll()``, ``.text()``), jak pierwotne funkcje
+``pgq_``, a położenie akapitów czyta z atrybutu ``style`` pierwotnymi
+`wyciagnijStyleLeft` i `cssDlwPt`. Tabelę warunków zaliczenia dzieli na
+kolumny tym samym algorytmem co program (`autosylabusuj.klastrujPolozenia`).
+Wspólne dla wszystkich silników pozostaje jedynie rozpoznawanie rodzaju
+strony (tytułowa, warunki zaliczenia, wymagania wstępne) przez
+`autosylabusuj.IndeksStrony`.
+
+Stosowanie
+----------
+::
+
+    python roznice_silnikow.py katalog_z_dokumentami/ inny_plik.html
+    python roznice_silnikow.py --syntetyczne 1000
+
+Z opcją ``--ekstrakcja-j N`` sprawdzana jest też zgodność wyników
+i ostrzeżeń ekstrakcji w N procesach (``warzal_rownolegle``) z ekstrakcją
+w jednym procesie (silnik ``pyquery``); dokument syntetyczny zawiera wtedy
+także powtórzone przedmioty i nieznany rodzaj zajęć::
+
+    python roznice_silnikow.py --syntetyczne 200 --ekstrakcja-j 3
+
+Dokumenty PDF są najpierw konwertowane przez ``mutool draw`` do HTML
+w katalogu tymczasowym. Skrypt kończy się kodem 1, jeśli znaleziono
+jakąkolwiek różnicę.
+"""
+
+import argparse
+import bisect
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import autosylabusuj
+from autosylabusuj import PyQuery
+
+
+# Silnik wzorcowy - funkcje ekstrakcji na selektorach PyQuery, niezależne
+# od `autosylabusuj.IndeksStrony` i `autosylabusuj._tekst`.
+
+def wyciagnijStyleLeft(pqelem):
+    """Przesunięcie 'left' z atrybutu 'style' jako długość CSS, np. '123pt'."""
+    leftstr = re.search("left\\s*:\\s*(\\d+(?:pt|px|cm)|\\d+\\.\\d+(?:pt|px|cm))", pqelem.attr.style or "")
+    return leftstr[1] if leftstr else None
+
+
+def cssDlwPt(cssdl):
+    """Długość absolutna w formacie CSS (np. '43.0pt') w pt."""
+    if not cssdl: # Early exit if None or empty string
+        return None
+
+    unitSymbMatch = re.search("[a-z]{1,2}", cssdl)
+    unitSymb = unitSymbMatch[0]
+    numval = float(cssdl[0:unitSymbMatch.start()])
+
+    if unitSymb == "pt":
+        return numval
+    elif unitSymb == "px":
+        return numval * 72 / 96
+    elif unitSymb == "mm":
+        return numval / 25.4 * 72
+    elif unitSymb == "cm":
+        return numval / 2.54 * 72
+    elif unitSymb == "in":
+        return numval * 72
+    else:
+        raise ValueError(f"nieznana jednostka długości '{unitSymb}'")
+
+
+def _lewoPt(elem):
+    return cssDlwPt(wyciagnijStyleLeft(PyQuery(elem)))
+
+
+def wz_czySylabus(div):
+    return bool(PyQuery(div).children("p:first-child").text() == "Sylabusy")
+
+
+def wz_wyciagnijNazwePrzedmiotu(pgq, indeks=None):
+    # Bez obrazka tytuł zaczyna się pod pierwszym akapitem strony.
+    kotwica = pgq.children("img") or pgq.children().eq(0)
+    linieTyt = []
+
+    for el in kotwica.nextAll():
+        elq = PyQuery(el)
+
+        if elq.is_("p:contains('Karta opisu przedmiotu')"):
+            return " ".join(linieTyt)
+        else:
+            linieTyt.append(elq.text())
+
+
+def wz_wyciagnijSciezke(pgq, indeks=None):
+    kotwica = pgq.children("p > b") \
+        .filter(lambda i, elem: PyQuery(elem).text() == "Ścieżka").parents()[-1]
+
+    return PyQuery(kotwica).next().text()
+
+
+def wz_wyciagnijFormeWeryfikacji(pgq, indeks=None):
+    return pgq.children("p:contains('Forma weryfikacji uzyskanych efekt') + p").text()
+
+
+def wz_wyciagnijSposobyGodzinyRealizacji(pgq, indeks=None):
+    kotwica = pgq.children("p:contains('Sposób realizacji i godziny zajęć')")
+    stoper = kotwica.nextAll().filter("p:contains('Liczba')")[0]
+    bufor = []
+
+    for elem in kotwica.nextAll():
+        if elem == stoper:
+            break
+        bufor.append(PyQuery(elem).text())
+
+    sposoby_i_godziny = re.findall(r"([\w ]{4,40}): (\d{1,3})", " ".join(bufor))
+    return dict(map(lambda pair: (pair[0].strip(), pair[1]), sposoby_i_godziny))
+
+
+def wz_wyciagnijWarunkiZaliczenia(pgq, indeks=None, tolerancja=autosylabusuj.TolerancjaKolumnTabeli_pt):
+    nastepne = [(elem, lewo) for elem in pgq.children("p:contains('Warunki zaliczenia przedmiotu')").nextAll()
+                if (lewo := _lewoPt(elem)) is not None]
+
+    if not nastepne:
+        return []
+
+    krawedz = nastepne[0][1] - tolerancja
+    koniec = next((k for k, (_, lewo) in enumerate(nastepne) if lewo < krawedz), len(nastepne))
+    nastepne = nastepne[:koniec]
+
+    naglowek = [lewo for kotwica in ("Rodzaj zajęć", "Formy zaliczenia", "Warunki zaliczenia przedmiotu")
+                for elem in pgq.children(f"p:contains('{kotwica}')")
+                if (lewo := _lewoPt(elem)) is not None and lewo >= krawedz]
+    kolumny = autosylabusuj.klastrujPolozenia([lewo for _, lewo in nastepne] + naglowek, tolerancja)
+    liczbaKol = max(len(kolumny), 3)
+
+    tabelaWarZal = []
+    bufory = None
+    poprzKol = liczbaKol
+
+    for elem, lewo in nastepne:
+        kol = bisect.bisect_right(kolumny, lewo) - 1
+        if kol < poprzKol:
+            bufory = [[] for _ in range(liczbaKol)]
+            tabelaWarZal.append(bufory)
+        bufory[kol].append(PyQuery(elem).text())
+        poprzKol = kol
+
+    return [tuple(" ".join(bufor) for bufor in bufory) for bufory in tabelaWarZal]
+
+
+def wz_wyciagnijWymaganiaWstep(pgq, indeks=None):
+    kotwica = pgq.children("p:contains('Wymagania wstępne i dodatkowe')")
+
+    if not kotwica:
+        raise RuntimeError("brakuje kotwicy dla szukania 'Wymagania wstępne i dodatkowe'")
+
+    nastepne = kotwica.nextAll()
+    leftPtOryg = _lewoPt(nastepne[0])
+    bufor = [PyQuery(nastepne[0]).text()]
+
+    for p in nastepne[1:]:
+        leftPt = _lewoPt(p)
+
+        if leftPt is not None and leftPtOryg is not None and leftPt >= leftPtOryg:
+            bufor.append(PyQuery(p).text())
+        else:
+            break
+
+    return " ".join(bufor)
+
+
+def wz_wyciagnijNumerStrony(pgq):
+    return int(re.match("page(\\d+)", pgq.attr.id)[1])
+
+
+autosylabusuj.SilnikiEkstrakcji["wzorzec"] = {
+    "strona": PyQuery,
+    "czySylabus": wz_czySylabus,
+    "numerStrony": wz_wyciagnijNumerStrony,
+    "nazwaPrzedmiotu": wz_wyciagnijNazwePrzedmiotu,
+    "sciezka": wz_wyciagnijSciezke,
+    "formaWeryfikacji": wz_wyciagnijFormeWeryfikacji,
+    "sposobyGodziny": wz_wyciagnijSposobyGodzinyRealizacji,
+    "warunkiZaliczenia": wz_wyciagnijWarunkiZaliczenia,
+    "wymaganiaWstep": wz_wyciagnijWymaganiaWstep,
+}
+
+
+def porownajPlik(nazwa_plik_wej, strumieniowo=False, ekstrakcjaJ=None):
+    """
+    Wykonaj ekstrakcję pliku silnikiem wzorcowym i oboma silnikami
+    programu, a jeśli podano `ekstrakcjaJ` - także w `ekstrakcjaJ` procesach
+    (`autosylabusuj.warzal_rownolegle`).
+
+    Returns
+    -------
+    roznice : list of tuple
+        Różnice w formacie `autosylabusuj.roznicePrzedmiotow` (wartość
+        wzorcowa, wartość porównywana); przed nazwą pola jest nazwa
+        porównywanego silnika, np. ``"lxml: sciezka"``, a różnice
+        w ostrzeżeniach mają pole ``"<ostrzeżenia>"``. Ekstrakcja w wielu
+        procesach jest porównywana z silnikiem ``pyquery`` (przedrostek
+        ``"ekstrakcja-j: "``).
+    czasy : dict
+        Czas ekstrakcji (s) dla każdego silnika.
+    liczbaPrzedm : int
+        Liczba przedmiotów wg silnika ``pyquery``.
+
+    """
+    wyniki, ostrzezenia, czasy = {}, {}, {}
+
+    for silnik in ("wzorzec", "pyquery", "lxml"):
+        ostrzezenia[silnik] = []
+        t0 = time.perf_counter()
+        wyniki[silnik] = autosylabusuj.warzal_PyQuery(nazwa_plik_wej, strumieniowo=strumieniowo,
+                                                      ostrzezenia=ostrzezenia[silnik],
+                                                      silnik=silnik)
+        czasy[silnik] = time.perf_counter() - t0
+
+    roznice = []
+    for silnik in ("pyquery", "lxml"):
+        roznice += [(nazwaPrzedm, f"{silnik}: {pole}", wartosc, wartoscSilnika)
+                    for nazwaPrzedm, pole, wartosc, wartoscSilnika
+                    in autosylabusuj.roznicePrzedmiotow(wyniki["wzorzec"], wyniki[silnik])]
+        if ostrzezenia["wzorzec"] != ostrzezenia[silnik]:
+            roznice.append((None, f"{silnik}: <ostrzeżenia>", ostrzezenia["wzorzec"], ostrzezenia[silnik]))
+
+    if ekstrakcjaJ and not nazwa_plik_wej.lower().endswith(".stext"):
+        ostrzezeniaJ = []
+        wynikJ = autosylabusuj.warzal_rownolegle(nazwa_plik_wej, ekstrakcjaJ, ostrzezenia=ostrzezeniaJ)
+        roznice += [(nazwaPrzedm, f"ekstrakcja-j: {pole}", wartosc, wartoscJ) for nazwaPrzedm, pole, wartosc, wartoscJ
+                    in autosylabusuj.roznicePrzedmiotow(wyniki["pyquery"], wynikJ)]
+        if ostrzezenia["pyquery"] != ostrzezeniaJ:
+            roznice.append((None, "ekstrakcja-j: <ostrzeżenia>", ostrzezenia["pyquery"], ostrzezeniaJ))
+
+    return roznice, czasy, len(wyniki["pyquery"])
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Porównaj wyniki ekstrakcji silników "
+                                     "'pyquery' i 'lxml' z silnikiem wzorcowym (selektory "
+                                     "PyQuery) na zbiorze dokumentów.")
+    parser.add_argument("nazwa_plik_wej", type=str, nargs="*",
+                        help="Pliki (HTML, stext, PDF) lub katalogi z dokumentami.")
+    parser.add_argument("--syntetyczne", type=int, default=None, metavar="N",
+                        help="Porównaj dodatkowo na syntetycznym dokumencie z N przedmiotami "
+                             "(z bench_autosylabusuj.py).")
+    parser.add_argument("--strumieniowo", action="store_true", default=False,
+                        help="Czytaj dokumenty strona po stronie (jak opcja --strumieniowo).")
+    parser.add_argument("--ekstrakcja-j", type=int, default=None, metavar="N",
+                        help="Sprawdź też zgodność ekstrakcji w N procesach (jak opcja "
+                             "--ekstrakcja-j) z ekstrakcją w jednym procesie.")
+
+    args = parser.parse_args(argv[1:])
+    pliki = autosylabusuj._rozwinPlikiWejsciowe(args.nazwa_plik_wej, "warzal")
+
+    if not pliki and args.syntetyczne is None:
+        parser.error("podaj pliki wejściowe lub --syntetyczne N")
+
+    katalogTymcz = tempfile.mkdtemp(prefix=autosylabusuj.TEMPFILE_PREFIX)
+    try:
+        if args.syntetyczne is not None:
+            import bench_autosylabusuj
+
+            plik = os.path.join(katalogTymcz, f"syntetyczny_{args.syntetyczne}.html")
+            with open(plik, "wt", encoding="utf-8") as f:
+                if args.ekstrakcja_j:
+                    # Ostrzeżenia o powtórzeniach i nieznanych rodzajach zajęć
+                    # muszą zachować kolejność przy łączeniu fragmentów.
+                    f.write(bench_autosylabusuj.generujHTML(
+                        args.syntetyczne, przelewanie=0.2, powtorzenia=0.2,
+                        rodzaje=autosylabusuj.RodzajeZajec + ["tutoring"]))
+                else:
+                    f.write(bench_autosylabusuj.generujHTML(args.syntetyczne, przelewanie=0.2))
+            pliki.append(plik)
+
+        liczbaRoznic = 0
+        liczbaPrzedm = 0
+        czasy = {"wzorzec": 0.0, "pyquery": 0.0, "lxml": 0.0}
+
+        for plik in pliki:
+            dokument = plik
+            if plik.lower().endswith(".pdf"):
+                dokument = os.path.join(katalogTymcz, os.path.basename(plik) + ".html")
+                autosylabusuj.konwertujPDF(plik, dokument)
+
+            roznice, czasyPliku, przedm = porownajPlik(dokument, args.strumieniowo, args.ekstrakcja_j)
+            liczbaPrzedm += przedm
+            for silnik, czas in czasyPliku.items():
+                czasy[silnik] += czas
+
+            for nazwaPrzedm, pole, wartoscWzorca, wartosc in roznice:
+                liczbaRoznic += 1
+                print(f"{plik}: '{nazwaPrzedm}' / {pole}: wzorzec={wartoscWzorca!r} wynik={wartosc!r}")
+
+            print(f"{plik}: {przedm} przedmiotów, {len(roznice)} różnic, "
+                  f"wzorzec {czasyPliku['wzorzec']:.3f} s, "
+                  f"pyquery {czasyPliku['pyquery']:.3f} s, lxml {czasyPliku['lxml']:.3f} s")
+    finally:
+        shutil.rmtree(katalogTymcz, ignore_errors=True)
+
+    print(f"Razem: {len(pliki)} plików, {liczbaPrzedm} przedmiotów, {liczbaRoznic} różnic; "
+          f"wzorzec {czasy['wzorzec']:.3f} s, pyquery {czasy['pyquery']:.3f} s, lxml {czasy['lxml']:.3f} s "
+          f"(przyspieszenie {czasy['pyquery'] / max(czasy['lxml'], 1e-9):.1f}x)")
+
+    return 1 if liczbaRoznic else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+
+import autosylabusuj
+import bench_autosylabusuj
+
+
+def test_sqlite_pliki_o_tej_samej_nazwie_z_roznych_katalogow(tmp_path):
+    # Programy z różnych wydziałów o tej samej nazwie pliku nie mogą
+    # zastępować nawzajem swoich przedmiotów w jednej bazie.
+    baza = str(tmp_path / "programy.sqlite")
+    liczby = {"wydzialA": 3, "wydzialB": 5}
+
+    for katalog, liczbaPrzedm in liczby.items():
+        (tmp_path / katalog).mkdir()
+        plik = tmp_path / katalog / "plan.html"
+        plik.write_text(bench_autosylabusuj.generujHTML(liczbaPrzedm), encoding="utf-8")
+        warzalDict = autosylabusuj.warzal_PyQuery(str(plik), ostrzezenia=[])
+        autosylabusuj.warzal_formatWyjsciaSQLite(warzalDict, str(plik), baza, ["Uwaga: " + katalog])
+
+    with sqlite3.connect(baza) as polaczenie:
+        wiersze = polaczenie.execute(
+            "SELECT d.plik, COUNT(DISTINCT p.id), COUNT(DISTINCT o.nr) FROM dokumenty d "
+            "LEFT JOIN przedmioty p ON p.dokument = d.id LEFT JOIN ostrzezenia o ON o.dokument = d.id "
+            "GROUP BY d.id").fetchall()
+
+    assert len(wiersze) == 2
+    assert sorted(liczbaPrzedm for _, liczbaPrzedm, _ in wiersze) == sorted(liczby.values())
+    assert all(liczbaOstrz == 1 for _, _, liczbaOstrz in wiersze)